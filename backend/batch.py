@@ -0,0 +1,217 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+Batch mode: a directory of cases processed concurrently.
+
+    python backend/batch.py cases/ [--workers 4] [--out backend/cases]
+
+Every capture in the cases directory (or one level below it) is a case.
+Each case gets its own directory laid out like the repo root
+(backend/data, backend/results, backend/cache), and backend/pipeline.py
+runs in its own process with its data, results and cache roots pointed
+there (see paths.py), as ingest_jobs.py does for uploads, so cases never
+share inputs or outputs.
+
+Relays are resolved once for the whole batch. The snapshot and its exit
+index are written to <out>/relay_index, and every pipeline memory-maps
+that one read-only index instead of fetching relays and building its own.
+A throughput summary is printed and saved to <out>/batch_summary.json.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import tor_collect
+from paths import BACKEND_DIR, case_environment
+
+# --------------------------------------------------
+# PATHS
+# --------------------------------------------------
+CASES_OUT_DIR = os.path.join(BACKEND_DIR, "cases")
+
+PIPELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline.py")
+
+RELAY_INDEX_DIR = "relay_index"
+SUMMARY_FILE = "batch_summary.json"
+PROGRESS_FILE = "progress.json"
+LOG_FILE = "pipeline.log"
+
+CAPTURE_EXTENSIONS = (".pcap", ".pcapng", ".cap")
+
+# Pipelines run at once, and stage threads inside each of them
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+STAGE_JOBS = 2
+
+
+def _read_json(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# --------------------------------------------------
+# CASES
+# --------------------------------------------------
+def find_cases(cases_dir):
+    """
+    [{"name", "capture"}] for every capture directly in `cases_dir` or in
+    one of its subdirectories. Names are the capture's relative path
+    without extension ("case12/uplink.pcap" → "case12_uplink").
+    """
+    captures = []
+    for entry in sorted(os.listdir(cases_dir)):
+        path = os.path.join(cases_dir, entry)
+        if os.path.isdir(path):
+            captures += [os.path.join(entry, f) for f in sorted(os.listdir(path))]
+        else:
+            captures.append(entry)
+
+    cases = []
+    for rel in captures:
+        if rel.lower().endswith(CAPTURE_EXTENSIONS):
+            name = os.path.splitext(rel)[0].replace(os.sep, "_")
+            cases.append({"name": name, "capture": os.path.abspath(os.path.join(cases_dir, rel))})
+    return cases
+
+
+def prepare_relay_index(out_dir, offline=False):
+    """
+    Resolves relays once (snapshot cache, Onionoo) and saves them with
+    their exit index under `out_dir`. Returns the index directory, or None
+    when no relays are available and each case falls back to synthetic
+    exits drawn from its own capture.
+    """
+    relays = tor_collect.get_relays(offline=offline, synthetic_fallback=False)
+    if not relays:
+        print("[!] No relay snapshot available — cases will use synthetic exits")
+        return None
+
+    index_dir = os.path.join(out_dir, RELAY_INDEX_DIR)
+    tor_collect.save_relay_index(relays, index_dir)
+    return index_dir
+
+
+def run_case(case, out_dir, relay_index=None, stage_jobs=STAGE_JOBS):
+    """Runs the pipeline for one case in its own directory; returns its summary row."""
+    case_dir = os.path.join(out_dir, case["name"])
+    env = case_environment(case_dir)
+    results_dir = env["SHADOWFP_RESULTS_DIR"]
+    for root in (env["SHADOWFP_DATA_DIR"], results_dir):
+        os.makedirs(root, exist_ok=True)
+
+    progress_file = os.path.join(case_dir, PROGRESS_FILE)
+    cmd = [sys.executable, PIPELINE, case["capture"], "--progress", progress_file,
+           "--jobs", str(stage_jobs)]
+    # Without a shared index there are no relays to fetch either
+    cmd += ["--relay-index", relay_index] if relay_index else ["--offline"]
+
+    start = time.perf_counter()
+    with open(os.path.join(case_dir, LOG_FILE), "w") as log:
+        code = subprocess.run(cmd, env=env, stdout=log, stderr=subprocess.STDOUT).returncode
+    elapsed = time.perf_counter() - start
+
+    progress = _read_json(progress_file) or {}
+    ok = code == 0 and progress.get("state") == "done"
+    report = _read_json(os.path.join(results_dir, "forensic_report.json")) or {}
+    findings = report.get("key_findings", {})
+
+    return {
+        "case": case["name"],
+        "capture": case["capture"],
+        "state": "done" if ok else "failed",
+        "error": None if ok else (progress.get("error") or f"pipeline exited with code {code}"),
+        "seconds": round(elapsed, 3),
+        "packets": progress.get("packets") or 0,
+        "capture_bytes": progress.get("capture_bytes") or os.path.getsize(case["capture"]),
+        "top_suspect": findings.get("top_suspect"),
+        "confidence_score": findings.get("confidence_score"),
+        "results_dir": results_dir,
+    }
+
+
+# --------------------------------------------------
+# BATCH
+# --------------------------------------------------
+def summarize(rows, wall_seconds, workers):
+    done = [r for r in rows if r["state"] == "done"]
+    packets = sum(r["packets"] for r in done)
+    size = sum(r["capture_bytes"] for r in done)
+    serial = sum(r["seconds"] for r in rows)
+    return {
+        "cases": len(rows),
+        "done": len(done),
+        "failed": len(rows) - len(done),
+        "workers": workers,
+        "wall_seconds": round(wall_seconds, 3),
+        "case_seconds": round(serial, 3),
+        "speedup": round(serial / wall_seconds, 2) if wall_seconds > 0 else None,
+        "packets": packets,
+        "packets_per_sec": round(packets / wall_seconds, 1) if wall_seconds > 0 else None,
+        "mb_per_sec": round(size / 1e6 / wall_seconds, 2) if wall_seconds > 0 else None,
+        "cases_per_hour": round(len(done) * 3600 / wall_seconds, 1) if wall_seconds > 0 else None,
+    }
+
+
+def run_batch(cases_dir, out_dir=CASES_OUT_DIR, workers=DEFAULT_WORKERS, offline=False,
+              stage_jobs=STAGE_JOBS):
+    """Processes every case of `cases_dir`, `workers` at a time; returns the summary."""
+    cases = find_cases(cases_dir)
+    if not cases:
+        print(f"[!] No captures found in {cases_dir}")
+        return None
+
+    out_dir = os.path.abspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"[+] Batch of {len(cases)} cases, {workers} at a time → {out_dir}")
+
+    relay_index = prepare_relay_index(out_dir, offline)
+
+    start = time.perf_counter()
+    rows = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_case, case, out_dir, relay_index, stage_jobs) for case in cases]
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            mark = "✓" if row["state"] == "done" else "!"
+            detail = f"{row['packets']:,} packets" if row["state"] == "done" else row["error"]
+            print(f"[{mark}] {row['case']:<28} {row['seconds']:>8.2f}s  {detail}")
+    wall = time.perf_counter() - start
+
+    rows.sort(key=lambda r: r["case"])
+    summary = summarize(rows, wall, workers)
+    with open(os.path.join(out_dir, SUMMARY_FILE), "w") as f:
+        json.dump({"summary": summary, "relay_index": relay_index, "cases": rows}, f, indent=4)
+
+    print(
+        f"[✓] {summary['done']}/{summary['cases']} cases in {summary['wall_seconds']:.2f}s"
+        f" · {summary['packets']:,} packets ({summary['packets_per_sec'] or 0:,.0f} pkt/s,"
+        f" {summary['mb_per_sec'] or 0:.2f} MB/s) · {summary['speedup']}x over serial"
+    )
+    print(f"[✓] Saved summary → {os.path.join(out_dir, SUMMARY_FILE)}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline over a directory of cases")
+    parser.add_argument("cases_dir", help="directory of captures (or of case subdirectories)")
+    parser.add_argument("--out", default=CASES_OUT_DIR, help="where the per-case directories go")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="cases processed at once")
+    parser.add_argument("--stage-jobs", type=int, default=STAGE_JOBS,
+                        help="concurrent stages inside each case's pipeline")
+    parser.add_argument("--offline", action="store_true", help="serve Tor relays from the local cache only")
+    args = parser.parse_args()
+
+    summary = run_batch(args.cases_dir, args.out, args.workers, args.offline, args.stage_jobs)
+    sys.exit(0 if summary and not summary["failed"] else 1)
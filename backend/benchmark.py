@@ -0,0 +1,563 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+Stage-level benchmark suite.
+
+    python backend/benchmark.py                       # 10K, 100K, 1M packets
+    python backend/benchmark.py --sizes 10k,1m,10m,50m
+    python backend/benchmark.py --save-baseline       # record this machine's baseline
+
+Generates seeded pcap workloads, runs every stage on each one in its own
+process and records wall time, throughput, peak RSS and output size.
+Results go to backend/results/benchmark.json and are compared against a
+stored baseline; regressions make the run exit non-zero.
+"""
+
+import argparse
+import importlib
+import json
+import math
+import multiprocessing as mp
+import os
+import resource
+import shutil
+import struct
+import sys
+import time
+
+import numpy as np
+
+import paths
+from onionoo_stub import make_details_document
+from paths import DATA_DIR, RESULTS_DIR, case_environment
+
+# --------------------------------------------------
+# PATHS
+# --------------------------------------------------
+BENCH_DIR = os.path.join(DATA_DIR, "bench")
+RESULTS_FILE = os.path.join(RESULTS_DIR, "benchmark.json")
+BASELINE_FILE = os.path.join(DATA_DIR, "benchmark_baseline.json")
+
+# --------------------------------------------------
+# SETTINGS
+# --------------------------------------------------
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+FULL_SIZES = (10_000, 100_000, 1_000_000, 10_000_000, 50_000_000)
+
+STAGE_TIMEOUT_SEC = 1800
+REGRESSION_TOLERANCE = 0.25
+# Timing differences below this are noise, whatever the ratio
+MIN_REGRESSION_SEC = 0.05
+# Time-vs-size exponent above which a stage counts as no longer scaling
+SUPERLINEAR_EXPONENT = 1.25
+
+WORKLOAD_RELAYS = 2000
+WORKLOAD_PPS = 2000             # mean capture rate, packets per second
+WORKLOAD_EXIT_SHARE = 0.3       # share of flows that go to a Tor exit
+WORKLOAD_FLOW_LENGTH = 20       # mean packets per flow
+CHUNK_PACKETS = 1 << 20
+
+# stage → (module, entry point, outputs under the work dir's DATA_DIR/RESULTS_DIR)
+STAGES = {
+    "parse": ("pcap_parser", "parse_capture", [("data", "pcap_store")]),
+    "correlate": ("node_correlation", "correlate", [
+        ("results", "correlated_paths.json"), ("results", "timeline.json")
+    ]),
+    "identify_entry_nodes": ("entry_identification", "identify_entry_nodes", [
+        ("results", "entry_nodes.json")
+    ]),
+    "predict_guard_nodes": ("guard_predictor", "predict_guard_nodes", [
+        ("results", "guard_nodes.json")
+    ]),
+    "fusion_score_engine": ("fusion_engine", "fusion_score_engine", [
+        ("results", "scores.json"), ("results", "suspects.json"),
+        ("results", "forensic_report.json")
+    ]),
+    "build_visual_data": ("visualize_data", "build_visual_data", [
+        ("results", "visual_data.json")
+    ]),
+    "pdf": ("report_to_pdf", "convert_report_to_pdf", [
+        ("results", "forensic_report.pdf")
+    ]),
+}
+
+
+# --------------------------------------------------
+# WORKLOAD GENERATION
+# --------------------------------------------------
+_RECORD = np.dtype([
+    # libpcap record header (little-endian file)
+    ("ts_sec", "<u4"), ("ts_usec", "<u4"), ("incl_len", "<u4"), ("orig_len", "<u4"),
+    # Ethernet
+    ("eth", "V12"), ("ethertype", ">u2"),
+    # IPv4
+    ("ver_ihl", "u1"), ("tos", "u1"), ("ip_len", ">u2"), ("ip_id", ">u2"),
+    ("frag", ">u2"), ("ttl", "u1"), ("proto", "u1"), ("ip_csum", ">u2"),
+    ("src", ">u4"), ("dst", ">u4"),
+    # TCP
+    ("sport", ">u2"), ("dport", ">u2"), ("seq", ">u4"), ("ack", ">u4"),
+    ("data_off", "u1"), ("flags", "u1"), ("window", ">u2"),
+    ("tcp_csum", ">u2"), ("urg", ">u2"),
+])
+_HEADERS_LEN = _RECORD.itemsize - 16
+
+
+def _client_hello(variant):
+    """TLS ClientHello whose cipher order (hence JA3) depends on `variant`."""
+    ciphers = [0x1301, 0x1302, 0x1303, 0xC02B, 0xC02F, 0xC02C, 0xC030, 0xCCA9]
+    ciphers = ciphers[variant % len(ciphers):] + ciphers[:variant % len(ciphers)]
+    if variant >= len(ciphers):
+        ciphers.reverse()
+
+    groups = struct.pack("!HHH", 4, 29, 23)
+    exts = struct.pack("!HH", 0, 0)
+    exts += struct.pack("!HH", 10, len(groups)) + groups
+    exts += struct.pack("!HHBB", 11, 2, 1, 0)
+
+    body = (
+        struct.pack("!H", 0x0303) + bytes(32) + b"\x00"
+        + struct.pack("!H", len(ciphers) * 2) + struct.pack(f"!{len(ciphers)}H", *ciphers)
+        + b"\x01\x00" + struct.pack("!H", len(exts)) + exts
+    )
+    handshake = b"\x01" + len(body).to_bytes(3, "big") + body
+    return b"\x16\x03\x01" + struct.pack("!H", len(handshake)) + handshake
+
+
+def _ipv4_ints(addresses):
+    return np.array(
+        [int.from_bytes(bytes(map(int, a.split("."))), "big") for a in addresses],
+        dtype=np.uint32
+    )
+
+
+def benchmark_relays(seed):
+    """The synthetic relay set a workload's exit traffic is drawn from."""
+    return make_details_document(WORKLOAD_RELAYS, seed=seed)["relays"]
+
+
+def generate_workload(path, n_packets, seed=0, relays=None):
+    """
+    Writes a seeded libpcap capture of `n_packets` TCP packets: NATed
+    clients opening flows to clearnet servers and to the relays' exits,
+    each flow led by a ClientHello. Data packets are snap-length
+    truncated, so the file stays small while wire lengths vary.
+    """
+    rng = np.random.default_rng(seed)
+    relays = relays if relays is not None else benchmark_relays(seed)
+    exits = _ipv4_ints(sorted({a for r in relays for a in r["exit_addresses"]}))
+    clearnet = rng.integers(0x01000000, 0xDF000000, size=512, dtype=np.uint32)
+
+    n_clients = max(50, n_packets // 2000)
+    clients = (0x0A000000 | rng.integers(1, 1 << 24, size=n_clients)).astype(np.uint32)
+    client_ttl = rng.choice(np.array([64, 128], dtype=np.uint8), size=n_clients)
+    hellos = [np.frombuffer(_client_hello(v), dtype=np.uint8) for v in range(16)]
+    client_hello = rng.integers(0, len(hellos), size=n_clients)
+    hello_len = len(hellos[0])
+
+    t = 1_700_000_000.0
+    written = 0
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+
+        for start in range(0, n_packets, CHUNK_PACKETS):
+            n = min(CHUNK_PACKETS, n_packets - start)
+
+            # Flows laid out back to back; the first packet carries the hello.
+            # Lengths are drawn until they cover the chunk, then cut to n.
+            lengths = rng.geometric(1 / WORKLOAD_FLOW_LENGTH, size=n // WORKLOAD_FLOW_LENGTH + 64)
+            while lengths.sum() < n:
+                lengths = np.r_[lengths, rng.geometric(1 / WORKLOAD_FLOW_LENGTH, size=64)]
+            flow = np.repeat(np.arange(len(lengths)), lengths)[:n]
+            n_flows = int(flow[-1]) + 1
+            is_hello = np.r_[True, flow[1:] != flow[:-1]]
+
+            f_client = rng.integers(0, n_clients, size=n_flows)
+            f_server = np.where(
+                rng.random(n_flows) < WORKLOAD_EXIT_SHARE,
+                exits[rng.integers(0, len(exits), size=n_flows)] if len(exits) else clearnet[0],
+                clearnet[rng.integers(0, len(clearnet), size=n_flows)]
+            )
+            f_sport = rng.integers(1024, 65535, size=n_flows)
+
+            gaps = rng.exponential(1 / WORKLOAD_PPS, size=n)
+            ts = t + np.cumsum(gaps)
+            t = float(ts[-1])
+
+            rec = np.zeros(n, dtype=_RECORD)
+            rec["ts_sec"] = ts.astype(np.uint32)
+            rec["ts_usec"] = np.minimum(((ts % 1) * 1e6).round(), 999_999)
+            wire = rng.integers(_HEADERS_LEN, 1515, size=n)
+            rec["incl_len"] = np.where(is_hello, _HEADERS_LEN + hello_len, _HEADERS_LEN)
+            rec["orig_len"] = np.where(is_hello, _HEADERS_LEN + hello_len, wire)
+            rec["ethertype"] = 0x0800
+            rec["ver_ihl"] = 0x45
+            rec["ip_len"] = rec["orig_len"] - 14
+            rec["ttl"] = client_ttl[f_client[flow]]
+            rec["proto"] = 6
+            rec["src"] = clients[f_client[flow]]
+            rec["dst"] = f_server[flow]
+            rec["sport"] = f_sport[flow]
+            rec["dport"] = 443
+            rec["data_off"] = 0x50
+            rec["flags"] = 0x18
+            rec["window"] = rng.integers(1000, 65535, size=n)
+
+            # Variable-length records packed into one buffer
+            sizes = np.where(is_hello, _RECORD.itemsize + hello_len, _RECORD.itemsize)
+            offsets = np.r_[0, np.cumsum(sizes)[:-1]]
+            out = np.empty(int(sizes.sum()), dtype=np.uint8)
+            raw = rec.view(np.uint8).reshape(n, _RECORD.itemsize)
+            out[offsets[:, None] + np.arange(_RECORD.itemsize)] = raw
+
+            hello_rows = np.flatnonzero(is_hello)
+            hello_of = client_hello[f_client[flow[hello_rows]]]
+            body = offsets[hello_rows, None] + _RECORD.itemsize + np.arange(hello_len)
+            out[body] = np.stack(hellos)[hello_of]
+
+            f.write(out.tobytes())
+            written += len(sizes)
+
+    if written != n_packets:
+        os.remove(tmp)
+        raise RuntimeError(f"workload generator wrote {written:,} packets, expected {n_packets:,}")
+    os.replace(tmp, path)
+    return path
+
+
+def workload_path(n_packets, seed):
+    return os.path.join(BENCH_DIR, f"workload_{n_packets}_{seed}.pcap")
+
+
+# --------------------------------------------------
+# STAGE RUNNER (one fresh process per stage)
+# --------------------------------------------------
+def _path_size(path):
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path) for name in names
+        )
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _own_peak_rss_kib():
+    """
+    Peak RSS of this process in KiB. Linux carries ru_maxrss over exec from
+    the parent, so /proc's VmHWM (reset on exec) is preferred.
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _stage_child(stage, workdir, capture, conn):
+    """Runs one stage inside `workdir` and reports its cost through `conn`."""
+    backend = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [backend, os.path.dirname(backend)]
+    # This interpreter imported paths with the repo's roots: re-read them
+    # before any stage module binds its file paths
+    os.environ.update(case_environment(workdir))
+    importlib.reload(paths)
+    sys.stdout = open(os.devnull, "w")
+
+    module_name, func_name, outputs = STAGES[stage]
+    roots = {"data": paths.DATA_DIR, "results": paths.RESULTS_DIR}
+    outputs = [os.path.join(roots[root], name) for root, name in outputs]
+    try:
+        module = __import__(module_name)
+        func = getattr(module, func_name)
+
+        start = time.perf_counter()
+        if stage == "parse":
+            func(capture)
+        elif stage == "pdf":
+            with open(os.path.join(paths.RESULTS_DIR, "forensic_report.json"), "r") as f:
+                report = json.load(f)
+            pdf_bytes = func(report)
+            with open(outputs[0], "wb") as f:
+                f.write(pdf_bytes)
+        else:
+            func()
+        seconds = time.perf_counter() - start
+
+        missing = [p for p in outputs if not os.path.exists(p)]
+        if missing:
+            raise RuntimeError(f"no output written: {', '.join(missing)}")
+
+        # Sharded stages also count their worker processes
+        peak_kib = max(
+            _own_peak_rss_kib(),
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        )
+        conn.send({
+            "status": "ok",
+            "seconds": seconds,
+            "peak_rss_mb": round(peak_kib / 1024, 1),
+            "output_bytes": sum(_path_size(p) for p in outputs)
+        })
+    except Exception as e:
+        conn.send({"status": "error", "error": f"{type(e).__name__}: {e}"})
+
+
+def run_stage(stage, workdir, capture, timeout=STAGE_TIMEOUT_SEC):
+    """Runs one stage in a fresh interpreter so peak RSS is its own."""
+    ctx = mp.get_context("spawn")
+    recv, send = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_stage_child, args=(stage, workdir, capture, send))
+    proc.start()
+    send.close()
+
+    result = None
+    timed_out = not recv.poll(timeout)
+    if not timed_out:
+        try:
+            result = recv.recv()
+        except EOFError:
+            pass
+    if proc.is_alive():
+        proc.terminate()
+    proc.join()
+
+    if timed_out:
+        return {"status": "timeout", "error": f"exceeded {timeout}s"}
+    if result is None:
+        # Killed outright, typically by the OOM killer
+        return {"status": "crashed", "error": f"exit code {proc.exitcode}"}
+    return result
+
+
+def prepare_workdir(workdir, relays):
+    """Fresh directory laid out like the repo root, with the relay set."""
+    shutil.rmtree(workdir, ignore_errors=True)
+    env = case_environment(workdir)
+    os.makedirs(env["SHADOWFP_DATA_DIR"])
+    os.makedirs(env["SHADOWFP_RESULTS_DIR"])
+    with open(os.path.join(env["SHADOWFP_DATA_DIR"], "tor_nodes.json"), "w") as f:
+        json.dump({"relays": relays}, f)
+
+
+# --------------------------------------------------
+# SUITE
+# --------------------------------------------------
+def run_suite(sizes=DEFAULT_SIZES, stages=tuple(STAGES), seed=0,
+              timeout=STAGE_TIMEOUT_SEC, keep=False, repeat=1):
+    """
+    Benchmarks `stages` at every size, keeping the best of `repeat` runs.
+    A stage that fails or times out is not retried at larger sizes, and
+    the stages after it are skipped for that size (they would have no
+    input).
+    Returns the list of per-(stage, size) result dicts.
+    """
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    relays = benchmark_relays(seed)
+    results = []
+    gave_up = set()
+
+    for n in sorted(sizes):
+        capture = workload_path(n, seed)
+        if not os.path.exists(capture):
+            print(f"[+] Generating {n:,}-packet workload...")
+            generate_workload(capture, n, seed, relays)
+
+        workdir = os.path.abspath(os.path.join(BENCH_DIR, f"run_{n}"))
+        prepare_workdir(workdir, relays)
+        broken = None
+
+        # Earlier stages always run: they produce the next one's input
+        order = list(STAGES)
+        for stage in order[:max(order.index(s) for s in stages) + 1]:
+            if broken or stage in gave_up:
+                result = {"status": "skipped", "error": f"after {broken or stage} failed"}
+            else:
+                runs = [
+                    run_stage(stage, workdir, os.path.abspath(capture), timeout)
+                    for _ in range(repeat if stage in stages else 1)
+                ]
+                ok = [r for r in runs if r["status"] == "ok"]
+                result = min(ok, key=lambda r: r["seconds"]) if len(ok) == len(runs) else runs[-1]
+
+            row = {"stage": stage, "packets": n, **result}
+            if result["status"] == "ok":
+                row["packets_per_sec"] = round(n / result["seconds"]) if result["seconds"] else None
+                row["seconds"] = round(result["seconds"], 4)
+            else:
+                broken = broken or stage
+                gave_up.add(stage)
+                if stage not in stages and result["status"] != "skipped":
+                    _print_row(row)
+
+            if stage in stages:
+                results.append(row)
+                _print_row(row)
+
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return results
+
+
+def _print_row(row):
+    if row["status"] != "ok":
+        print(f"[!] {row['stage']:<22} {row['packets']:>11,}  {row['status']} {row.get('error', '')}")
+        return
+    print(
+        f"[✓] {row['stage']:<22} {row['packets']:>11,}  {row['seconds']:>9.3f}s"
+        f"  {row['packets_per_sec'] or 0:>12,} pkt/s  {row['peak_rss_mb']:>8.1f} MB"
+        f"  {row['output_bytes']:>13,} B"
+    )
+
+
+# --------------------------------------------------
+# SCALING + BASELINES
+# --------------------------------------------------
+def scaling_curves(results):
+    """
+    Per stage: the time-vs-size exponent between consecutive sizes (1.0 =
+    linear) and the first size where the stage stops scaling, i.e. turns
+    superlinear or fails.
+    """
+    curves = {}
+    for stage in STAGES:
+        rows = sorted((r for r in results if r["stage"] == stage), key=lambda r: r["packets"])
+        if not rows:
+            continue
+
+        points, stops_at, prev = [], None, None
+        for r in rows:
+            if r["status"] != "ok":
+                stops_at = stops_at or r["packets"]
+                break
+            if prev is not None and prev["seconds"] > 0 and r["seconds"] > 0:
+                exponent = math.log(r["seconds"] / prev["seconds"]) / math.log(r["packets"] / prev["packets"])
+                points.append({"from": prev["packets"], "to": r["packets"], "exponent": round(exponent, 2)})
+                if exponent > SUPERLINEAR_EXPONENT and stops_at is None:
+                    stops_at = r["packets"]
+            prev = r
+
+        curves[stage] = {"exponents": points, "stops_scaling_at": stops_at}
+    return curves
+
+
+def _result_key(row):
+    return f"{row['stage']}@{row['packets']}"
+
+
+def load_baseline(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    baseline = {
+        _result_key(r): {k: r[k] for k in ("seconds", "peak_rss_mb", "output_bytes")}
+        for r in results if r["status"] == "ok"
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=4, sort_keys=True)
+    print(f"[✓] Saved benchmark baseline → {path}")
+
+
+def compare_to_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Regressions against a stored baseline: slower or larger peak RSS by
+    more than `tolerance`, a stage that used to pass and now fails, or an
+    output size that changed (usually a behaviour change, not a slowdown).
+    """
+    findings = []
+    for r in results:
+        base = baseline.get(_result_key(r))
+        if base is None:
+            continue
+        key = _result_key(r)
+
+        if r["status"] != "ok":
+            findings.append({"key": key, "metric": "status", "baseline": "ok", "current": r["status"]})
+            continue
+
+        if (r["seconds"] > base["seconds"] * (1 + tolerance)
+                and r["seconds"] - base["seconds"] > MIN_REGRESSION_SEC):
+            findings.append({"key": key, "metric": "seconds", "baseline": base["seconds"], "current": r["seconds"]})
+        if r["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            findings.append({"key": key, "metric": "peak_rss_mb", "baseline": base["peak_rss_mb"], "current": r["peak_rss_mb"]})
+        if r["output_bytes"] != base["output_bytes"]:
+            findings.append({"key": key, "metric": "output_bytes", "baseline": base["output_bytes"], "current": r["output_bytes"]})
+    return findings
+
+
+def write_results(results, curves, regressions, seed, path=RESULTS_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "generated_on": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": seed,
+            "machine": {"cpus": os.cpu_count(), "python": sys.version.split()[0]},
+            "results": results,
+            "scaling": curves,
+            "regressions": regressions
+        }, f, indent=4)
+    print(f"[✓] Saved benchmark results → {path}")
+
+
+def _parse_size(text):
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ShadowFingerprint stage benchmarks")
+    parser.add_argument("--sizes", help="comma-separated packet counts, e.g. 10k,1m,50m")
+    parser.add_argument("--full", action="store_true", help="10K → 50M packets")
+    parser.add_argument("--stages", help=f"comma-separated subset of: {', '.join(STAGES)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage, best time kept")
+    parser.add_argument("--timeout", type=float, default=STAGE_TIMEOUT_SEC, help="seconds per stage run")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--keep", action="store_true", help="keep per-size work directories")
+    args = parser.parse_args()
+
+    if args.sizes:
+        sizes = [_parse_size(s) for s in args.sizes.split(",")]
+    else:
+        sizes = FULL_SIZES if args.full else DEFAULT_SIZES
+    stages = tuple(args.stages.split(",")) if args.stages else tuple(STAGES)
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    print(f"[+] Benchmarking {len(stages)} stages at {', '.join(f'{n:,}' for n in sorted(sizes))} packets")
+    results = run_suite(sizes, stages, args.seed, args.timeout, args.keep, args.repeat)
+    curves = scaling_curves(results)
+
+    for stage, curve in curves.items():
+        if curve["stops_scaling_at"]:
+            print(f"[!] {stage} stops scaling at {curve['stops_scaling_at']:,} packets")
+
+    regressions = []
+    baseline = load_baseline()
+    if args.save_baseline:
+        save_baseline(results)
+    elif baseline is None:
+        print(f"[!] No baseline at {BASELINE_FILE} (run with --save-baseline)")
+    else:
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for r in regressions:
+            print(f"[!] Regression {r['key']} {r['metric']}: {r['baseline']} → {r['current']}")
+        if not regressions:
+            print("[✓] No regressions against baseline")
+
+    write_results(results, curves, regressions, args.seed)
+    sys.exit(1 if regressions else 0)
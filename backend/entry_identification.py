@@ -5,16 +5,21 @@
 # ==============================================================================
 
 
+import argparse
 import json
 import os
-from collections import defaultdict
-import statistics
+from itertools import pairwise
 
-RESULTS_DIR = "backend/results"
+from ip_index import IPInterner
+from paths import RESULTS_DIR
+from profiling import count, profiled
+from ranking import score_key, select_top
 
 CORRELATED_FILE = os.path.join(RESULTS_DIR, "correlated_paths.json")
 OUT_FILE = os.path.join(RESULTS_DIR, "entry_nodes.json")
 
+ENTRY_KEY = score_key("entry_score")
+
 
 def load_json(path):
     if not os.path.exists(path):
@@ -24,7 +29,171 @@ def load_json(path):
         return json.load(f)
 
 
-def identify_entry_nodes():
+# --------------------------------------------------
+# STREAMING ACCUMULATORS
+# --------------------------------------------------
+class RunningStats:
+    """
+    Welford mean / population variance in O(1) memory. Two instances
+    combine with merge() (Chan et al.), so shards can be summed up.
+    """
+
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.mean += delta * other.n / n
+        self.n = n
+        return self
+
+    def variance(self):
+        """Population variance; 0 below two samples (like the old pvariance guard)."""
+        return self.m2 / self.n if self.n > 1 else 0
+
+
+class SourceStats:
+    """
+    Per-source-IP behaviour: connection count, packet size variance and the
+    variance of inter-arrival gaps. Timestamps must arrive in time order;
+    only the last one is kept to form the next gap.
+    """
+
+    __slots__ = ("connections", "sizes", "gaps", "first_ts", "last_ts")
+
+    def __init__(self):
+        self.connections = 0
+        self.sizes = RunningStats()
+        self.gaps = RunningStats()
+        self.first_ts = None
+        self.last_ts = None
+
+    def add(self, size, timestamp):
+        if self.last_ts is None:
+            self.first_ts = timestamp
+        elif timestamp < self.last_ts:
+            raise ValueError("SourceStats.add() needs time-ordered timestamps")
+        else:
+            self.gaps.add(timestamp - self.last_ts)
+        self.last_ts = timestamp
+        self.connections += 1
+        self.sizes.add(size)
+
+    def merge(self, other):
+        """
+        Folds in another shard's stats. The shards must not overlap in
+        time; the gap across the seam is counted like any other.
+        """
+        if other.connections == 0:
+            return self
+        if self.connections == 0:
+            self.connections = other.connections
+            self.sizes.merge(other.sizes)
+            self.gaps.merge(other.gaps)
+            self.first_ts, self.last_ts = other.first_ts, other.last_ts
+            return self
+
+        if other.first_ts >= self.last_ts:
+            seam = other.first_ts - self.last_ts
+            self.last_ts = other.last_ts
+        elif other.last_ts <= self.first_ts:
+            seam = self.first_ts - other.last_ts
+            self.first_ts = other.first_ts
+        else:
+            raise ValueError("SourceStats.merge() needs shards disjoint in time")
+
+        self.connections += other.connections
+        self.sizes.merge(other.sizes)
+        self.gaps.merge(other.gaps)
+        self.gaps.add(seam)
+        return self
+
+
+def accumulate_entry_stats(paths, interner):
+    """
+    One pass over the correlated paths → {interned src id: SourceStats}.
+    Paths are normally already in time order; otherwise they are visited
+    through a sorted view rather than buffering timestamps per IP.
+    """
+    if any(b["timestamp"] < a["timestamp"] for a, b in pairwise(paths)):
+        paths = sorted(paths, key=lambda p: p["timestamp"])
+
+    stats = {}
+    for p in paths:
+        src = interner.intern(p["src_ip"])
+        acc = stats.get(src)
+        if acc is None:
+            acc = stats[src] = SourceStats()
+        acc.add(p["packet_size"], p["timestamp"])
+    return stats
+
+
+def entry_row(user_ip, data):
+    """
+    Entry-node score of one source IP from its SourceStats.
+    """
+    freq_score = data.connections
+    size_variance = data.sizes.variance()
+    time_consistency = data.gaps.variance()
+
+    # Lower variance = more automation = more suspicious
+    score = (
+        freq_score * 2
+        + max(0, 1000 - size_variance)
+        + max(0, 1000 - time_consistency)
+    )
+
+    return {
+        "user_ip": user_ip,
+        "connections": freq_score,
+        "size_variance": round(size_variance, 2),
+        "time_variance": round(time_consistency, 2),
+        "entry_score": round(score, 2)
+    }
+
+
+def entry_rows(paths):
+    """
+    Entry rows for every source IP of the correlated paths, unranked
+    (first-seen order).
+    """
+    # Aggregate behavior per source IP (keyed by interned id, not by string)
+    interner = IPInterner()
+    stats = accumulate_entry_stats(paths, interner)
+    return [entry_row(interner.lookup(ip_id), data) for ip_id, data in stats.items()]
+
+
+def score_entry_nodes(paths, top_k=None):
+    """
+    Scores every source IP of the correlated paths, most suspicious first
+    (only the best `top_k` when given).
+    """
+    return select_top(entry_rows(paths), top_k, key=ENTRY_KEY)
+
+
+def save_entry_nodes(results):
+    with open(OUT_FILE, "w") as f:
+        json.dump(results, f, indent=4)
+
+    print(f"[✓] Saved entry node predictions → {OUT_FILE}")
+
+
+@profiled("identify_entry_nodes")
+def identify_entry_nodes(top_k=None):
     print("[+] Identifying probable entry/origin nodes...")
 
     paths = load_json(CORRELATED_FILE)
@@ -32,69 +201,14 @@ def identify_entry_nodes():
         print("[!] No correlated paths available")
         return
 
-    stats = defaultdict(lambda: {
-        "connections": 0,
-        "packet_sizes": [],
-        "timestamps": []
-    })
-
-    # -----------------------------------
-    # Aggregate behavior per source IP
-    # -----------------------------------
-    for p in paths:
-        src = p["src_ip"]
-        stats[src]["connections"] += 1
-        stats[src]["packet_sizes"].append(p["packet_size"])
-        stats[src]["timestamps"].append(p["timestamp"])
-
-    results = []
-
-    # -----------------------------------
-    # Scoring logic (forensic-friendly)
-    # -----------------------------------
-    for ip, data in stats.items():
-        freq_score = data["connections"]
-
-        size_variance = (
-            statistics.pvariance(data["packet_sizes"])
-            if len(data["packet_sizes"]) > 1 else 0
-        )
-
-        time_gaps = [
-            t2 - t1
-            for t1, t2 in zip(
-                sorted(data["timestamps"])[:-1],
-                sorted(data["timestamps"])[1:]
-            )
-        ]
-        time_consistency = (
-            statistics.pvariance(time_gaps)
-            if len(time_gaps) > 1 else 0
-        )
-
-        # Lower variance = more automation = more suspicious
-        score = (
-            freq_score * 2
-            + max(0, 1000 - size_variance)
-            + max(0, 1000 - time_consistency)
-        )
-
-        results.append({
-            "user_ip": ip,
-            "connections": freq_score,
-            "size_variance": round(size_variance, 2),
-            "time_variance": round(time_consistency, 2),
-            "entry_score": round(score, 2)
-        })
-
-    # Sort by suspicion score
-    results.sort(key=lambda x: x["entry_score"], reverse=True)
-
-    with open(OUT_FILE, "w") as f:
-        json.dump(results, f, indent=4)
-
-    print(f"[✓] Saved entry node predictions → {OUT_FILE}")
+    entry_nodes = score_entry_nodes(paths, top_k)
+    count(records_in=len(paths), records_out=len(entry_nodes))
+    save_entry_nodes(entry_nodes)
 
 
 if __name__ == "__main__":
-    identify_entry_nodes()
+    parser = argparse.ArgumentParser(description="Score probable entry/origin nodes")
+    parser.add_argument("--top", type=int, metavar="K", help="keep only the K most suspicious source IPs")
+    args = parser.parse_args()
+
+    identify_entry_nodes(args.top)
@@ -0,0 +1,256 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+Bidirectional flow assembly.
+
+Groups the packets of a PacketStore into flows keyed by their
+direction-independent 5-tuple (protocol, both addresses, both ports).
+A flow ends after FLOW_IDLE_TIMEOUT seconds without packets and is cut
+every FLOW_ACTIVE_TIMEOUT seconds, as NetFlow/IPFIX exporters do.
+
+The resulting FlowTable uses the PacketStore column layout, so the
+correlation kernel, entry identification and guard prediction run on
+flows exactly as they would on packets, on an input that is smaller by
+the mean flow length.
+"""
+
+import numpy as np
+
+from packet_store import IPV6_DTYPE, PacketStore, _v4_to_v6_column
+
+# Seconds without a packet after which a flow is closed
+FLOW_IDLE_TIMEOUT = 15.0
+# Longest a flow runs before it is cut into a new one
+FLOW_ACTIVE_TIMEOUT = 120.0
+# Leading bursts kept per flow
+MAX_BURSTS = 32
+# Byte-count time series: bin width, and bins kept from the flow's start
+SERIES_BIN_SEC = 0.01
+MAX_SERIES_BINS = 1024
+
+
+# --------------------------------------------------
+# FLOW TABLE
+# --------------------------------------------------
+class FlowTable(PacketStore):
+    """
+    One row per flow, in start-time order, readable through the
+    PacketStore API:
+
+        timestamp    start (ticks of 1/resolution s)
+        src_ip/port  initiator (sender of the flow's first packet)
+        dst_ip/port  responder
+        length       mean wire length of the flow's packets
+        ttl, tcp_window
+                     from the first packet (the initiator's side)
+        ja3, ja3s, ja4
+                     code of the flow's first packet carrying each
+                     fingerprint (tables in `fingerprint_tables`)
+
+    plus end, packets, bytes, out_packets and out_bytes (initiator →
+    responder). bursts(i) is flow i's burst vector: bytes of each run of
+    consecutive packets in one direction, positive when sent by the
+    initiator, negative for the responder. series(i) is its byte-count
+    time series, `series_bin_sec` bins counted from the flow's start.
+
+    Both are ragged: `bursts` and `series` hold (offsets, values...) with
+    flow i's entries at [offsets[i], offsets[i + 1]).
+    """
+
+    def __init__(self, columns, resolution, fingerprint_tables, bursts, series, series_bin_sec):
+        self.store_dir = None
+        self.count = len(columns["timestamp"])
+        self.resolution = resolution
+        self.fingerprint_tables = fingerprint_tables
+        self.ja3_table = fingerprint_tables["ja3"]
+        self.columns = columns
+        self.burst_offsets, self.burst_bytes = bursts
+        self.series_offsets, self.series_bins, self.series_bytes = series
+        self.series_bin_sec = series_bin_sec
+
+    def bursts(self, i):
+        return self.burst_bytes[self.burst_offsets[i]: self.burst_offsets[i + 1]].tolist()
+
+    def series(self, i):
+        """Flow i's dense byte-count series (zeros where no packet fell)."""
+        lo, hi = self.series_offsets[i], self.series_offsets[i + 1]
+        bins = self.series_bins[lo:hi]
+        out = np.zeros(int(bins[-1]) + 1 if hi > lo else 0, dtype=np.int64)
+        out[bins] = self.series_bytes[lo:hi]
+        return out
+
+    def durations(self):
+        """Flow durations in seconds."""
+        return (self.columns["end"] - self.columns["timestamp"]) / self.resolution
+
+    def path_fields(self, rows):
+        """Per-flow totals added to the correlated paths of flows `rows`."""
+        packets = self.columns["packets"][rows].tolist()
+        sizes = self.columns["bytes"][rows].tolist()
+        durations = self.durations()[rows].tolist()
+        return [
+            {"flow_packets": p, "flow_bytes": b, "duration": round(d, 6)}
+            for p, b, d in zip(packets, sizes, durations)
+        ]
+
+
+def _ragged(groups, n_groups, *values):
+    """(offsets, *values) for values already grouped by ascending `groups`."""
+    offsets = np.zeros(n_groups + 1, dtype=np.int64)
+    np.cumsum(np.bincount(groups, minlength=n_groups), out=offsets[1:])
+    return (offsets, *values)
+
+
+def _ragged_take(ragged, order):
+    """Reorders the groups of an (offsets, *values) ragged array by `order`."""
+    offsets, *values = ragged
+    counts = np.diff(offsets)[order]
+    new_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_offsets[1:])
+    take = np.repeat(offsets[:-1][order] - new_offsets[:-1], counts) + np.arange(new_offsets[-1])
+    return (new_offsets, *(v[take] for v in values))
+
+
+# --------------------------------------------------
+# ASSEMBLY
+# --------------------------------------------------
+def _flow_starts(key_change, ticks, idle_ticks, active_ticks):
+    """Positions (in 5-tuple/time order) where a new flow begins."""
+    n = len(ticks)
+    new_flow = np.r_[True, key_change | (np.diff(ticks) > idle_ticks)]
+    starts = np.flatnonzero(new_flow)
+
+    # Cut flows longer than the active timeout; only those are walked
+    ends = np.r_[starts[1:], n]
+    long = ticks[ends - 1] - ticks[starts] > active_ticks
+    cuts = []
+    for lo, hi in zip(starts[long].tolist(), ends[long].tolist()):
+        while True:
+            lo += int(np.searchsorted(ticks[lo:hi], ticks[lo] + active_ticks, side="right"))
+            if lo >= hi:
+                break
+            cuts.append(lo)
+    if cuts:
+        starts = np.union1d(starts, cuts)
+    return starts
+
+
+def _empty_flows(store, series_bin_sec):
+    """FlowTable with no rows, for an empty capture."""
+    columns = {name: np.empty(0, dtype=col.dtype) for name, col in store.columns.items()}
+    for name in ("end", "packets", "bytes", "out_packets", "out_bytes"):
+        columns[name] = np.empty(0, dtype=np.int64)
+    offsets, empty = np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return FlowTable(columns, store.resolution, store.fingerprint_tables,
+                     (offsets, empty), (offsets, empty, empty), series_bin_sec)
+
+
+def assemble_flows(store, idle_timeout=FLOW_IDLE_TIMEOUT, active_timeout=FLOW_ACTIVE_TIMEOUT,
+                   max_bursts=MAX_BURSTS, series_bin_sec=SERIES_BIN_SEC,
+                   max_series_bins=MAX_SERIES_BINS):
+    """
+    Builds the FlowTable of a PacketStore. Everything is array work: one
+    stable sort by (5-tuple, time), boundaries where the key changes or a
+    timeout hits, and reduceat() for the per-flow totals.
+    """
+    n = len(store)
+    if n == 0:
+        return _empty_flows(store, series_bin_sec)
+    ticks = np.asarray(store["timestamp"], dtype=np.int64)
+
+    src, dst = np.asarray(store["src_ip"]), np.asarray(store["dst_ip"])
+    if src.dtype != dst.dtype:
+        src, dst = (c if c.dtype == np.dtype(IPV6_DTYPE) else _v4_to_v6_column(c) for c in (src, dst))
+    sport = np.asarray(store["src_port"], dtype=np.int64)
+    dport = np.asarray(store["dst_port"], dtype=np.int64)
+    proto = np.asarray(store["proto"])
+
+    # Addresses as ordered codes, so each packet's endpoints can be put in
+    # a canonical (lower, higher) order whichever way it travels
+    _, codes = np.unique(np.concatenate([src, dst]), return_inverse=True)
+    c_src, c_dst = codes[:n], codes[n:]
+    forward = (c_src < c_dst) | ((c_src == c_dst) & (sport <= dport))
+    a_ip, b_ip = np.where(forward, c_src, c_dst), np.where(forward, c_dst, c_src)
+    a_port, b_port = np.where(forward, sport, dport), np.where(forward, dport, sport)
+
+    # Stable: packets of one flow sharing a timestamp keep capture order
+    order = np.lexsort((ticks, b_port, b_ip, a_port, a_ip, proto))
+    key = [k[order] for k in (proto, a_ip, a_port, b_ip, b_port)]
+    key_change = np.zeros(max(n - 1, 0), dtype=bool)
+    for k in key:
+        key_change |= k[1:] != k[:-1]
+    t = ticks[order]
+
+    starts = _flow_starts(
+        key_change, t, idle_timeout * store.resolution, active_timeout * store.resolution
+    )
+    ends = np.r_[starts[1:], n]
+    first = order[starts]
+    is_start = np.zeros(n, dtype=bool)
+    is_start[starts] = True
+    flow_of = np.cumsum(is_start) - 1
+
+    # Direction relative to the flow's initiator
+    fwd = forward[order]
+    outbound = fwd == fwd[starts][flow_of]
+
+    length = np.asarray(store["length"], dtype=np.int64)[order]
+    packets = ends - starts
+    total_bytes = np.add.reduceat(length, starts)
+
+    def first_code(name):
+        """Per flow, the first non-zero code of a fingerprint column (0 if none)."""
+        codes = np.asarray(store[name])[order]
+        first_fp = np.minimum.reduceat(np.where(codes != 0, np.arange(n), n), starts)
+        return np.where(first_fp < n, codes[np.minimum(first_fp, n - 1)], 0).astype("<u4")
+
+    columns = {
+        "timestamp": t[starts],
+        "end": t[ends - 1],
+        "src_ip": src[first],
+        "dst_ip": dst[first],
+        "length": np.minimum(total_bytes // packets, 0xFFFF).astype("<u2"),
+        "ttl": np.asarray(store["ttl"])[first],
+        "tcp_window": np.asarray(store["tcp_window"])[first],
+        "ja3": first_code("ja3"),
+        "ja3s": first_code("ja3s"),
+        "ja4": first_code("ja4"),
+        "proto": proto[first],
+        "src_port": sport[first].astype("<u2"),
+        "dst_port": dport[first].astype("<u2"),
+        "packets": packets,
+        "bytes": total_bytes,
+        "out_packets": np.add.reduceat(outbound.astype(np.int64), starts),
+        "out_bytes": np.add.reduceat(np.where(outbound, length, 0), starts),
+    }
+
+    # Bursts: runs of one direction, the first `max_bursts` per flow
+    burst_start = is_start | np.r_[True, outbound[1:] != outbound[:-1]]
+    bs = np.flatnonzero(burst_start)
+    signed = np.where(outbound[bs], 1, -1) * np.add.reduceat(length, bs)
+    burst_flow = flow_of[bs]
+    keep = np.arange(len(bs)) - np.searchsorted(bs, starts)[burst_flow] < max_bursts
+    bursts = _ragged(burst_flow[keep], len(starts), signed[keep])
+
+    # Byte-count series: packets are time-ordered within a flow, so each
+    # non-empty bin is one run of equal bin numbers
+    bin_ticks = max(1, round(series_bin_sec * store.resolution))
+    rel = (t - t[starts][flow_of]) // bin_ticks
+    rs = np.flatnonzero(is_start | np.r_[True, rel[1:] != rel[:-1]])
+    keep = rel[rs] < max_series_bins
+    series = _ragged(flow_of[rs][keep], len(starts), rel[rs][keep], np.add.reduceat(length, rs)[keep])
+
+    # Flows in start-time order (ties: first packet's capture position)
+    by_start = np.lexsort((first, columns["timestamp"]))
+    columns = {name: col[by_start] for name, col in columns.items()}
+
+    flows = FlowTable(
+        columns, store.resolution, store.fingerprint_tables,
+        _ragged_take(bursts, by_start), _ragged_take(series, by_start), bin_ticks / store.resolution
+    )
+    print(f"[✓] Assembled {len(flows):,} flows from {n:,} packets")
+    return flows
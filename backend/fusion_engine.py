@@ -4,16 +4,22 @@
 # HACKATHON: TN Police Hackathon 2025
 # ==============================================================================
 
+import argparse
+import heapq
 import json
 import os
 from collections import defaultdict
 from datetime import datetime
 import math # Added for safe max/min operations
 
+from ip_index import IPInterner
+from paths import RESULTS_DIR
+from profiling import count, profiled
+from ranking import score_key, select_top
+
 # --------------------------------------------------
 # PATHS
 # --------------------------------------------------
-RESULTS_DIR = "backend/results"
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
 CORRELATED_FILE = os.path.join(RESULTS_DIR, "correlated_paths.json")
@@ -23,12 +29,35 @@ GUARD_FILE = os.path.join(RESULTS_DIR, "guard_nodes.json")
 SCORES_FILE = os.path.join(RESULTS_DIR, "scores.json")
 SUSPECTS_FILE = os.path.join(RESULTS_DIR, "suspects.json")
 REPORT_FILE = os.path.join(RESULTS_DIR, "forensic_report.json")
+SHAPE_FILE = os.path.join(RESULTS_DIR, "shape_matches.json")
+
+# --------------------------------------------------
+# FUSION WEIGHTS
+# --------------------------------------------------
+WEIGHTS = {
+    "temporal": 0.60, # Weight for timing/pattern match
+    "entry": 0.25,    # Weight for automated behavior/frequency
+    "guard": 0.15,    # Weight for stable circuit reuse
+    "shape": 0.15     # Weight for traffic-shape matches (only when available)
+}
+
+# (base, scale) each signal is normalized into, and the component score a
+# user gets for a signal it has no data for
+NORMALIZATION = {
+    "temporal": (0.55, 0.40),
+    "entry": (0.55, 0.40),
+    "guard": (0.55, 0.30),
+    "shape": (0.55, 0.40)
+}
+MISSING_SCORE = {"temporal": 0.6, "entry": 0.6, "guard": 0.55, "shape": 0.55}
+
+SUSPECT_KEY = score_key("final_score")
 
 
 # --------------------------------------------------
 # HELPERS
 # --------------------------------------------------
-def compute_session_spread(correlated):
+def compute_session_spread(correlated, interner):
     """
     Computes session duration (last_seen - first_seen) per user
     Used as a tie-breaker signal
@@ -37,7 +66,7 @@ def compute_session_spread(correlated):
 
     for pkt in correlated:
         if "timestamp" in pkt:
-            times[pkt["src_ip"]].append(pkt["timestamp"])
+            times[interner.intern(pkt["src_ip"])].append(pkt["timestamp"])
 
     spread = {}
     for user, ts in times.items():
@@ -76,11 +105,18 @@ def normalize_scores(score_dict, base=0.55, scale=0.40):
         return {k: base for k in score_dict}
 
     return {
-        k: round(base + (v / max_val) * scale, 4) # Increased precision for component scores
+        k: normalize_value(v, max_val, base, scale)
         for k, v in score_dict.items()
     }
 
-def compute_first_seen_offset(correlated):
+
+def normalize_value(value, max_val, base=0.55, scale=0.40):
+    """One entry of normalize_scores(), given the signal's current maximum."""
+    if max_val == 0:
+        return base
+    return round(base + (value / max_val) * scale, 4) # Increased precision for component scores
+
+def compute_first_seen_offset(correlated, interner):
     """
     Computes how early a user's Tor activity started.
     Earlier start = slightly higher suspicion.
@@ -88,14 +124,19 @@ def compute_first_seen_offset(correlated):
     first_seen = {}
 
     for pkt in correlated:
-        user = pkt.get("src_ip")
+        user = interner.intern(pkt.get("src_ip"))
         ts = pkt.get("timestamp")
-        if user and ts:
+        if user is not None and ts:
             if user not in first_seen:
                 first_seen[user] = ts
             else:
                 first_seen[user] = min(first_seen[user], ts)
 
+    return first_seen_offsets(first_seen)
+
+
+def first_seen_offsets(first_seen):
+    """{user: first timestamp} → tiny 0.0 – 0.01 bonus, earliest highest."""
     if not first_seen:
         return {}
 
@@ -115,20 +156,18 @@ def compute_first_seen_offset(correlated):
 # --------------------------------------------------
 # FUSION ENGINE
 # --------------------------------------------------
-def fusion_score_engine():
-    print("[+] Computing fusion-based suspect scores (FR 4)...")
-
-    correlated = load_json(CORRELATED_FILE)
-    entry_nodes = load_json(ENTRY_FILE)
-    guard_nodes = load_json(GUARD_FILE)
-
-    first_seen_bonus = compute_first_seen_offset(correlated)
-
-    if not correlated:
-        print("[!] Correlated traffic missing. Cannot score suspects.")
-        return
+def score_suspects(correlated, entry_nodes, guard_nodes, weights=WEIGHTS, top_k=None,
+                   shape_matches=None):
+    """
+    Fuses the temporal, entry and guard signals (and the traffic-shape
+    matches, when there are any) into the ranked suspect list (highest
+    final_score first; only the best `top_k` when given).
+    """
+    # All per-user maps below are keyed by interned id
+    interner = IPInterner()
+    first_seen_bonus = compute_first_seen_offset(correlated, interner)
     
-    spread_raw = compute_session_spread(correlated)
+    spread_raw = compute_session_spread(correlated, interner)
     spread_score = normalize_scores(
         spread_raw,
         base=0.00,
@@ -142,9 +181,7 @@ def fusion_score_engine():
     temporal_raw = defaultdict(float)
     for pkt in correlated:
         # Sum the temporal match strength for each user
-        temporal_raw[pkt["src_ip"]] += pkt.get("temporal_match_score", 0)
-
-    temporal_score = normalize_scores(temporal_raw)
+        temporal_raw[interner.intern(pkt["src_ip"])] += pkt.get("temporal_match_score", 0)
 
     # --------------------------------------------------
     # STEP 2: ENTRY NODE SCORE (FR 3)
@@ -152,9 +189,7 @@ def fusion_score_engine():
     entry_raw = defaultdict(float)
     for entry in entry_nodes:
         # Assumes 'entry_score' is a raw score calculated in entry_identification.py
-        entry_raw[entry["user_ip"]] += entry.get("entry_score", 0)
-
-    entry_score = normalize_scores(entry_raw)
+        entry_raw[interner.intern(entry["user_ip"])] += entry.get("entry_score", 0)
 
     # --------------------------------------------------
     # STEP 3: GUARD NODE STABILITY SCORE (FR 6)
@@ -162,68 +197,312 @@ def fusion_score_engine():
     guard_raw = defaultdict(float)
     # guard_nodes contains pre-calculated confidence scores
     for g in guard_nodes:
-        guard_raw[g["user_ip"]] += g.get("confidence", 0)
+        guard_raw[interner.intern(g["user_ip"])] += g.get("confidence", 0)
+
+    # --------------------------------------------------
+    # STEP 3.5: TRAFFIC-SHAPE SCORE (shape_correlation.py)
+    # --------------------------------------------------
+    shape_raw = defaultdict(float)
+    for m in shape_matches or []:
+        shape_raw[interner.intern(m["src_ip"])] += m.get("shape_score", 0)
+
+    return fuse_scores(
+        temporal_raw, entry_raw, guard_raw, first_seen_bonus, interner, weights, top_k, shape_raw
+    )
 
-    guard_score = normalize_scores(guard_raw, base=0.55, scale=0.30)
+
+def fuse_scores(temporal_raw, entry_raw, guard_raw, first_seen_bonus, interner, weights=WEIGHTS,
+                top_k=None, shape_raw=None):
+    """
+    Normalizes the per-user raw signals (dicts keyed by interned id) and
+    fuses them into the ranked suspect list. Normalization always sees
+    every user; `top_k` only bounds what is ranked and returned.
+    """
+    temporal_score = normalize_scores(temporal_raw, *NORMALIZATION["temporal"])
+    entry_score = normalize_scores(entry_raw, *NORMALIZATION["entry"])
+    guard_score = normalize_scores(guard_raw, *NORMALIZATION["guard"])
+    shape_score = normalize_scores(shape_raw or {}, *NORMALIZATION["shape"])
 
     # --------------------------------------------------
     # STEP 4: FUSION (WEIGHTED + CLAMPED)
     # --------------------------------------------------
-    WEIGHTS = {
-        "temporal": 0.60, # Weight for timing/pattern match
-        "entry": 0.25,    # Weight for automated behavior/frequency
-        "guard": 0.15     # Weight for stable circuit reuse
-    }
-
-    users = set(temporal_score) | set(entry_score) | set(guard_score)
+    users = set(temporal_score) | set(entry_score) | set(guard_score) | set(shape_score)
     suspects = []
 
     for user in users:
         # Get component scores, default to the BASE of the normalization if metric is missing
-        t_score = temporal_score.get(user, 0.6)
-        e_score = entry_score.get(user, 0.6)
-        g_score = guard_score.get(user, 0.55) 
-
-        # Calculate final weighted score
-        fs_bonus = first_seen_bonus.get(user, 0.0)
-
-        final = (
-            t_score * WEIGHTS["temporal"]
-            + e_score * WEIGHTS["entry"]
-            + g_score * WEIGHTS["guard"]
-            + fs_bonus
+        t_score = temporal_score.get(user, MISSING_SCORE["temporal"])
+        e_score = entry_score.get(user, MISSING_SCORE["entry"])
+        g_score = guard_score.get(user, MISSING_SCORE["guard"])
+        # Only a case with shape matches fuses the shape signal at all
+        s_score = shape_score.get(user, MISSING_SCORE["shape"]) if shape_score else None
+
+        final = fuse_components(
+            t_score, e_score, g_score, first_seen_bonus.get(user, 0.0), weights, s_score
         )
 
+        # EO 2: Save full breakdown for suspect ranking table
+        suspects.append(suspect_row(interner.lookup(user), t_score, e_score, g_score, final, s_score))
 
-        # Clamp confidence to realistic forensic bounds (0.95 max)
-        final = min(final, 0.95)
+    return select_top(suspects, top_k, key=SUSPECT_KEY)
 
-        # EO 2: Save full breakdown for suspect ranking table
-        suspects.append({
-            "user_ip": user,
-            "temporal_score": round(t_score, 4),
-            "entry_score": round(e_score, 4),
-            "guard_score": round(g_score, 4),
-            "final_score": final
-        })
 
-    suspects.sort(key=lambda x: x["final_score"], reverse=True)
+def fuse_components(t_score, e_score, g_score, fs_bonus, weights=WEIGHTS, s_score=None):
+    """
+    Weighted sum of the normalized signals plus the first-seen bonus. The
+    shape score, when given, is mixed in at weights["shape"] and the sum
+    rescaled to the other weights' total, keeping final scores comparable
+    with and without it.
+    """
+    final = (
+        t_score * weights["temporal"]
+        + e_score * weights["entry"]
+        + g_score * weights["guard"]
+    )
+    if s_score is not None:
+        total = weights["temporal"] + weights["entry"] + weights["guard"]
+        w_shape = weights.get("shape", 0.0)
+        final = (final + s_score * w_shape) * total / (total + w_shape)
+    final += fs_bonus
+
+    # Clamp confidence to realistic forensic bounds (0.95 max)
+    return min(final, 0.95)
+
+
+def suspect_row(user_ip, t_score, e_score, g_score, final, s_score=None):
+    row = {
+        "user_ip": user_ip,
+        "temporal_score": round(t_score, 4),
+        "entry_score": round(e_score, 4),
+        "guard_score": round(g_score, 4),
+    }
+    if s_score is not None:
+        row["shape_score"] = round(s_score, 4)
+    row["final_score"] = final
+    return row
 
-    # --------------------------------------------------
-    # STEP 5: SAVE OUTPUTS (EO 3)
-    # --------------------------------------------------
-    with open(SCORES_FILE, "w") as f:
-        json.dump(suspects, f, indent=4)
 
-    with open(SUSPECTS_FILE, "w") as f:
-        json.dump(suspects, f, indent=4)
+# --------------------------------------------------
+# INCREMENTAL FUSION (live scoring)
+# Every component is divided by its signal's maximum, so a new path only
+# moves one user's final score unless it changes a maximum (or the first
+# and last first-seen times the bonus is spread over). Per-user updates
+# are O(log n) heap pushes; a changed maximum marks the ranking stale and
+# it is renormalized once, on the next read.
+# --------------------------------------------------
+class MaxTracker:
+    """
+    Maximum over a keyed set of values that can go up, down or away.
+    Lazy-deletion heap: stale entries are skipped when they surface and
+    the heap is rebuilt once they outnumber the live ones.
+    """
 
-    # --------------------------------------------------
-    # STEP 6: FORENSIC REPORT (EO 3)
-    # --------------------------------------------------
+    def __init__(self):
+        self.values = {}
+        self._heap = []
+
+    def set(self, key, value):
+        self.values[key] = value
+        heapq.heappush(self._heap, (-value, key))
+        if len(self._heap) > 2 * len(self.values) + 64:
+            self._heap = [(-v, k) for k, v in self.values.items()]
+            heapq.heapify(self._heap)
+
+    def discard(self, key):
+        self.values.pop(key, None)
+
+    def max(self, default=None):
+        heap = self._heap
+        while heap and self.values.get(heap[0][1]) != -heap[0][0]:
+            heapq.heappop(heap)
+        return -heap[0][0] if heap else default
+
+
+class RankedScores:
+    """
+    Keyed scores ordered highest first; ties keep the order keys were
+    first seen in, like a stable sort over insertion order. update() is
+    O(log n); top(k) is O(k log n) and leaves the ranking in place.
+    """
+
+    def __init__(self):
+        self.scores = {}
+        self._seq = {}
+        self._heap = []
+
+    def __len__(self):
+        return len(self.scores)
+
+    def update(self, key, score):
+        if self.scores.get(key) == score:
+            return
+        self.scores[key] = score
+        seq = self._seq.setdefault(key, len(self._seq))
+        heapq.heappush(self._heap, (-score, seq, key))
+        if len(self._heap) > 2 * len(self.scores) + 64:
+            self.rebuild()
+
+    def remove(self, key):
+        self.scores.pop(key, None)
+
+    def replace(self, scores):
+        """Swaps in a whole new set of scores (after renormalizing)."""
+        for key in scores:
+            self._seq.setdefault(key, len(self._seq))
+        self.scores = scores
+        self.rebuild()
+
+    def rebuild(self):
+        self._heap = [(-s, self._seq[k], k) for k, s in self.scores.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, k):
+        heap, taken = self._heap, []
+        while heap and len(taken) < k:
+            item = heapq.heappop(heap)
+            # A key whose score moved has older entries lower in the heap
+            if self.scores.get(item[2]) == -item[0] and (not taken or taken[-1] != item):
+                taken.append(item)
+        for item in taken:
+            heapq.heappush(heap, item)
+        return [key for _, _, key in taken]
+
+    def ordered(self):
+        return sorted(self.scores, key=lambda k: (-self.scores[k], self._seq[k]))
+
+
+class IncrementalFusion:
+    """
+    fuse_scores() kept up to date as raw signals change. Raw temporal,
+    entry and guard values live per user (interned id) next to a
+    MaxTracker per signal; only a change of maximum renormalizes everyone.
+    """
+
+    SIGNALS = ("temporal", "entry", "guard")
+
+    def __init__(self, interner, weights=WEIGHTS):
+        self.interner = interner
+        self.weights = weights
+        self.maxima = {name: MaxTracker() for name in self.SIGNALS}
+        self.first_seen = MaxTracker()
+        self.first_seen_min = MaxTracker()     # holds negated timestamps
+        self.ranking = RankedScores()
+        self.rows = {}                         # user → (t, e, g, final)
+        self._norms = None                     # maxima the rows were built with
+        self.renormalizations = 0
+
+    # ---------- updates ----------
+    def add(self, signal, user, amount):
+        self.set(signal, user, self.maxima[signal].values.get(user, 0.0) + amount)
+
+    def set(self, signal, user, value):
+        """Replaces one user's raw value; None removes the signal for them."""
+        tracker = self.maxima[signal]
+        if value is None:
+            if user not in tracker.values:
+                return
+            tracker.discard(user)
+        else:
+            tracker.set(user, value)
+        self._touch(user)
+
+    def see(self, user, timestamp):
+        """Records a path time; the earliest one drives the first-seen bonus."""
+        if not timestamp:
+            return
+        current = self.first_seen.values.get(user)
+        if current is None or timestamp < current:
+            self.first_seen.set(user, timestamp)
+            self.first_seen_min.set(user, -timestamp)
+            self._touch(user)
+
+    def _current_norms(self):
+        return (
+            tuple(self.maxima[name].max(0) for name in self.SIGNALS),
+            (-self.first_seen_min.max(0), self.first_seen.max(0))
+        )
+
+    def _touch(self, user):
+        if self._norms is None:
+            return
+        if self._current_norms() != self._norms:
+            self._norms = None              # renormalize on next read
+            return
+        self._rescore(user)
+
+    # ---------- scoring ----------
+    def _score(self, user):
+        """(t, e, g, final) under the current norms, or None for an unknown user."""
+        maxima, (min_ts, max_ts) = self._norms
+        components = []
+        for name, max_val in zip(self.SIGNALS, maxima):
+            raw = self.maxima[name].values.get(user)
+            if raw is None:
+                components.append(MISSING_SCORE[name])
+            else:
+                components.append(normalize_value(raw, max_val, *NORMALIZATION[name]))
+        if all(user not in self.maxima[name].values for name in self.SIGNALS):
+            return None
+
+        bonus = 0.0
+        ts = self.first_seen.values.get(user)
+        if ts is not None and max_ts != min_ts:
+            # Same 0.0 – 0.01 bonus as first_seen_offsets()
+            bonus = round((max_ts - ts) / (max_ts - min_ts) * 0.01, 6)
+
+        return (*components, fuse_components(*components, bonus, self.weights))
+
+    def _rescore(self, user):
+        row = self._score(user)
+        if row is None:
+            self.rows.pop(user, None)
+            self.ranking.remove(user)
+        else:
+            self.rows[user] = row
+            self.ranking.update(user, row[3])
+
+    def _renormalize(self):
+        self._norms = self._current_norms()
+        self.renormalizations += 1
+        users = set()
+        for name in self.SIGNALS:
+            users.update(self.maxima[name].values)
+
+        self.rows = {user: self._score(user) for user in users}
+        self.ranking.replace({user: row[3] for user, row in self.rows.items()})
+
+    # ---------- reads ----------
+    def _fresh(self):
+        if self._norms is None:
+            self._renormalize()
+
+    def top(self, k):
+        """The k best suspects, as suspect_row() dicts."""
+        self._fresh()
+        return [self._row(user) for user in self.ranking.top(k)]
+
+    def suspects(self):
+        """Full ranking, highest final_score first."""
+        self._fresh()
+        return [self._row(user) for user in self.ranking.ordered()]
+
+    def _row(self, user):
+        return suspect_row(self.interner.lookup(user), *self.rows[user])
+
+
+def count_suspects(correlated, shape_matches=None):
+    """Users score_suspects() ranks: every source IP of the correlated paths and shape matches."""
+    return len({p["src_ip"] for p in correlated} | {m["src_ip"] for m in shape_matches or []})
+
+
+def build_forensic_report(suspects, total_suspects=None):
+    """
+    STEP 6: FORENSIC REPORT (EO 3)
+    `total_suspects` is the full count when `suspects` holds only a top-K.
+    """
     top = suspects[0] if suspects else None
 
-    report = {
+    return {
         "case_metadata": {
             "case_id": f"TNCCW-{datetime.now().strftime('%Y%m%d%H%M%S')}",
             "generated_on": datetime.now().isoformat(),
@@ -243,7 +522,7 @@ def fusion_score_engine():
             "Multi-signal weighted fusion scoring: Combines all signals into a single probabilistic Confidence Score (FR 4)."
         ],
         "key_findings": {
-            "total_suspects": len(suspects),
+            "total_suspects": len(suspects) if total_suspects is None else total_suspects,
             "top_suspect": top["user_ip"] if top else None,
             "confidence_score": round(top["final_score"], 4) if top else None # FIX: Saves the score as 0.XX (0-1), correcting the 8760.0% error.
         },
@@ -255,6 +534,17 @@ def fusion_score_engine():
         )
     }
 
+
+def save_fusion_outputs(suspects, report):
+    """
+    STEP 5: SAVE OUTPUTS (EO 3)
+    """
+    with open(SCORES_FILE, "w") as f:
+        json.dump(suspects, f, indent=4)
+
+    with open(SUSPECTS_FILE, "w") as f:
+        json.dump(suspects, f, indent=4)
+
     with open(REPORT_FILE, "w") as f:
         json.dump(report, f, indent=4)
 
@@ -263,8 +553,31 @@ def fusion_score_engine():
     print(f"[✓] Saved forensic report → {REPORT_FILE}")
 
 
+@profiled("fusion_score_engine")
+def fusion_score_engine(weights=WEIGHTS, top_k=None):
+    print("[+] Computing fusion-based suspect scores (FR 4)...")
+
+    correlated = load_json(CORRELATED_FILE)
+    entry_nodes = load_json(ENTRY_FILE)
+    guard_nodes = load_json(GUARD_FILE)
+    # Optional: only written when flows were shape-correlated
+    shape_matches = load_json(SHAPE_FILE) if os.path.exists(SHAPE_FILE) else []
+
+    if not correlated:
+        print("[!] Correlated traffic missing. Cannot score suspects.")
+        return
+
+    suspects = score_suspects(correlated, entry_nodes, guard_nodes, weights, top_k, shape_matches)
+    count(records_in=len(correlated), records_out=len(suspects))
+    save_fusion_outputs(suspects, build_forensic_report(suspects, count_suspects(correlated, shape_matches)))
+
+
 # --------------------------------------------------
 # MAIN
 # --------------------------------------------------
 if __name__ == "__main__":
-    fusion_score_engine()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fuse the stage signals into ranked suspects")
+    parser.add_argument("--top", type=int, metavar="K", help="keep only the K highest-scoring suspects")
+    args = parser.parse_args()
+
+    fusion_score_engine(top_k=args.top)
\ No newline at end of file
@@ -4,19 +4,39 @@
 # HACKATHON: TN Police Hackathon 2025
 # ==============================================================================
 
+import argparse
 import json
 import os
 from collections import defaultdict
 
+import numpy as np
+
+from entry_identification import ENTRY_KEY
+from flow_assembly import assemble_flows
+from ip_index import IPInterner, int_to_ip, ip_to_int
+from packet_store import ip_to_packed, open_store, store_exists
+from paths import RESULTS_DIR
+from profiling import count, profiled
+from ranking import select_top
+from tor_collect import TOR_FILE, load_guard_table
+
 # --------------------------------------------------
 # PATHS
 # --------------------------------------------------
-RESULTS_DIR = "backend/results"
-
 CORRELATED_FILE = os.path.join(RESULTS_DIR, "correlated_paths.json")
 ENTRY_FILE = os.path.join(RESULTS_DIR, "entry_nodes.json")
 OUTPUT_FILE = os.path.join(RESULTS_DIR, "guard_nodes.json")
 
+# --------------------------------------------------
+# SETTINGS
+# --------------------------------------------------
+# A client builds nearly every circuit through its primary guard: each
+# further connection to a relay multiplies the odds that it is the
+# user's guard rather than a relay it merely touched
+GUARD_REUSE_ODDS = 4.0
+# Guard-bound connections a user needs before its guard is fully trusted
+GUARD_EVIDENCE_CONNECTIONS = 5
+
 
 # --------------------------------------------------
 # HELPERS
@@ -32,37 +52,28 @@ def load_json(path):
 # --------------------------------------------------
 # GUARD NODE PREDICTION
 # --------------------------------------------------
-def predict_guard_nodes():
-    print("[+] Refining guard node prediction...")
-
-    correlated = load_json(CORRELATED_FILE)
-    entry_nodes = load_json(ENTRY_FILE)
-
-    if not correlated or not entry_nodes:
-        print("[!] Required inputs missing")
-        return
-
-    # --------------------------------------------------
-    # STEP 1: Identify candidate users (top entry nodes)
-    # --------------------------------------------------
-    candidate_users = {e["user_ip"] for e in entry_nodes[:5]}
-
-    # --------------------------------------------------
-    # STEP 2: Track exit stability per user
-    # Guard logic: fewer exits used repeatedly = higher confidence
-    # --------------------------------------------------
+def count_exit_reuse(correlated, interner, candidate_users=None):
+    """
+    Per-user exit usage: {user id: {exit id: paths}}. Only users in
+    `candidate_users` are counted when it is given.
+    """
     stability = defaultdict(lambda: defaultdict(int))
 
     for pkt in correlated:
-        user = pkt.get("src_ip")
-        exit_node = pkt.get("exit_node") or pkt.get("dst_ip")
+        user = interner.intern(pkt.get("src_ip"))
+        exit_node = interner.intern(pkt.get("exit_node") or pkt.get("dst_ip"))
 
-        if user in candidate_users and exit_node:
+        if exit_node is not None and (candidate_users is None or user in candidate_users):
             stability[user][exit_node] += 1
 
-    # --------------------------------------------------
-    # STEP 3: Compute guard confidence
-    # --------------------------------------------------
+    return stability
+
+
+def rank_guard_counts(stability, interner):
+    """
+    Guard confidence per (user, exit) from the exit usage counts, sorted
+    by user and then by confidence.
+    """
     guard_predictions = []
 
     for user, exits in stability.items():
@@ -82,8 +93,8 @@ def predict_guard_nodes():
             )
 
             guard_predictions.append({
-                "user_ip": user,
-                "guard_node": exit_node,
+                "user_ip": interner.lookup(user),
+                "guard_node": interner.lookup(exit_node),
                 "connection_count": count,
                 "confidence": min(confidence, 1.0)
             })
@@ -91,18 +102,172 @@ def predict_guard_nodes():
     guard_predictions.sort(
         key=lambda x: (x["user_ip"], -x["confidence"])
     )
+    return guard_predictions
+
+
+def _column_keys(store, name, ips):
+    """Raw values of `ips` in the encoding of the store's `name` column."""
+    keys = []
+    for ip in ips:
+        value = ip_to_int(ip)
+        if value is None:
+            continue
+        if store.is_ipv6(name):
+            keys.append(ip_to_packed(int_to_ip(value)))
+        elif value >> 32 == 0xFFFF:
+            keys.append(value & 0xFFFFFFFF)
+    return np.array(keys, dtype=store[name].dtype)
+
+
+def count_guard_connections(connections, guard_table, candidate_ips):
+    """
+    Connections (flows, or packets) from each candidate user to each
+    guard ORPort (address and port), counted without leaving numpy:
+    (user keys, user index, guard row, count) per observed (user, guard)
+    pair, grouped by user.
+    """
+    src = connections["src_ip"]
+    hit = np.flatnonzero(np.isin(src, _column_keys(connections, "src_ip", candidate_ips)))
+    rows = guard_table.rows_for_column(connections["dst_ip"][hit], connections["dst_port"][hit])
+    guard_bound = rows >= 0
+    hit, rows = hit[guard_bound], rows[guard_bound]
+
+    user_keys, users = np.unique(src[hit], return_inverse=True)
+    pairs, counts = np.unique(
+        users.astype(np.int64) * len(guard_table) + rows, return_counts=True
+    )
+    return user_keys, pairs // len(guard_table), pairs % len(guard_table), counts
+
+
+def rank_guard_connections(connections, guard_table, user_keys, users, rows, counts):
+    """
+    Guard confidence per (user, guard ORPort) from count_guard_connections()
+    output; see rank_guard_rows().
+    """
+    user_ips = [connections.ip_to_str("src_ip", key) for key in user_keys]
+    return rank_guard_rows(guard_table, user_ips, users, rows, counts)
+
+
+def rank_guard_rows(guard_table, user_ips, users, rows, counts):
+    """
+    Guard confidence per (user, guard ORPort): the posterior that the
+    relay is the user's guard, from its selection probability (the prior)
+    and the user's connections to it, scaled down for users with fewer
+    than GUARD_EVIDENCE_CONNECTIONS guard-bound connections. `users`
+    indexes `user_ips` and must be grouped. Sorted by user and then by
+    confidence.
+    """
+    if len(rows) == 0:
+        return []
 
+    log_score = np.log(guard_table.probability[rows]) + counts * np.log(GUARD_REUSE_ODDS)
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(rows)]))
+
+    weight = np.exp(log_score - np.maximum.reduceat(log_score, starts)[group])
+    posterior = weight / np.add.reduceat(weight, starts)[group]
+    evidence = np.minimum(np.add.reduceat(counts, starts)[group] / GUARD_EVIDENCE_CONNECTIONS, 1.0)
+    confidence = posterior * evidence
+
+    guard_predictions = [
+        {
+            "user_ip": user_ips[user],
+            "guard_node": guard_table.addresses[row],
+            "guard_fingerprint": guard_table.relays[row]["fingerprint"],
+            "connection_count": int(n),
+            "selection_probability": round(float(guard_table.probability[row]), 6),
+            "confidence": round(float(c), 3)
+        }
+        for user, row, n, c in zip(users.tolist(), rows.tolist(), counts, confidence)
+    ]
+    guard_predictions.sort(
+        key=lambda x: (x["user_ip"], -x["confidence"])
+    )
+    return guard_predictions
+
+
+def score_guard_nodes(correlated, entry_nodes, top_n=5, connections=None, guard_table=None):
+    """
+    Guard predictions for the `top_n` entry-node candidates.
+    `entry_nodes` need not be ranked; the candidates are heap-selected.
+
+    With the capture's `connections` (FlowTable or PacketStore) and a
+    GuardTable, the candidates' connections to guard ORPorts are scored;
+    when none are seen (or no relay has the Guard flag), the exits each
+    candidate keeps reusing stand in for its guard.
+    """
     # --------------------------------------------------
-    # STEP 4: SAVE OUTPUT
+    # STEP 1: Identify candidate users (top entry nodes)
     # --------------------------------------------------
+    candidates = [e["user_ip"] for e in select_top(entry_nodes, top_n, key=ENTRY_KEY)]
+
+    if connections is not None and guard_table is not None and len(guard_table):
+        guard_predictions = rank_guard_connections(
+            connections, guard_table,
+            *count_guard_connections(connections, guard_table, candidates)
+        )
+        if guard_predictions:
+            return guard_predictions
+        print("[!] No user → guard connections observed; scoring exit reuse instead")
+
+    interner = IPInterner()
+    candidate_users = {interner.intern(ip) for ip in candidates}
+
+    # --------------------------------------------------
+    # STEP 2: Track exit stability per user
+    # Guard logic: fewer exits used repeatedly = higher confidence
+    # --------------------------------------------------
+    stability = count_exit_reuse(correlated, interner, candidate_users)
+
+    # --------------------------------------------------
+    # STEP 3: Compute guard confidence
+    # --------------------------------------------------
+    return rank_guard_counts(stability, interner)
+
+
+def save_guard_nodes(guard_predictions):
     with open(OUTPUT_FILE, "w") as f:
         json.dump(guard_predictions, f, indent=4)
 
     print(f"[✓] Saved refined guard predictions → {OUTPUT_FILE}")
 
 
+@profiled("predict_guard_nodes")
+def predict_guard_nodes(top_n=5, flows=True):
+    print("[+] Refining guard node prediction...")
+
+    correlated = load_json(CORRELATED_FILE)
+    entry_nodes = load_json(ENTRY_FILE)
+
+    if not correlated or not entry_nodes:
+        print("[!] Required inputs missing")
+        return
+
+    relays = load_json(TOR_FILE)
+    guard_table = load_guard_table(relays["relays"], relays.get("relays_published")) if relays else None
+    connections = None
+    if store_exists():
+        connections = open_store()
+        if flows:
+            connections = assemble_flows(connections)
+
+    # --------------------------------------------------
+    # STEP 4: SAVE OUTPUT
+    # --------------------------------------------------
+    guard_nodes = score_guard_nodes(correlated, entry_nodes, top_n, connections, guard_table)
+    count(records_in=len(correlated), records_out=len(guard_nodes))
+    save_guard_nodes(guard_nodes)
+
+
 # --------------------------------------------------
 # MAIN
 # --------------------------------------------------
 if __name__ == "__main__":
-    predict_guard_nodes()
+    parser = argparse.ArgumentParser(description="Predict guard node stability")
+    parser.add_argument("--top-n", type=int, default=5, metavar="N",
+                        help="entry-node candidates to score")
+    parser.add_argument("--packets", action="store_true",
+                        help="count guard connections per packet instead of per flow")
+    args = parser.parse_args()
+
+    predict_guard_nodes(args.top_n, flows=not args.packets)
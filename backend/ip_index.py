@@ -0,0 +1,342 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+import ipaddress
+import json
+import os
+
+import numpy as np
+
+from packet_store import IPV6_DTYPE, ip_to_packed
+
+# IPv4 addresses live in the IPv4-mapped IPv6 range (::ffff:a.b.c.d), so
+# one integer space covers both families
+_V4_MAPPED_BASE = 0xFFFF << 32
+
+# Files of a saved ExitIndex (see ExitIndex.save)
+EXIT_V4_FILE = "exit_v4.npy"
+EXIT_PACKED_FILE = "exit_packed.npy"
+EXIT_ADDRESSES_FILE = "exit_addresses.json"
+
+# Files of a saved GuardTable (see GuardTable.save)
+GUARD_V4_FILE = "guard_v4.npy"
+GUARD_V4_ROWS_FILE = "guard_v4_rows.npy"
+GUARD_PACKED_FILE = "guard_packed.npy"
+GUARD_PACKED_ROWS_FILE = "guard_packed_rows.npy"
+GUARD_PROBABILITY_FILE = "guard_probability.npy"
+GUARD_RELAYS_FILE = "guard_relays.json"
+# Packed guard keys: 16 address bytes followed by the big-endian port
+GUARD_PACKED_DTYPE = "S18"
+
+# Guard-position weight of Guard+Exit relays relative to guard-only ones
+# (the consensus Wgd / Wgg). Exit bandwidth is scarce, so the directory
+# authorities keep exits out of the guard position: Wgd is 0.
+GUARD_EXIT_WEIGHT = 0.0
+
+
+# --------------------------------------------------
+# ADDRESS PARSING
+# --------------------------------------------------
+def normalize_ip(ip):
+    """
+    Strips the port from "a.b.c.d:port" / "[v6]:port" forms (as used by
+    Onionoo's or_addresses) and returns the bare address string.
+    """
+    if not ip:
+        return ""
+    ip = ip.strip()
+    if ip.startswith("["):
+        return ip[1:ip.index("]")]
+    if ip.count(":") == 1:
+        return ip.split(":")[0]
+    return ip
+
+
+def ip_to_int(ip):
+    """Address string → int in the unified (v4-mapped) 128-bit space, or None."""
+    try:
+        addr = ipaddress.ip_address(normalize_ip(ip))
+    except ValueError:
+        return None
+    if addr.version == 4:
+        return _V4_MAPPED_BASE | int(addr)
+    return int(addr)
+
+
+def int_to_ip(value):
+    """Inverse of ip_to_int()."""
+    if value >> 32 == 0xFFFF:
+        return str(ipaddress.IPv4Address(value & 0xFFFFFFFF))
+    return str(ipaddress.IPv6Address(value))
+
+
+# --------------------------------------------------
+# INTERNING
+# --------------------------------------------------
+class IPInterner:
+    """
+    Maps address strings to small dense ids, parsing each distinct string
+    once. Stages aggregate on the ids and only turn them back into strings
+    when writing results.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self.addresses = []
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def intern(self, ip):
+        """
+        Returns the id for `ip` (ports stripped, canonical form). Strings
+        that are not addresses are kept verbatim as opaque labels; empty
+        values map to None.
+        """
+        ip_id = self._ids.get(ip)
+        if ip_id is None and ip and ip not in self._ids:
+            value = ip_to_int(ip)
+            canonical = int_to_ip(value) if value is not None else ip
+            ip_id = self._ids.get(canonical)
+            if ip_id is None:
+                ip_id = len(self.addresses)
+                self.addresses.append(canonical)
+                self._ids[canonical] = ip_id
+            self._ids[ip] = ip_id
+        return ip_id
+
+    def lookup(self, ip_id):
+        return self.addresses[ip_id]
+
+
+# --------------------------------------------------
+# EXIT ADDRESS INDEX
+# --------------------------------------------------
+class ExitIndex:
+    """
+    Sorted-array index of Tor exit addresses. Membership for a whole
+    packet column is one np.searchsorted instead of a per-packet set lookup
+    on split/stripped strings.
+    """
+
+    def __init__(self, addresses):
+        values = sorted({v for v in map(ip_to_int, addresses) if v is not None})
+        self.addresses = [int_to_ip(v) for v in values]
+
+        # uint32 keys for IPv4-only columns, 16-byte packed keys otherwise
+        self.v4 = np.array(
+            [v & 0xFFFFFFFF for v in values if v >> 32 == 0xFFFF], dtype=np.uint32
+        )
+        self.packed = np.sort(
+            np.array([ip_to_packed(a) for a in self.addresses], dtype=IPV6_DTYPE)
+        )
+        self._strings = frozenset(self.addresses)
+
+    @classmethod
+    def from_relays(cls, relays):
+        return cls(ip for relay in relays for ip in relay.get("exit_addresses", []))
+
+    def save(self, index_dir):
+        """Writes the key arrays as .npy files that load() can memory-map."""
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, EXIT_V4_FILE), self.v4)
+        np.save(os.path.join(index_dir, EXIT_PACKED_FILE), self.packed)
+        with open(os.path.join(index_dir, EXIT_ADDRESSES_FILE), "w") as f:
+            json.dump(self.addresses, f)
+
+    @classmethod
+    def load(cls, index_dir):
+        """
+        Opens a saved index read-only. The key arrays are memory-mapped, so
+        processes loading the same index share one copy in the page cache.
+        """
+        index = cls.__new__(cls)
+        index.v4 = np.load(os.path.join(index_dir, EXIT_V4_FILE), mmap_mode="r")
+        index.packed = np.load(os.path.join(index_dir, EXIT_PACKED_FILE), mmap_mode="r")
+        with open(os.path.join(index_dir, EXIT_ADDRESSES_FILE), "r") as f:
+            index.addresses = json.load(f)
+        index._strings = frozenset(index.addresses)
+        return index
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __contains__(self, ip):
+        return ip in self._strings
+
+    def contains_column(self, column):
+        """Boolean mask: which entries of a packet-store IP column are exits."""
+        column = np.asarray(column)
+        keys = self.packed if column.dtype == np.dtype(IPV6_DTYPE) else self.v4
+        if len(keys) == 0:
+            return np.zeros(len(column), dtype=bool)
+        pos = np.searchsorted(keys, column)
+        return keys[np.minimum(pos, len(keys) - 1)] == column
+
+
+# --------------------------------------------------
+# GUARD RELAY TABLE
+# --------------------------------------------------
+def _or_port(or_address):
+    """Port of an Onionoo "a.b.c.d:port" / "[v6]:port" address, 0 if none."""
+    host, sep, port = or_address.rpartition(":")
+    if not sep or (":" in host and not host.endswith("]")):
+        return 0
+    return int(port) if port.isdigit() else 0
+
+
+def _v4_keys(addresses, ports):
+    """Guard keys of uint32 IPv4 addresses and their ports: address << 16 | port."""
+    return (np.asarray(addresses).astype(np.uint64) << np.uint64(16)) | np.asarray(ports).astype(np.uint64)
+
+
+def _packed_keys(addresses, ports):
+    """Guard keys of S16 addresses and their ports: the 16 address bytes, then the port big-endian."""
+    n = len(addresses)
+    keys = np.empty((n, 18), dtype=np.uint8)
+    keys[:, :16] = np.ascontiguousarray(addresses, dtype=IPV6_DTYPE).view(np.uint8).reshape(n, 16)
+    keys[:, 16:] = np.ascontiguousarray(ports, dtype=">u2").view(np.uint8).reshape(n, 2)
+    return keys.view(GUARD_PACKED_DTYPE).reshape(n)
+
+
+def guard_weights(relays):
+    """
+    [(relay, weight)] for the relays a client may pick as its entry guard
+    (Running, with the Guard flag). Onionoo's guard_probability is used
+    when every guard carries one; otherwise the weight is the advertised
+    bandwidth, scaled by GUARD_EXIT_WEIGHT for relays that are also exits.
+    """
+    guards = [
+        r for r in relays
+        if "Guard" in r.get("flags", []) and "Running" in r.get("flags", [])
+    ]
+    if guards and all(r.get("guard_probability") is not None for r in guards):
+        return [(r, float(r["guard_probability"])) for r in guards]
+
+    weighted = []
+    for relay in guards:
+        weight = float(relay.get("advertised_bandwidth") or 0)
+        if "Exit" in relay.get("flags", []):
+            weight *= GUARD_EXIT_WEIGHT
+        weighted.append((relay, weight))
+    return weighted
+
+
+class GuardTable:
+    """
+    Candidate entry guards, one row per ORPort (address, port), with the
+    bandwidth-weighted probability that a client picks the relay on that
+    ORPort as its guard. Rows are keyed by the address's integer value
+    (the same key packet-store IP columns hold) followed by the port: a
+    whole (dst_ip, dst_port) column pair resolves with one
+    np.searchsorted (rows_for_column), a single ORPort with one dict
+    lookup (row).
+    """
+
+    def __init__(self, addresses, probability, relays):
+        self.addresses = addresses
+        self.probability = probability
+        # {"fingerprint", "nickname", "or_port"} of the heaviest relay per row
+        self.relays = relays
+        ports = np.array([r["or_port"] for r in relays], dtype=np.uint16)
+        self._rows = {(a, int(p)): i for i, (a, p) in enumerate(zip(addresses, ports))}
+
+        values = [ip_to_int(a) for a in addresses]
+        v4_rows = np.array([i for i, v in enumerate(values) if v >> 32 == 0xFFFF], dtype=np.int64)
+        v4 = _v4_keys(
+            np.array([values[i] & 0xFFFFFFFF for i in v4_rows], dtype=np.uint32), ports[v4_rows]
+        )
+        order = np.argsort(v4, kind="stable")
+        self.v4, self.v4_rows = v4[order], v4_rows[order]
+
+        packed = _packed_keys(np.array([ip_to_packed(a) for a in addresses], dtype=IPV6_DTYPE), ports)
+        self.packed_rows = np.argsort(packed, kind="stable").astype(np.int64)
+        self.packed = packed[self.packed_rows]
+
+    @classmethod
+    def from_relays(cls, relays):
+        weighted = [(r, w) for r, w in guard_weights(relays) if w > 0]
+        weights = {}
+        labels = {}
+        for relay, weight in weighted:
+            or_ports = [
+                (value, _or_port(or_address))
+                for or_address in relay.get("or_addresses", [])
+                if (value := ip_to_int(or_address)) is not None
+            ]
+            for key in or_ports:
+                # A client picks the relay, then reaches it on one of its
+                # ORPorts: the relay's weight is split evenly across them
+                weights[key] = weights.get(key, 0.0) + weight / len(or_ports)
+                if key not in labels or weight > labels[key][0]:
+                    labels[key] = (weight, {
+                        "fingerprint": relay.get("fingerprint"),
+                        "nickname": relay.get("nickname"),
+                        "or_port": key[1]
+                    })
+
+        total = sum(weights.values())
+        keys = sorted(weights)
+        probability = np.array([weights[k] / total for k in keys], dtype=np.float64)
+        return cls([int_to_ip(v) for v, _ in keys], probability, [labels[k][1] for k in keys])
+
+    def save(self, table_dir):
+        """Writes the table as .npy files that load() can memory-map."""
+        os.makedirs(table_dir, exist_ok=True)
+        np.save(os.path.join(table_dir, GUARD_V4_FILE), self.v4)
+        np.save(os.path.join(table_dir, GUARD_V4_ROWS_FILE), self.v4_rows)
+        np.save(os.path.join(table_dir, GUARD_PACKED_FILE), self.packed)
+        np.save(os.path.join(table_dir, GUARD_PACKED_ROWS_FILE), self.packed_rows)
+        np.save(os.path.join(table_dir, GUARD_PROBABILITY_FILE), self.probability)
+        with open(os.path.join(table_dir, GUARD_RELAYS_FILE), "w") as f:
+            json.dump({"addresses": self.addresses, "relays": self.relays}, f)
+
+    @classmethod
+    def load(cls, table_dir):
+        """Opens a saved table read-only, with memory-mapped arrays."""
+        table = cls.__new__(cls)
+        for attr, name in (
+            ("v4", GUARD_V4_FILE), ("v4_rows", GUARD_V4_ROWS_FILE),
+            ("packed", GUARD_PACKED_FILE), ("packed_rows", GUARD_PACKED_ROWS_FILE),
+            ("probability", GUARD_PROBABILITY_FILE)
+        ):
+            setattr(table, attr, np.load(os.path.join(table_dir, name), mmap_mode="r"))
+        with open(os.path.join(table_dir, GUARD_RELAYS_FILE), "r") as f:
+            data = json.load(f)
+        table.addresses = data["addresses"]
+        table.relays = data["relays"]
+        table._rows = {
+            (a, r["or_port"]): i for i, (a, r) in enumerate(zip(table.addresses, table.relays))
+        }
+        return table
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def row(self, ip, port):
+        """Row of a guard ORPort (address in any form IPInterner accepts), or None."""
+        value = ip_to_int(ip)
+        return self._rows.get((int_to_ip(value), port)) if value is not None else None
+
+    def rows_for_column(self, column, ports):
+        """
+        Row per entry of a packet-store IP column and its port column,
+        -1 where the (address, port) is no guard ORPort.
+        """
+        column = np.asarray(column)
+        if column.dtype == np.dtype(IPV6_DTYPE):
+            keys, rows = self.packed, self.packed_rows
+            column = _packed_keys(column, ports)
+        else:
+            keys, rows = self.v4, self.v4_rows
+            column = _v4_keys(column, ports)
+        out = np.full(len(column), -1, dtype=np.int64)
+        if len(keys) == 0:
+            return out
+        pos = np.minimum(np.searchsorted(keys, column), len(keys) - 1)
+        hit = keys[pos] == column
+        out[hit] = rows[pos[hit]]
+        return out
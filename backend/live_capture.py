@@ -0,0 +1,323 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+Live capture mode.
+
+Follows a capture that is still being written, or replays a finished one
+at wall-clock (or accelerated) speed, and correlates packets as they
+arrive against a sliding window of recent traffic. Correlated paths are
+appended to live_paths.jsonl the moment they match; entry, guard and
+fusion scores are kept as running per-user aggregates and the usual
+results files are rewritten every few seconds, so the dashboard shows
+current suspects while the incident is still going on:
+
+    python backend/live_capture.py capture.pcap --follow
+    python backend/live_capture.py capture.pcap --replay 10
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import entry_identification
+import fusion_engine
+import guard_predictor
+from entry_identification import SourceStats, entry_row
+from fusion_engine import IncrementalFusion, RankedScores, build_forensic_report
+from guard_predictor import rank_guard_counts, rank_guard_rows
+from ip_index import ExitIndex, IPInterner
+from node_correlation import TOR_FILE, StreamCorrelator, load_json
+from paths import RESULTS_DIR
+from pcap_parser import iter_packets, tail_packets
+from tor_collect import load_guard_table
+
+# --------------------------------------------------
+# PATHS
+# --------------------------------------------------
+LIVE_PATHS = os.path.join(RESULTS_DIR, "live_paths.jsonl")
+LIVE_STATUS = os.path.join(RESULTS_DIR, "live_status.json")
+
+# Seconds between rewrites of the scored results
+EMIT_EVERY_SEC = 2.0
+
+
+def write_json_atomic(path, data):
+    """Readers (the dashboard) never see a half-written file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp, path)
+
+
+# --------------------------------------------------
+# PACKET SOURCES
+# --------------------------------------------------
+def replay_packets(path, speed=1.0):
+    """
+    Replays a finished capture, pacing packets by their capture timestamps
+    `speed` times faster than real time (0 = as fast as possible).
+    """
+    start_wall = start_ts = None
+    for pkt in iter_packets(path):
+        if speed > 0:
+            if start_wall is None:
+                start_wall, start_ts = time.monotonic(), pkt[0]
+            delay = (pkt[0] - start_ts) / speed - (time.monotonic() - start_wall)
+            if delay > 0:
+                time.sleep(delay)
+        yield pkt
+
+
+# --------------------------------------------------
+# RUNNING SCORES
+# --------------------------------------------------
+class LiveScorer:
+    """
+    Entry, guard and fusion stages kept up to date per correlated path.
+    add_path() touches only the path's user: its SourceStats and entry
+    score, the top `guard_top_n` entry candidates' guard confidence and the
+    IncrementalFusion ranking, each an O(log n) update. add_packet()
+    counts connections to the ORPorts of `guard_table`, which guards are
+    scored from as in guard_predictor (exit reuse when no candidate has
+    any).
+
+    Live mode works on packets: for a time-ordered capture a snapshot
+    equals the batch stages run with flow_assembly.enabled=false. Batch
+    mode by default correlates and counts flows instead, and adds the
+    traffic-shape signal, so its scores differ from live ones.
+    """
+
+    def __init__(self, weights=fusion_engine.WEIGHTS, guard_top_n=5, guard_table=None):
+        self.guard_top_n = guard_top_n
+        self.interner = IPInterner()
+        self.entry_stats = {}                                   # user → SourceStats
+        self.entry_rows = {}                                    # user → entry_row()
+        self.entry_ranking = RankedScores()
+        self.exit_counts = defaultdict(lambda: defaultdict(int))  # user → exit → paths
+        self.guard_table = guard_table
+        # (address id, port) → guard table row, and the ports to check first
+        self.guard_orports = {}
+        if guard_table is not None:
+            for row, (address, relay) in enumerate(zip(guard_table.addresses, guard_table.relays)):
+                self.guard_orports[(self.interner.intern(address), relay["or_port"])] = row
+        self.guard_ports = {port for _, port in self.guard_orports}
+        self.guard_counts = defaultdict(lambda: defaultdict(int))  # user → guard row → packets
+        self.guards_from_table = False
+        self.candidates = []
+        self.guard_rows = {}                                    # candidate → guard rows
+        self.fusion = IncrementalFusion(self.interner, weights)
+        self.paths = 0
+
+    def add_packet(self, packet):
+        """Counts a packet (PACKET_FIELDS tuple) sent to a guard ORPort."""
+        dst_port = packet[9]
+        if dst_port not in self.guard_ports:
+            return
+        row = self.guard_orports.get((self.interner.intern(packet[2]), dst_port))
+        if row is None:
+            return
+        user = self.interner.intern(packet[1])
+        self.guard_counts[user][row] += 1
+        if user in self.candidates:
+            self._score_guards({user})
+
+    def add_path(self, path):
+        user = self.interner.intern(path["src_ip"])
+        ts = path["timestamp"]
+        self.paths += 1
+
+        stats = self.entry_stats.get(user)
+        if stats is None:
+            stats = self.entry_stats[user] = SourceStats()
+        # A path that arrives late counts as simultaneous with the last one
+        stats.add(path["packet_size"], ts if stats.last_ts is None else max(ts, stats.last_ts))
+
+        row = self.entry_rows[user] = entry_row(self.interner.lookup(user), stats)
+        self.entry_ranking.update(user, row["entry_score"])
+        self.fusion.set("entry", user, row["entry_score"])
+
+        self.exit_counts[user][self.interner.intern(path["exit_node"])] += 1
+        self.fusion.add("temporal", user, path.get("temporal_match_score", 0))
+        self.fusion.see(user, ts)
+        self._update_guards(user)
+
+    def _update_guards(self, user):
+        # Guard scoring only covers the current top entry candidates
+        candidates = self.entry_ranking.top(self.guard_top_n)
+        changed = set(candidates).symmetric_difference(self.candidates)
+        if user in candidates:
+            changed.add(user)
+        self.candidates = candidates
+        self._score_guards(changed)
+
+    def _score_guards(self, changed):
+        # As in score_guard_nodes(): guard ORPort connections when any
+        # candidate has some, else every candidate's exit reuse
+        from_table = any(self.guard_counts.get(u) for u in self.candidates)
+        if from_table != self.guards_from_table:
+            self.guards_from_table = from_table
+            changed = changed | set(self.candidates)
+
+        for u in changed:
+            if u in self.candidates:
+                rows = self.guard_rows[u] = self._rank_guards(u)
+                self.fusion.set("guard", u, sum(r["confidence"] for r in rows) if rows else None)
+            else:
+                self.guard_rows.pop(u, None)
+                self.fusion.set("guard", u, None)
+
+    def _rank_guards(self, user):
+        if not self.guards_from_table:
+            return rank_guard_counts({user: self.exit_counts[user]}, self.interner)
+        counts = self.guard_counts.get(user)
+        if not counts:
+            return []
+        rows = np.array(sorted(counts), dtype=np.int64)
+        return rank_guard_rows(
+            self.guard_table, [self.interner.lookup(user)], np.zeros(len(rows), dtype=np.int64),
+            rows, np.array([counts[r] for r in rows.tolist()], dtype=np.int64)
+        )
+
+    def top(self, k):
+        return self.fusion.top(k)
+
+    def snapshot(self, top_k=None):
+        """
+        Returns (entry_nodes, guard_nodes, suspects) for the paths so far,
+        entry nodes and suspects cut to the best `top_k` when given.
+        """
+        if top_k is None:
+            entries = [self.entry_rows[user] for user in self.entry_ranking.ordered()]
+            suspects = self.fusion.suspects()
+        else:
+            entries = [self.entry_rows[user] for user in self.entry_ranking.top(top_k)]
+            suspects = self.fusion.top(top_k)
+        guards = sorted(
+            (r for user in self.candidates for r in self.guard_rows[user]),
+            key=lambda x: (x["user_ip"], -x["confidence"])
+        )
+        return entries, guards, suspects
+
+
+# --------------------------------------------------
+# LIVE LOOP
+# --------------------------------------------------
+def run_live(source, relays, window_sec=5, emit_every=EMIT_EVERY_SEC, weights=fusion_engine.WEIGHTS,
+             top_k=None, guard_table=None):
+    """
+    Correlates and scores packets as they come in. `source(on_idle)` returns
+    the packet iterator (PACKET_FIELDS tuples, arrival order) and calls
+    on_idle() while it waits for data. Returns the final
+    (entry_nodes, guard_nodes, suspects); with `top_k` only that many
+    entry nodes and suspects are written each time. Guards are scored
+    against `guard_table` (a GuardTable of `relays`) when given.
+    """
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    correlator = StreamCorrelator(ExitIndex.from_relays(relays), window_sec)
+    scorer = LiveScorer(weights, guard_table=guard_table)
+    started = time.time()
+    state = {"next_emit": time.monotonic() + emit_every, "emitted_paths": -1}
+
+    log = open(LIVE_PATHS, "w")
+
+    def emit(final=False):
+        log.flush()
+        state["next_emit"] = time.monotonic() + emit_every
+        status = {
+            "state": "done" if final else "running",
+            "started": started,
+            "updated": time.time(),
+            "packets": correlator.packets,
+            "exit_packets": correlator.exit_packets,
+            "paths": scorer.paths,
+            "window_packets": correlator.index.size,
+            "users": len(scorer.entry_stats),
+            "renormalizations": scorer.fusion.renormalizations
+        }
+
+        # Rankings only change when paths do
+        if scorer.paths != state["emitted_paths"]:
+            state["emitted_paths"] = scorer.paths
+            entries, guards, suspects = scorer.snapshot(top_k)
+            write_json_atomic(entry_identification.OUT_FILE, entries)
+            write_json_atomic(guard_predictor.OUTPUT_FILE, guards)
+            write_json_atomic(fusion_engine.SCORES_FILE, suspects)
+            write_json_atomic(fusion_engine.SUSPECTS_FILE, suspects)
+            write_json_atomic(fusion_engine.REPORT_FILE, build_forensic_report(suspects, len(scorer.entry_stats)))
+            state["result"] = (entries, guards, suspects)
+
+            top = suspects[0] if suspects else None
+            elapsed = max(time.time() - started, 1e-9)
+            print(
+                f"[+] {correlator.packets:,} packets ({correlator.packets / elapsed:,.0f} pkt/s)"
+                f" · {scorer.paths:,} paths · {len(scorer.entry_stats):,} suspects"
+                + (f" · top {top['user_ip']} ({top['final_score']:.3f})" if top else "")
+            )
+        write_json_atomic(LIVE_STATUS, status)
+
+    def on_idle():
+        if time.monotonic() >= state["next_emit"]:
+            emit()
+
+    try:
+        for pkt in source(on_idle):
+            path = correlator.feed(pkt)
+            scorer.add_packet(pkt)
+            if path is not None:
+                scorer.add_path(path)
+                log.write(json.dumps(path) + "\n")
+            if time.monotonic() >= state["next_emit"]:
+                emit()
+    except KeyboardInterrupt:
+        print("[!] Live capture stopped")
+    finally:
+        emit(final=True)
+        log.close()
+
+    print(f"[✓] Live capture finished: {scorer.paths:,} correlated paths → {LIVE_PATHS}")
+    return state["result"]
+
+
+def live_capture(capture, follow=False, replay_speed=1.0, idle_timeout=None,
+                 window_sec=5, emit_every=EMIT_EVERY_SEC, top_k=None):
+    print(f"[+] Live correlation of {capture} ({'following' if follow else f'replay x{replay_speed}'})...")
+
+    tor = load_json(TOR_FILE)
+    if not tor:
+        print("[!] Required inputs missing")
+        return None
+
+    if follow:
+        source = lambda on_idle: tail_packets(capture, idle_timeout=idle_timeout, on_idle=on_idle)
+    else:
+        source = lambda on_idle: replay_packets(capture, replay_speed)
+    guard_table = load_guard_table(tor["relays"], tor.get("relays_published"))
+    return run_live(source, tor["relays"], window_sec, emit_every, top_k=top_k, guard_table=guard_table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Correlate a live or replayed capture")
+    parser.add_argument("capture", help="pcap/pcapng capture")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--follow", action="store_true", help="tail a capture that is still being written")
+    mode.add_argument("--replay", type=float, default=1.0, metavar="SPEED",
+                      help="replay speed-up over capture time (0 = as fast as possible)")
+    parser.add_argument("--idle-timeout", type=float, metavar="SEC",
+                        help="with --follow, stop after this long without new packets")
+    parser.add_argument("--window", type=float, default=5, metavar="SEC", help="correlation window")
+    parser.add_argument("--emit-every", type=float, default=EMIT_EVERY_SEC, metavar="SEC",
+                        help="seconds between rewrites of the scored results")
+    parser.add_argument("--top", type=int, metavar="K",
+                        help="write only the K most suspicious entry nodes and suspects")
+    args = parser.parse_args()
+
+    live_capture(args.capture, args.follow, args.replay, args.idle_timeout, args.window,
+                 args.emit_every, args.top)
@@ -4,25 +4,41 @@
 # HACKATHON: TN Police Hackathon 2025
 # ==============================================================================
 
+import argparse
 import json
 import os
 from collections import defaultdict
 from datetime import datetime
 import math # Used for safety in logic if needed
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from flow_assembly import FlowTable, assemble_flows
+from ip_index import ExitIndex, IPInterner
+from packet_store import PacketStore, STORE_DIR, load_packets, open_store, store_exists
+from paths import DATA_DIR, RESULTS_DIR
+from profiling import count, profiled
 
 # --------------------------------------------------
 # PATHS
 # --------------------------------------------------
-DATA_DIR = "backend/data"
-RESULTS_DIR = "backend/results"
-
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
-PCAP_FILE = os.path.join(DATA_DIR, "pcap_parsed.json")
+PCAP_FILE = os.path.join(DATA_DIR, "pcap_parsed.json")  # legacy fallback
+PCAP_STORE = STORE_DIR
 TOR_FILE = os.path.join(DATA_DIR, "tor_nodes.json")
 
 OUT_PATHS = os.path.join(RESULTS_DIR, "correlated_paths.json")
 OUT_TIMELINE = os.path.join(RESULTS_DIR, "timeline.json")
+# Written by shape_correlation.py from the same inputs; stale once these paths change
+SHAPE_FILE = os.path.join(RESULTS_DIR, "shape_matches.json")
+
+# Largest fingerprint code (JA3 code << 8 | TTL) prefiltered through a
+# dense lookup table; one byte per code
+MAX_FINGERPRINT_TABLE = 1 << 26
 
 
 # --------------------------------------------------
@@ -36,78 +52,208 @@ def load_json(path):
         return json.load(f)
 
 
-def normalize_ip(ip):
-    return ip.split(":")[0].strip() if ip else ""
-
-
 def extract_exit_ips(tor_relays):
-    exit_ips = set()
-    for relay in tor_relays:
-        # Check both the 'exit_addresses' and potentially 'or_addresses' for IPs
-        for ip in relay.get("exit_addresses", []):
-            exit_ips.add(normalize_ip(ip))
-    return exit_ips
+    """Builds the sorted exit-address index from the relays' exit_addresses."""
+    return ExitIndex.from_relays(tor_relays)
 
 
 # --- CORE TEMPORAL CORRELATION LOGIC (FR 2) ---
-def find_temporal_match(pcap_data, current_exit_pkt, window_sec=5):
+def build_temporal_index(pcap_data, keys=None):
+    """
+    Groups packets by their (JA3, TTL) fingerprint. Each key holds the
+    packets' timestamps in ascending order alongside their source IPs, so a
+    time window becomes a binary-search range instead of a full scan.
+    Packets sharing a timestamp keep their capture order.
+    With `keys`, only packets carrying one of those fingerprints are indexed.
+    """
+    groups = defaultdict(list)
+    for pkt in pcap_data:
+        key = (pkt.get("ja3"), pkt.get("ttl"))
+        if keys is None or key in keys:
+            groups[key].append((pkt["timestamp"], pkt["src_ip"]))
+
+    index = {}
+    for key, entries in groups.items():
+        entries.sort(key=lambda e: e[0])
+        index[key] = (
+            [ts for ts, _ in entries],
+            [src for _, src in entries]
+        )
+    return index
+
+
+def find_temporal_match(index, current_exit_pkt, window_sec=5):
     """
     Looks for a clearnet entry flow that matches the Exit packet's metadata (JA3/TTL)
     within a small time window before the exit occurred.
+    `index` comes from build_temporal_index().
     """
     exit_time = current_exit_pkt["timestamp"]
     exit_ja3 = current_exit_pkt["ja3"]
     exit_ttl = current_exit_pkt.get("ttl")
-    
-    # Define the search window: 5 seconds before the Exit packet (Simulating TOR latency)
-    search_start = exit_time - window_sec
-    
+
     # Track the best (highest temporal score) match
     best_match = {"matched_src_ip": None, "temporal_match_score": 0.0, "match_found": False}
-    
-    for pkt in pcap_data:
-        # 1. Filter by Time: Only look at packets that occurred just before the exit
-        if pkt["timestamp"] >= search_start and pkt["timestamp"] < exit_time:
-            
-            # 2. Filter by Metadata: Check for fingerprint match (Layer 2)
-            if pkt.get("ja3") == exit_ja3 and pkt.get("ttl") == exit_ttl:
-                
-                # Found a strong temporal and metadata match
-                time_diff = exit_time - pkt["timestamp"]
-                
-                # Temporal Score: Closer to 1.0 (perfect match) is better
-                # Closer in time yields a higher score
-                temporal_score = 1.0 - (time_diff / window_sec) 
-                
-                if temporal_score > best_match["temporal_match_score"]:
-                    best_match["matched_src_ip"] = pkt["src_ip"]
-                    best_match["temporal_match_score"] = temporal_score
-                    best_match["match_found"] = True
+
+    # 1. Filter by Metadata: only packets with the same fingerprint (Layer 2)
+    candidates = index.get((exit_ja3, exit_ttl))
+    if not candidates:
+        return best_match
+    timestamps, src_ips = candidates
+
+    # 2. Filter by Time: the window is the 5 seconds before the Exit packet
+    # (Simulating TOR latency). Closer in time yields a higher score, so the
+    # best match is the latest candidate strictly before the exit.
+    last = bisect_left(timestamps, exit_time) - 1
+    if last < 0 or timestamps[last] < exit_time - window_sec:
+        return best_match
+
+    # Earliest packet (capture order) carrying that timestamp wins ties
+    best = bisect_left(timestamps, timestamps[last], 0, last)
+    time_diff = exit_time - timestamps[best]
+
+    # Temporal Score: Closer to 1.0 (perfect match) is better
+    temporal_score = 1.0 - (time_diff / window_sec)
+
+    if temporal_score > best_match["temporal_match_score"]:
+        best_match["matched_src_ip"] = src_ips[best]
+        best_match["temporal_match_score"] = temporal_score
+        best_match["match_found"] = True
 
     return best_match
 
 
-def correlate():
-    print("[+] Correlating PCAP traffic with Tor exits (FR 2)...")
+# --------------------------------------------------
+# STREAMING CORRELATION (live capture)
+# --------------------------------------------------
+class SlidingTemporalIndex:
+    """
+    build_temporal_index() over only the last `window_sec` of traffic,
+    for packets that arrive one at a time. get() hands find_temporal_match()
+    the same (timestamps, src_ips) lists per fingerprint.
 
-    pcap_raw = load_json(PCAP_FILE)
-    tor = load_json(TOR_FILE)
+    Packets older than the window can never match a later exit, so they
+    are dropped in bulk once the newest timestamp has moved a full window
+    past the last sweep; memory holds at most two windows of packets.
+    """
 
-    if not pcap_raw or not tor:
-        print("[!] Required inputs missing")
-        return
+    def __init__(self, window_sec=5):
+        self.window_sec = window_sec
+        self.groups = {}
+        self.size = 0
+        self.newest = None
+        self.swept = None
+
+    def get(self, key):
+        return self.groups.get(key)
+
+    def add(self, key, timestamp, src_ip):
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = ([], [])
+        timestamps, src_ips = group
+
+        if not timestamps or timestamps[-1] <= timestamp:
+            timestamps.append(timestamp)
+            src_ips.append(src_ip)
+        else:
+            # Late packet: equal timestamps keep arrival order, as in batch
+            pos = bisect_right(timestamps, timestamp)
+            timestamps.insert(pos, timestamp)
+            src_ips.insert(pos, src_ip)
+        self.size += 1
+
+        if self.newest is None or timestamp > self.newest:
+            self.newest = timestamp
+            if self.swept is None:
+                self.swept = timestamp
+            elif timestamp - self.swept >= self.window_sec:
+                self.sweep()
+
+    def sweep(self):
+        """Drops every packet older than the window before the newest one."""
+        horizon = self.newest - self.window_sec
+        for key in list(self.groups):
+            timestamps, src_ips = self.groups[key]
+            cut = bisect_left(timestamps, horizon)
+            if cut == len(timestamps):
+                del self.groups[key]
+            elif cut:
+                del timestamps[:cut]
+                del src_ips[:cut]
+            self.size -= cut
+        self.swept = self.newest
+
+
+class StreamCorrelator:
+    """
+    Per-packet correlation for live traffic. feed() takes iter_packets()
+    tuples in arrival order and returns the correlated path dict as soon
+    as an exit packet matches, else None.
+
+    An entry packet that arrives after the exit it precedes (reordered
+    capture) is not matched to it; batch correlation would.
+    """
+
+    def __init__(self, tor_exit_ips, window_sec=5):
+        self.exits = tor_exit_ips
+        self.window_sec = window_sec
+        self.index = SlidingTemporalIndex(window_sec)
+        self.packets = 0
+        self.exit_packets = 0
+
+    def feed(self, packet):
+        ts, src_ip, dst_ip, length, ttl, _, ja3 = packet[:7]
+        self.packets += 1
+        path = None
+
+        if dst_ip in self.exits:
+            self.exit_packets += 1
+            match_result = find_temporal_match(
+                self.index, {"timestamp": ts, "ja3": ja3, "ttl": ttl}, self.window_sec
+            )
+            if match_result["match_found"]:
+                path = {
+                    "src_ip": match_result["matched_src_ip"],
+                    "exit_node": dst_ip,
+                    "timestamp": ts,
+                    "readable_time": datetime.fromtimestamp(ts).strftime("%H:%M:%S"),
+                    "packet_size": length,
+                    "temporal_match_score": match_result["temporal_match_score"]
+                }
+
+        # Candidates must be strictly earlier, so indexing after the lookup
+        # is the same as indexing first
+        self.index.add((ja3, ttl), ts, src_ip)
+        return path
 
-    tor_exit_ips = extract_exit_ips(tor["relays"])
+
+def correlate_packets(pcap_raw, tor_exit_ips, window_sec=5):
+    """
+    Per-packet correlation over a list of packet dicts (legacy
+    pcap_parsed.json input). Returns (correlated_paths, timeline).
+    """
+    # Each distinct destination string is parsed once
+    interner = IPInterner()
+    exit_ids = {interner.intern(ip) for ip in tor_exit_ips.addresses}
+
+    # Only fingerprints seen on exit-bound packets can ever match
+    exit_keys = {
+        (pkt.get("ja3"), pkt.get("ttl"))
+        for pkt in pcap_raw if interner.intern(pkt["dst_ip"]) in exit_ids
+    }
+    temporal_index = build_temporal_index(pcap_raw, exit_keys)
 
     correlated_paths = []
     timeline = []
 
     for pkt in pcap_raw:
-        dst_ip = normalize_ip(pkt["dst_ip"])
+        dst_id = interner.intern(pkt["dst_ip"])
 
-        if dst_ip in tor_exit_ips:
+        if dst_id in exit_ids:
+            dst_ip = interner.lookup(dst_id)
             # --- FR 2: Perform Temporal Correlation ---
-            match_result = find_temporal_match(pcap_raw, pkt, window_sec=5)
+            match_result = find_temporal_match(temporal_index, pkt, window_sec=window_sec)
 
             # Only record the path if a matching entry was found temporally and via fingerprint
             if match_result["match_found"]:
@@ -137,21 +283,349 @@ def correlate():
                 "ip": pkt["src_ip"]
             })
 
+    timeline.sort(key=lambda x: x["timestamp"])
+    return correlated_paths, timeline
+
+
+def exit_fingerprint_mask(fingerprint, exit_pos):
+    """
+    Packets whose fingerprint also occurs on an exit packet. Every other
+    packet can never be a match candidate. Fingerprints are small dense
+    codes, so the exit set is a direct lookup table (exact, unlike a Bloom
+    filter); np.isin takes over past MAX_FINGERPRINT_TABLE codes.
+    """
+    exit_fp = fingerprint[exit_pos]
+    top = int(fingerprint.max()) + 1
+    if top <= MAX_FINGERPRINT_TABLE:
+        seen = np.zeros(top, dtype=bool)
+        seen[exit_fp] = True
+        return seen[fingerprint]
+    return np.isin(fingerprint, exit_fp)
+
+
+def match_kernel(ticks, fingerprint, exit_pos, window_sec=5, resolution=1):
+    """
+    Vectorized find_temporal_match() over plain arrays: `ticks` and
+    `fingerprint` per packet, `exit_pos` the positions of the exit packets.
+
+    Packets whose fingerprint no exit carries are dropped first (see
+    exit_fingerprint_mask()). The rest are sorted by (fingerprint,
+    timestamp) into one composite int64 key, so the "latest candidate
+    before the exit" lookup for all exits is a single np.searchsorted.
+    Returns (exit_pos, matched_pos, scores) for the exits that found a
+    match, or None when the composite key would overflow.
+    """
+    if len(exit_pos) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+
+    rows = None
+    candidate = exit_fingerprint_mask(fingerprint, exit_pos)
+    if not candidate.all():
+        # Kept rows stay in capture order, so ties resolve as before
+        rows = np.flatnonzero(candidate)
+        ticks, fingerprint = ticks[rows], fingerprint[rows]
+        exit_pos = np.searchsorted(rows, exit_pos)
+
+    keys, rank = np.unique(fingerprint, return_inverse=True)
+    t_min = int(ticks.min())
+    span = int(ticks.max()) - t_min + 1
+    if len(keys) * span >= 2 ** 62:
+        return None
+
+    composite = rank.astype(np.int64) * span + (ticks - t_min)
+
+    # Stable sort keeps capture order among identical composites
+    order = np.argsort(composite, kind="stable")
+    sorted_composite = composite[order]
+
+    # Latest packet with the same fingerprint strictly before each exit
+    last = np.searchsorted(sorted_composite, composite[exit_pos], side="left") - 1
+    valid = last >= 0
+    last = np.where(valid, last, 0)
+    valid &= rank[order[last]] == rank[exit_pos]
+
+    # Earliest packet (capture order) carrying that same timestamp wins ties
+    first = np.searchsorted(sorted_composite, sorted_composite[last], side="left")
+    matched = order[first]
+
+    # Temporal Score: Closer to 1.0 (perfect match) is better
+    if resolution == 1:
+        time_diff = ticks[exit_pos] - ticks[matched]
+    else:
+        time_diff = ticks[exit_pos] / resolution - ticks[matched] / resolution
+    scores = 1.0 - (time_diff / window_sec)
+
+    keep = valid & (scores > 0.0)
+    exit_pos, matched = exit_pos[keep], matched[keep]
+    if rows is not None:
+        exit_pos, matched = rows[exit_pos], rows[matched]
+    return exit_pos, matched, scores[keep]
+
+
+def store_fingerprints(store):
+    """(JA3 code, TTL) of every packet folded into one int64."""
+    return (
+        np.asarray(store["ja3"], dtype=np.int64) << 8
+    ) | np.asarray(store["ttl"], dtype=np.int64)
+
+
+def batch_temporal_match(store, exit_rows, window_sec=5):
+    """
+    match_kernel() over a whole packet store, in one process.
+    Returns (exit_rows, matched_rows, scores) or None on key overflow.
+    """
+    ticks = np.asarray(store["timestamp"], dtype=np.int64)
+    return match_kernel(
+        ticks, store_fingerprints(store), exit_rows, window_sec, store.resolution
+    )
+
+
+# --------------------------------------------------
+# TIME-SHARDED CORRELATION
+# Packets are put in time order once, cut into contiguous shards by
+# position, and each shard is matched in a worker process. A shard owns
+# the exits in its range and also sees the `window_sec` of packets before
+# it, which holds every candidate those exits can match, so each exit is
+# matched exactly once and exactly as the single-process kernel would.
+# --------------------------------------------------
+MIN_SHARD_PACKETS = 250_000
+
+_shared = {}
+
+
+def _share_arrays(arrays):
+    """Copies arrays into shared memory → (segments, spec for workers)."""
+    segments, spec = [], {}
+    for name, arr in arrays.items():
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+        segments.append(shm)
+        spec[name] = (shm.name, arr.dtype.str, arr.shape)
+    return segments, spec
+
+
+def _attach_shared(spec):
+    """Worker initializer: maps the parent's shared arrays without copying."""
+    for name, (shm_name, dtype, shape) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _shared[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+
+def _match_shard(lo, start, stop, window_sec, resolution):
+    """
+    Matches the exits at time-ordered positions [start, stop), using the
+    packets from `lo` (start minus the overlap window) as candidates.
+    Returns global (exit_pos, matched_pos, scores), or None on overflow.
+    """
+    ticks = _shared["ticks"][1][lo:stop]
+    fingerprint = _shared["fingerprint"][1][lo:stop]
+    is_exit = _shared["is_exit"][1][start:stop]
+
+    exit_pos = np.flatnonzero(is_exit) + (start - lo)
+    if len(exit_pos) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+
+    result = match_kernel(ticks, fingerprint, exit_pos, window_sec, resolution)
+    if result is None:
+        return None
+    exit_pos, matched, scores = result
+    return exit_pos + lo, matched + lo, scores
+
+
+def sharded_temporal_match(store, exit_mask, window_sec=5, workers=2):
+    """
+    batch_temporal_match() spread over `workers` processes. Results are
+    merged back into exit-row order, so the output is identical to the
+    single-process kernel. Returns None on key overflow.
+    """
+    ticks = np.asarray(store["timestamp"], dtype=np.int64)
+    fingerprint = store_fingerprints(store)
+
+    # Captures are nearly always written in time order already
+    if np.all(ticks[1:] >= ticks[:-1]):
+        order = None
+    else:
+        order = np.argsort(ticks, kind="stable")
+        ticks, fingerprint, exit_mask = ticks[order], fingerprint[order], exit_mask[order]
+
+    n = len(ticks)
+    overlap = math.ceil(window_sec * store.resolution)
+    bounds = np.linspace(0, n, workers + 1).astype(np.int64)
+    starts, stops = bounds[:-1], bounds[1:]
+    los = np.searchsorted(ticks, ticks[np.minimum(starts, n - 1)] - overlap, side="left")
+
+    segments, spec = _share_arrays({
+        "ticks": ticks, "fingerprint": fingerprint, "is_exit": exit_mask
+    })
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_attach_shared, initargs=(spec,)
+        ) as pool:
+            futures = [
+                pool.submit(_match_shard, int(lo), int(a), int(b), window_sec, store.resolution)
+                for lo, a, b in zip(los, starts, stops) if b > a
+            ]
+            parts = [f.result() for f in futures]
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+    if any(part is None for part in parts):
+        return None
+
+    exit_pos = np.concatenate([p[0] for p in parts])
+    matched = np.concatenate([p[1] for p in parts])
+    scores = np.concatenate([p[2] for p in parts])
+    if order is not None:
+        exit_pos, matched = order[exit_pos], order[matched]
+
+    # Shards own disjoint exits; sorting restores the single-process order
+    by_row = np.argsort(exit_pos, kind="stable")
+    return exit_pos[by_row], matched[by_row], scores[by_row]
+
+
+def correlation_workers(n_packets, workers=None):
+    """Worker count for a capture: None = one per core, capped by shard size."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, n_packets // MIN_SHARD_PACKETS))
+
+
+def correlate_batch(store, tor_exit_ips, window_sec=5, workers=1):
+    """
+    Batch correlation straight off the columnar packet store: exit
+    detection, window search and scoring are NumPy array operations and the
+    output dicts are only built at the end. Produces the same
+    (correlated_paths, timeline) as correlate_packets().
+    With workers > 1 the window search runs time-sharded in a process pool.
+
+    A FlowTable correlates flow against flow: each path is an exit flow
+    matched by its start time, carrying the flow's packet and byte totals.
+    """
+    if len(store) == 0:
+        return [], []
+
+    exit_mask = tor_exit_ips.contains_column(store["dst_ip"])
+
+    if workers > 1:
+        result = sharded_temporal_match(store, exit_mask, window_sec, workers)
+    else:
+        result = batch_temporal_match(store, np.flatnonzero(exit_mask), window_sec)
+    if result is None:
+        print("[!] Capture too wide for batch keys, using per-packet correlation")
+        return correlate_packets(list(store.iter_records()), tor_exit_ips, window_sec)
+    path_rows, matched_rows, scores = result
+
+    seconds = store.timestamps()
+    seconds_list = seconds.tolist()
+    readable = store.readable_times()
+    src_ips = store.ip_strings("src_ip")
+    dst_ips = store.ip_strings("dst_ip")
+    lengths = store["length"]
+
+    correlated_paths = [
+        {
+            "src_ip": src_ips[m],
+            "exit_node": dst_ips[r],
+            "timestamp": seconds_list[r],
+            "readable_time": readable[r],
+            "packet_size": int(lengths[r]),
+            "temporal_match_score": score
+        }
+        for r, m, score in zip(path_rows.tolist(), matched_rows.tolist(), scores.tolist())
+    ]
+    if isinstance(store, FlowTable):
+        for path, fields in zip(correlated_paths, store.path_fields(path_rows)):
+            path.update(fields)
+
+    is_exit = exit_mask.tolist()
+    timeline = [
+        {
+            "timestamp": seconds_list[i],
+            "time": readable[i],
+            "type": "TOR Exit" if is_exit[i] else "Clearnet Entry",
+            "ip": dst_ips[i] if is_exit[i] else src_ips[i]
+        }
+        for i in np.argsort(seconds, kind="stable").tolist()
+    ]
+
+    return correlated_paths, timeline
+
+
+def correlate_data(packets, relays, window_sec=5, workers=None, exit_index=None):
+    """
+    Correlates a PacketStore or FlowTable (batch kernel) or a list of
+    packet dicts (per-packet path) against the relays' exits. `workers` caps the
+    processes used for a large store (None = one per core). A prebuilt
+    `exit_index` of the relays is used instead of building one.
+    Returns (correlated_paths, timeline).
+    """
+    tor_exit_ips = exit_index if exit_index is not None else extract_exit_ips(relays)
+
+    if isinstance(packets, PacketStore):
+        workers = correlation_workers(len(packets), workers)
+        if workers > 1:
+            print(f"[+] Correlating in {workers} time shards")
+        correlated_paths, timeline = correlate_batch(packets, tor_exit_ips, window_sec, workers)
+    else:
+        correlated_paths, timeline = correlate_packets(packets, tor_exit_ips, window_sec)
+
     if not correlated_paths:
         print("[!] No strong temporal correlations detected (this is valid)")
     else:
         print(f"[✓] Found {len(correlated_paths)} strong temporal-correlated paths (FR 2)")
 
-    # Save the results
+    return correlated_paths, timeline
+
+
+def save_correlation(correlated_paths, timeline):
     with open(OUT_PATHS, "w") as f:
         json.dump(correlated_paths, f, indent=4)
 
     with open(OUT_TIMELINE, "w") as f:
-        json.dump(sorted(timeline, key=lambda x: x["timestamp"]), f, indent=4)
+        json.dump(timeline, f, indent=4)
+
+    # Shape matches from an earlier correlation would leak into fusion_engine.py
+    if os.path.exists(SHAPE_FILE):
+        os.remove(SHAPE_FILE)
 
     print(f"[✓] Saved → {OUT_PATHS}")
     print(f"[✓] Saved → {OUT_TIMELINE}")
 
 
+@profiled("correlate")
+def correlate(batch=True, workers=None, flows=True):
+    print("[+] Correlating PCAP traffic with Tor exits (FR 2)...")
+
+    tor = load_json(TOR_FILE)
+    if batch and store_exists(PCAP_STORE):
+        packets = open_store(PCAP_STORE)
+        if flows:
+            packets = assemble_flows(packets)
+    else:
+        packets = load_packets(PCAP_STORE, PCAP_FILE)
+
+    if packets is None or len(packets) == 0 or not tor:
+        print("[!] Required inputs missing")
+        return
+
+    correlated_paths, timeline = correlate_data(
+        packets, tor["relays"], window_sec=5, workers=workers
+    )
+    count(records_in=len(packets), records_out=len(correlated_paths))
+
+    # Save the results
+    save_correlation(correlated_paths, timeline)
+
+
 if __name__ == "__main__":
-    correlate()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Correlate captured traffic with Tor exits")
+    parser.add_argument("--packets", action="store_true",
+                        help="correlate individual packets instead of assembled flows")
+    args = parser.parse_args()
+
+    workers = os.environ.get("SHADOWFP_WORKERS")
+    correlate(workers=int(workers) if workers else None, flows=not args.packets)
\ No newline at end of file
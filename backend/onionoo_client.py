@@ -0,0 +1,359 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+Asynchronous, streaming Onionoo client.
+
+fetch_documents() requests several Onionoo documents (details,
+bandwidth, uptime, ...) concurrently over a small pool of keep-alive
+HTTP/1.1 connections. Each response is parsed while it downloads: the
+gzip body is inflated chunk by chunk and every element of the
+document's "relays" array goes to a callback as soon as it is complete,
+so a multi-MB document is never held whole, as bytes or as a tree.
+
+Standard library only (asyncio streams, zlib, json.raw_decode).
+"""
+
+import asyncio
+import codecs
+import json
+import re
+import ssl
+import zlib
+from contextlib import asynccontextmanager
+from urllib.parse import urlencode, urlsplit
+
+# --------------------------------------------------
+# SETTINGS
+# --------------------------------------------------
+# Keep-alive connections per host
+POOL_SIZE = 3
+# Per connect/read timeout (the whole download may take longer)
+READ_TIMEOUT_SEC = 10
+READ_SIZE = 1 << 16
+# One array element larger than this is treated as a malformed document
+MAX_ELEMENT_CHARS = 16 << 20
+
+
+# --------------------------------------------------
+# INCREMENTAL JSON
+# --------------------------------------------------
+_decoder = json.JSONDecoder()
+_WS = re.compile(r"[ \t\r\n]*")
+_INCOMPLETE = object()
+
+
+class StreamingDocumentParser:
+    """
+    Incremental parser for one JSON object whose bulk is in arrays, as
+    Onionoo documents are ({"relays_published": ..., "relays": [...]}).
+
+    feed() it text as it arrives. Every element of the arrays named in
+    `stream` is passed to `on_element(name, element)` once complete;
+    other members are collected in `fields`. Only the unparsed tail (at
+    most one element plus one chunk) is buffered; each element is
+    decoded by json's C scanner.
+    """
+
+    def __init__(self, on_element, stream=("relays",)):
+        self.on_element = on_element
+        self.stream = frozenset(stream)
+        self.fields = {}
+        self._buf = ""
+        self._pos = 0
+        self._state = "start"
+        self._key = None
+
+    def feed(self, text):
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        while self._step(final=False):
+            pass
+
+    def close(self):
+        """Parses what is left; returns `fields`, raises ValueError if truncated."""
+        while self._step(final=True):
+            pass
+        if self._state != "done":
+            raise ValueError("truncated Onionoo document")
+        return self.fields
+
+    def _decode(self, pos, final):
+        buf = self._buf
+        try:
+            value, end = _decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if final or len(buf) - pos > MAX_ELEMENT_CHARS:
+                raise
+            return _INCOMPLETE
+        # A number cut at the chunk boundary would decode as a shorter one
+        if end == len(buf) and not final:
+            return _INCOMPLETE
+        self._pos = end
+        return value
+
+    def _step(self, final):
+        buf = self._buf
+        pos = _WS.match(buf, self._pos).end()
+        self._pos = pos
+        if pos == len(buf):
+            return False
+        c, state = buf[pos], self._state
+
+        if state == "start":
+            if c != "{":
+                raise ValueError("Onionoo document is not a JSON object")
+            self._state = "member"
+        elif state == "member":
+            if c == "}":
+                self._state = "done"
+            else:
+                key = self._decode(pos, final)
+                if key is _INCOMPLETE:
+                    return False
+                self._key = key
+                self._state = "colon"
+                return True
+        elif state == "colon":
+            if c != ":":
+                raise ValueError(f"expected ':' after {self._key!r}")
+            self._state = "value"
+        elif state == "value":
+            if c == "[" and self._key in self.stream:
+                self._state = "element"
+            else:
+                value = self._decode(pos, final)
+                if value is _INCOMPLETE:
+                    return False
+                self.fields[self._key] = value
+                self._state = "after_member"
+                return True
+        elif state == "element":
+            if c == "]":
+                self._state = "after_member"
+            else:
+                element = self._decode(pos, final)
+                if element is _INCOMPLETE:
+                    return False
+                self.on_element(self._key, element)
+                self._state = "after_element"
+                return True
+        elif state == "after_element":
+            if c not in ",]":
+                raise ValueError(f"expected ',' or ']' in {self._key!r}")
+            self._state = "element" if c == "," else "after_member"
+        elif state == "after_member":
+            if c not in ",}":
+                raise ValueError("expected ',' or '}' between members")
+            self._state = "member" if c == "," else "done"
+        else:
+            raise ValueError("data after the end of the Onionoo document")
+
+        self._pos = pos + 1
+        return True
+
+
+# --------------------------------------------------
+# HTTP/1.1 OVER ASYNCIO STREAMS
+# --------------------------------------------------
+async def _timed(awaitable):
+    return await asyncio.wait_for(awaitable, READ_TIMEOUT_SEC)
+
+
+class _Connection:
+    def __init__(self, reader, writer, reused):
+        self.reader = reader
+        self.writer = writer
+        self.reused = reused
+        # Set once the response was read to its end on a persistent connection
+        self.reusable = False
+
+
+class ConnectionPool:
+    """Keep-alive connections to one Onionoo host, at most `size` open."""
+
+    def __init__(self, base_url, size=POOL_SIZE):
+        url = urlsplit(base_url)
+        self.https = url.scheme == "https"
+        self.host = url.hostname
+        self.port = url.port or (443 if self.https else 80)
+        self.base_path = url.path.rstrip("/")
+        self.host_header = url.netloc
+        self._ssl = ssl.create_default_context() if self.https else None
+        self._slots = asyncio.Semaphore(size)
+        self._idle = []
+        # Connections handed out from the idle list rather than dialled
+        self.reused = 0
+
+    async def _connect(self):
+        return await _timed(asyncio.open_connection(
+            self.host, self.port, ssl=self._ssl,
+            server_hostname=self.host if self.https else None
+        ))
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Yields a pooled connection; it returns to the pool only if the
+        caller marked it `reusable`, otherwise it is closed.
+        """
+        async with self._slots:
+            if self._idle:
+                conn = _Connection(*self._idle.pop(), reused=True)
+                self.reused += 1
+            else:
+                conn = _Connection(*await self._connect(), reused=False)
+            try:
+                yield conn
+            finally:
+                if conn.reusable:
+                    self._idle.append((conn.reader, conn.writer))
+                else:
+                    conn.writer.close()
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+async def _send_request(conn, pool, path, headers):
+    reader, writer = conn.reader, conn.writer
+    lines = [
+        f"GET {path} HTTP/1.1",
+        f"Host: {pool.host_header}",
+        "Accept: application/json",
+        "Accept-Encoding: gzip",
+        "Connection: keep-alive",
+    ] + [f"{k}: {v}" for k, v in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    await _timed(writer.drain())
+
+    status_line = await _timed(reader.readline())
+    if not status_line:
+        raise ConnectionResetError("connection closed before the response")
+    version, status = status_line.decode("latin-1").split()[:2]
+
+    response_headers = {}
+    while True:
+        line = await _timed(reader.readline())
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    return version, int(status), response_headers
+
+
+async def _body_chunks(reader, headers):
+    """Raw body bytes as they arrive (Content-Length, chunked, or until close)."""
+    async def read_exactly(remaining):
+        while remaining:
+            data = await _timed(reader.read(min(remaining, READ_SIZE)))
+            if not data:
+                raise ConnectionResetError("response body truncated")
+            remaining -= len(data)
+            yield data
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await _timed(reader.readline())).split(b";")[0], 16)
+            if size == 0:
+                while (await _timed(reader.readline())) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            async for data in read_exactly(size):
+                yield data
+            await _timed(reader.readline())
+    elif "content-length" in headers:
+        async for data in read_exactly(int(headers["content-length"])):
+            yield data
+    else:
+        while data := await _timed(reader.read(READ_SIZE)):
+            yield data
+
+
+async def fetch_document(pool, name, on_element, params=None, if_modified_since=None):
+    """
+    Streams one document (GET /<name>?<params>) through a
+    StreamingDocumentParser. Returns None on 304 Not Modified, else
+    {"fields": top-level non-array members, "last_modified": header}.
+    """
+    path = f"{pool.base_path}/{name}"
+    if params:
+        path += "?" + urlencode(params)
+    headers = {"If-Modified-Since": if_modified_since} if if_modified_since else {}
+
+    for attempt in range(2):
+        async with pool.connection() as conn:
+            try:
+                version, status, response_headers = await _send_request(
+                    conn, pool, path, headers
+                )
+            except ConnectionError:
+                # The server dropped an idle keep-alive connection: redial once
+                if conn.reused and attempt == 0:
+                    continue
+                raise
+
+            persistent = (
+                version == "HTTP/1.1"
+                and response_headers.get("connection", "").lower() != "close"
+            )
+            if status == 304:
+                conn.reusable = persistent
+                return None
+
+            # Only a framed body leaves the connection at a message boundary
+            persistent = persistent and (
+                "content-length" in response_headers or "transfer-encoding" in response_headers
+            )
+            chunks = _body_chunks(conn.reader, response_headers)
+            if status != 200:
+                async for _ in chunks:
+                    pass
+                conn.reusable = persistent
+                raise ConnectionError(f"Onionoo /{name} answered HTTP {status}")
+
+            inflate = None
+            if response_headers.get("content-encoding", "").lower() == "gzip":
+                inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            text = codecs.getincrementaldecoder("utf-8")()
+            parser = StreamingDocumentParser(lambda _, element: on_element(element))
+
+            async for data in chunks:
+                if inflate is not None:
+                    data = inflate.decompress(data)
+                parser.feed(text.decode(data))
+            if inflate is not None:
+                parser.feed(text.decode(inflate.flush()))
+            parser.feed(text.decode(b"", final=True))
+            conn.reusable = persistent
+
+            return {"fields": parser.close(), "last_modified": response_headers.get("last-modified")}
+
+
+async def fetch_documents(base_url, handlers, params=None, if_modified_since=None,
+                          pool_size=POOL_SIZE):
+    """
+    Fetches the documents in `handlers` ({name: on_element(relay)})
+    concurrently over one connection pool. `if_modified_since` maps the
+    names of the documents to request conditionally to their
+    If-Modified-Since date; the others are always fetched in full.
+    Returns {name: result}, where a result is fetch_document()'s return
+    value or the exception that document failed with, so callers decide
+    which documents are required.
+    """
+    if_modified_since = if_modified_since or {}
+    pool = ConnectionPool(base_url, pool_size)
+    try:
+        results = await asyncio.gather(
+            *(fetch_document(pool, name, on_element, params, if_modified_since.get(name))
+              for name, on_element in handlers.items()),
+            return_exceptions=True
+        )
+    finally:
+        await pool.close()
+    return dict(zip(handlers, results))
@@ -0,0 +1,241 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+Local stand-in for the Onionoo API, for tests and offline lab machines.
+
+    python backend/onionoo_stub.py --relays 8000 --port 8765
+    ONIONOO_URL=http://127.0.0.1:8765 python backend/tor_collect.py
+
+Serves /details, /bandwidth and /uptime like Onionoo does: over
+keep-alive HTTP/1.1, gzip-compressed when asked, with Last-Modified and
+304 Not Modified answers to If-Modified-Since.
+"""
+
+import argparse
+import gzip
+import json
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+# --------------------------------------------------
+# SYNTHETIC DOCUMENTS
+# --------------------------------------------------
+def make_details_document(n_relays=1000, seed=0, published=None):
+    """Onionoo-shaped details document with `n_relays` random relays."""
+    rng = random.Random(seed)
+    published = published or datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    relays = []
+    for i in range(n_relays):
+        ip = f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        flags = ["Fast", "Running", "Valid"]
+        if rng.random() < 0.45:
+            flags.append("Guard")
+        if rng.random() < 0.25:
+            flags.append("Exit")
+
+        or_addresses = [f"{ip}:{rng.choice([443, 9001])}"]
+        if rng.random() < 0.3:
+            or_addresses.append(f"[2001:db8:{i:x}::1]:9001")
+
+        relays.append({
+            "nickname": f"StubRelay{i}",
+            "fingerprint": f"{i:040X}",
+            "or_addresses": or_addresses,
+            "exit_addresses": [ip] if "Exit" in flags else [],
+            "last_seen": published.strftime("%Y-%m-%d %H:%M:%S"),
+            "flags": flags,
+            "advertised_bandwidth": rng.randint(50_000, 50_000_000)
+        })
+
+    return {
+        "version": "8.0",
+        "relays_published": published.strftime("%Y-%m-%d %H:%M:%S"),
+        "relays": relays,
+        "bridges_published": published.strftime("%Y-%m-%d %H:%M:%S"),
+        "bridges": []
+    }
+
+
+def _history(rng, published, factor, low, high, count=180):
+    """One Onionoo "1_month" history: `count` 4-hourly values in 0..999, × factor."""
+    return {
+        "first": (published - timedelta(hours=4 * (count - 1))).strftime("%Y-%m-%d %H:%M:%S"),
+        "last": published.strftime("%Y-%m-%d %H:%M:%S"),
+        "interval": 14400,
+        "factor": factor,
+        "count": count,
+        "values": [rng.randint(low, high) if rng.random() > 0.02 else None for _ in range(count)]
+    }
+
+
+def _companion_document(details, seed, make_entry):
+    rng = random.Random(seed)
+    published = datetime.strptime(details["relays_published"], "%Y-%m-%d %H:%M:%S")
+    return {
+        "version": details["version"],
+        "relays_published": details["relays_published"],
+        "relays": [
+            dict(fingerprint=r["fingerprint"], **make_entry(rng, published, r))
+            for r in details["relays"]
+        ],
+        "bridges_published": details["bridges_published"],
+        "bridges": []
+    }
+
+
+def make_bandwidth_document(details, seed=0):
+    """Onionoo-shaped bandwidth document for the relays of `details`."""
+    def entry(rng, published, relay):
+        factor = relay["advertised_bandwidth"] / 999
+        return {
+            "write_history": {"1_month": _history(rng, published, factor, 200, 999)},
+            "read_history": {"1_month": _history(rng, published, factor, 200, 999)}
+        }
+    return _companion_document(details, seed, entry)
+
+
+def make_uptime_document(details, seed=0):
+    """Onionoo-shaped uptime document for the relays of `details`."""
+    def entry(rng, published, relay):
+        return {
+            "uptime": {"1_month": _history(rng, published, 1 / 999, 700, 999)},
+            "flags": {
+                flag: {"1_month": _history(rng, published, 1 / 999, 900, 999)}
+                for flag in relay["flags"]
+            }
+        }
+    return _companion_document(details, seed, entry)
+
+
+def make_documents(n_relays=1000, seed=0, published=None):
+    """{"details", "bandwidth", "uptime"} documents over the same relays."""
+    details = make_details_document(n_relays, seed, published)
+    return {
+        "details": details,
+        "bandwidth": make_bandwidth_document(details, seed),
+        "uptime": make_uptime_document(details, seed)
+    }
+
+
+# --------------------------------------------------
+# SERVER
+# --------------------------------------------------
+class OnionooStub:
+    """
+    Serves one Onionoo document per endpoint. `documents` maps an
+    endpoint name ("details", ...) to its JSON document; `requests` counts
+    what was asked for, including 304s, so tests can assert on it. With
+    `gzip_bodies` off, bodies are sent uncompressed even when the client
+    accepts gzip.
+    """
+
+    def __init__(self, documents, host="127.0.0.1", port=0, gzip_bodies=True):
+        self.gzip_bodies = gzip_bodies
+        self.documents = {}
+        for name, doc in documents.items():
+            self.set_document(name, doc)
+        self.requests = []
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so clients can pool connections
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                name = urlparse(self.path).path.strip("/")
+                entry = stub.documents.get(name)
+                if entry is None:
+                    self.send_error(404)
+                    return
+
+                body, compressed, last_modified = entry
+                since = self.headers.get("If-Modified-Since")
+                not_modified = False
+                if since:
+                    try:
+                        not_modified = parsedate_to_datetime(since) >= last_modified
+                    except (TypeError, ValueError):
+                        pass
+                stub.requests.append((name, 304 if not_modified else 200))
+
+                if not_modified:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                if stub.gzip_bodies and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = compressed
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Last-Modified", format_datetime(last_modified, usegmt=True))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def set_document(self, name, document):
+        published = datetime.strptime(
+            document.get("relays_published", "1970-01-01 00:00:00"), "%Y-%m-%d %H:%M:%S"
+        ).replace(tzinfo=timezone.utc)
+        body = json.dumps(document).encode()
+        self.documents[name] = (body, gzip.compress(body), published)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Onionoo stand-in")
+    parser.add_argument("document", nargs="?", help="details document JSON to serve")
+    parser.add_argument("--relays", type=int, default=1000, help="synthetic relay count")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.document:
+        with open(args.document, "r") as f:
+            details = json.load(f)
+        documents = {
+            "details": details,
+            "bandwidth": make_bandwidth_document(details),
+            "uptime": make_uptime_document(details)
+        }
+    else:
+        documents = make_documents(args.relays)
+        details = documents["details"]
+
+    stub = OnionooStub(documents, port=args.port)
+    print(f"[✓] Onionoo stand-in serving {len(details['relays'])} relays at {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
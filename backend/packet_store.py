@@ -0,0 +1,440 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+import hashlib
+import json
+import os
+import socket
+from datetime import datetime
+
+import numpy as np
+
+from paths import DATA_DIR
+
+# --------------------------------------------------
+# PATHS
+# --------------------------------------------------
+STORE_DIR = os.path.join(DATA_DIR, "pcap_store")
+LEGACY_JSON = os.path.join(DATA_DIR, "pcap_parsed.json")
+
+META_FILE = "meta.json"
+
+# --------------------------------------------------
+# COLUMN LAYOUT
+# One raw little-endian file per column, described by meta.json:
+#   timestamp   int64   ticks of 1/resolution seconds
+#   src_ip      uint32 (IPv4-only capture) or S16 (packed IPv6 / v4-mapped)
+#   dst_ip      same as src_ip
+#   length      uint16  original wire length (clipped)
+#   ttl         uint8   IPv4 TTL / IPv6 hop limit
+#   tcp_window  uint16  0 for non-TCP packets
+#   ja3         uint32  code into meta["ja3"]; code 0 = no fingerprint
+#   proto       uint8   IP protocol number; 0 = unknown (e.g. later fragments)
+#   src_port    uint16  TCP/UDP ports; 0 for other protocols
+#   dst_port    uint16
+#   ja3s        uint32  code into meta["ja3s"] (ServerHello); 0 = none
+#   ja4         uint32  code into meta["ja4"]; 0 = none
+# Fingerprint codes are per store: meta[name] is the case's code table.
+# Stores written before the transport or ja3s/ja4 columns existed read
+# them as zeros.
+# --------------------------------------------------
+FIXED_DTYPES = {
+    "timestamp": "<i8",
+    "length": "<u2",
+    "ttl": "u1",
+    "tcp_window": "<u2",
+    "ja3": "<u4",
+    "proto": "u1",
+    "src_port": "<u2",
+    "dst_port": "<u2",
+    "ja3s": "<u4",
+    "ja4": "<u4",
+}
+TRANSPORT_COLUMNS = ("proto", "src_port", "dst_port")
+# Dictionary-encoded string columns; ja3s/ja4 follow the transport fields
+FINGERPRINT_COLUMNS = ("ja3", "ja3s", "ja4")
+EXTRA_FINGERPRINTS = ("ja3s", "ja4")
+OPTIONAL_COLUMNS = TRANSPORT_COLUMNS + EXTRA_FINGERPRINTS
+IP_COLUMNS = ("src_ip", "dst_ip")
+IPV4_DTYPE = "<u4"
+IPV6_DTYPE = "S16"
+
+CHUNK_SIZE = 1 << 16
+
+_V4_MAPPED = b"\x00" * 10 + b"\xff\xff"
+
+
+# --------------------------------------------------
+# IP ENCODING
+# --------------------------------------------------
+def ip_to_packed(ip):
+    """Packs an address into 16 bytes (IPv4 as ::ffff:a.b.c.d)."""
+    if ":" in ip:
+        return socket.inet_pton(socket.AF_INET6, ip)
+    return _V4_MAPPED + socket.inet_aton(ip)
+
+
+def packed_to_ip(raw):
+    """Inverse of ip_to_packed (tolerates S16's stripped trailing zeros)."""
+    raw = raw.ljust(16, b"\x00")
+    if raw[:12] == _V4_MAPPED:
+        return socket.inet_ntoa(raw[12:])
+    return socket.inet_ntop(socket.AF_INET6, raw)
+
+
+def _v4_to_v6_column(values):
+    """Converts a uint32 IPv4 column into the S16 v4-mapped layout."""
+    out = np.zeros((len(values), 16), dtype=np.uint8)
+    out[:, 10:12] = 0xFF
+    out[:, 12:] = np.asarray(values, dtype=">u4").view(np.uint8).reshape(-1, 4)
+    return out.view(IPV6_DTYPE).ravel()
+
+
+class _IPColumnWriter:
+    """
+    Appends addresses as uint32 until the first IPv6 address shows up,
+    then rewrites what was written so far into the 16-byte layout.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dtype = IPV4_DTYPE
+        self.f = open(path, "wb")
+
+    def write(self, ips):
+        if self.dtype == IPV4_DTYPE and any(":" in ip for ip in ips):
+            self._upgrade()
+
+        if self.dtype == IPV4_DTYPE:
+            values = np.fromiter(
+                (int.from_bytes(socket.inet_aton(ip), "big") for ip in ips),
+                dtype=IPV4_DTYPE, count=len(ips)
+            )
+        else:
+            values = np.array([ip_to_packed(ip) for ip in ips], dtype=IPV6_DTYPE)
+        self.f.write(values.tobytes())
+
+    def write_values(self, values):
+        """Appends raw column values: uint32 IPv4 or S16 packed addresses."""
+        if values.dtype == np.dtype(IPV6_DTYPE) and self.dtype == IPV4_DTYPE:
+            self._upgrade()
+        if self.dtype == IPV6_DTYPE and values.dtype != np.dtype(IPV6_DTYPE):
+            values = _v4_to_v6_column(values)
+        self.f.write(np.ascontiguousarray(values, dtype=self.dtype).tobytes())
+
+    def _upgrade(self):
+        self.f.close()
+        existing = np.fromfile(self.path, dtype=IPV4_DTYPE)
+        self.f = open(self.path, "wb")
+        self.f.write(_v4_to_v6_column(existing).tobytes())
+        self.dtype = IPV6_DTYPE
+
+    def close(self):
+        self.f.close()
+
+
+# --------------------------------------------------
+# WRITER
+# --------------------------------------------------
+class StoreWriter:
+    """
+    Writes a new columnar store chunk by chunk, from packet tuples
+    (write_rows) or from decoded column arrays (write_columns). close()
+    writes meta.json last, so a partially written store is never picked
+    up; a writer that is not closed leaves no store behind.
+
+    `resolution` is the number of timestamp ticks per second.
+    Fingerprint strings are stored as codes into per-store tables,
+    assigned in order of first appearance.
+    """
+
+    def __init__(self, store_dir=STORE_DIR, resolution=1_000_000):
+        os.makedirs(store_dir, exist_ok=True)
+        self.store_dir = store_dir
+        self.resolution = resolution
+        self.meta_path = os.path.join(store_dir, META_FILE)
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+
+        self.files = {
+            name: open(os.path.join(store_dir, f"{name}.bin"), "wb")
+            for name in FIXED_DTYPES
+        }
+        self.ip_writers = {
+            name: _IPColumnWriter(os.path.join(store_dir, f"{name}.bin"))
+            for name in IP_COLUMNS
+        }
+        self.tables = {name: [None] for name in FINGERPRINT_COLUMNS}
+        self.codes = {name: {None: 0} for name in FINGERPRINT_COLUMNS}
+        self.count = 0
+
+    def _encode(self, name, values):
+        table, known = self.tables[name], self.codes[name]
+        out = []
+        for value in values:
+            code = known.get(value)
+            if code is None:
+                code = known[value] = len(table)
+                table.append(value)
+            out.append(code)
+        return out
+
+    def _write_fixed(self, columns, n):
+        for name, values in columns.items():
+            self.files[name].write(np.asarray(values).astype(FIXED_DTYPES[name]).tobytes())
+        self.count += n
+
+    def write_rows(self, rows):
+        """
+        Appends packet tuples (timestamp, src_ip, dst_ip, length, ttl,
+        tcp_window, ja3[, proto, src_port, dst_port[, ja3s, ja4]]). Tuples
+        without the optional fields store zeros for them.
+        """
+        ts, src, dst, length, ttl, win, ja3, *rest = zip(*rows)
+        transport, extra = rest[:3], rest[3:5]
+        columns = {
+            "timestamp": np.rint(np.asarray(ts, dtype=np.float64) * self.resolution),
+            "length": np.minimum(length, 0xFFFF),
+            "ttl": [t or 0 for t in ttl],
+            "tcp_window": [w or 0 for w in win],
+            "ja3": self._encode("ja3", ja3),
+        }
+        for name, values in zip(TRANSPORT_COLUMNS, transport or [(0,) * len(rows)] * 3):
+            columns[name] = [v or 0 for v in values]
+        for name, values in zip(EXTRA_FINGERPRINTS, extra or [(None,) * len(rows)] * 2):
+            columns[name] = self._encode(name, values)
+        self.ip_writers["src_ip"].write(src)
+        self.ip_writers["dst_ip"].write(dst)
+        self._write_fixed(columns, len(rows))
+
+    def write_columns(self, columns):
+        """
+        Appends one chunk of decoded columns: "timestamp" in seconds
+        (float64), src_ip/dst_ip as uint32 or S16 arrays, the other fixed
+        columns as integer arrays, and each fingerprint column as an
+        (indices, values) pair meaning values[indices[i]] for row i.
+        """
+        n = len(columns["timestamp"])
+        fixed = {
+            "timestamp": np.rint(np.asarray(columns["timestamp"], dtype=np.float64) * self.resolution),
+            "length": np.minimum(columns["length"], 0xFFFF),
+        }
+        for name in ("ttl", "tcp_window") + TRANSPORT_COLUMNS:
+            fixed[name] = columns[name]
+        for name in FINGERPRINT_COLUMNS:
+            indices, values = columns[name]
+            # Encode values in row order of first use, as write_rows() does
+            used, first = np.unique(indices, return_index=True)
+            used = used[np.argsort(first)]
+            codes = np.zeros(len(values), dtype=np.uint32)
+            codes[used] = self._encode(name, [values[i] for i in used])
+            fixed[name] = codes[indices]
+        for name in IP_COLUMNS:
+            self.ip_writers[name].write_values(columns[name])
+        self._write_fixed(fixed, n)
+
+    def close(self):
+        """Closes the column files and writes meta.json; returns the row count."""
+        self._close_files()
+
+        columns = dict(FIXED_DTYPES)
+        for name, w in self.ip_writers.items():
+            columns[name] = w.dtype
+
+        with open(self.meta_path, "w") as f:
+            json.dump({
+                "count": self.count,
+                "resolution": self.resolution,
+                "columns": columns,
+                **self.tables
+            }, f, indent=4)
+        return self.count
+
+    def _close_files(self):
+        for f in self.files.values():
+            f.close()
+        for w in self.ip_writers.values():
+            w.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._close_files()
+
+
+def write_store(packets, store_dir=STORE_DIR, resolution=1_000_000, progress=None):
+    """
+    Streams packet tuples (see StoreWriter.write_rows) into a columnar
+    store, CHUNK_SIZE rows at a time. `progress(count)`, if given, is
+    called after every chunk. Returns the number of packets written.
+    """
+    with StoreWriter(store_dir, resolution) as writer:
+        rows = []
+        for pkt in packets:
+            rows.append(pkt)
+            if len(rows) == CHUNK_SIZE:
+                writer.write_rows(rows)
+                rows = []
+                if progress:
+                    progress(writer.count)
+        if rows:
+            writer.write_rows(rows)
+    return writer.count
+
+
+# --------------------------------------------------
+# READER
+# --------------------------------------------------
+class PacketStore:
+    """
+    Read-only view over a columnar store. Every column is an np.memmap, so
+    opening a store costs the same for 60 packets as for 50M.
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        with open(os.path.join(store_dir, META_FILE), "r") as f:
+            meta = json.load(f)
+
+        self.store_dir = store_dir
+        self.count = meta["count"]
+        self.resolution = meta["resolution"]
+        # Code tables of the fingerprint columns (older stores lack ja3s/ja4)
+        self.fingerprint_tables = {name: meta.get(name, [None]) for name in FINGERPRINT_COLUMNS}
+        self.ja3_table = self.fingerprint_tables["ja3"]
+        self.columns = {}
+
+        for name, dtype in meta["columns"].items():
+            if self.count == 0:
+                self.columns[name] = np.empty(0, dtype=dtype)
+            else:
+                self.columns[name] = np.memmap(
+                    os.path.join(store_dir, f"{name}.bin"),
+                    dtype=dtype, mode="r", shape=(self.count,)
+                )
+
+        # Older stores: read-only zero columns that take no memory
+        for name in OPTIONAL_COLUMNS:
+            if name not in self.columns:
+                zero = np.zeros(1, dtype=FIXED_DTYPES[name])
+                self.columns[name] = np.broadcast_to(zero, (self.count,))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def is_ipv6(self, name):
+        return self.columns[name].dtype == np.dtype(IPV6_DTYPE)
+
+    def ip_to_str(self, name, value):
+        """Formats one raw value of an IP column."""
+        if self.is_ipv6(name):
+            return packed_to_ip(bytes(value))
+        return socket.inet_ntoa(int(value).to_bytes(4, "big"))
+
+    def unique_ips(self, name):
+        """Distinct addresses of an IP column, as strings."""
+        return [self.ip_to_str(name, v) for v in np.unique(self.columns[name])]
+
+    def timestamps(self):
+        """Timestamp column in seconds (ints for 1-second resolution)."""
+        ts = self.columns["timestamp"]
+        if self.resolution == 1:
+            return ts
+        return ts / self.resolution
+
+    def ip_strings(self, name):
+        """Decodes a whole IP column, formatting each distinct address once."""
+        uniq, inverse = np.unique(self.columns[name], return_inverse=True)
+        labels = [self.ip_to_str(name, v) for v in uniq]
+        return [labels[i] for i in inverse]
+
+    def readable_times(self, start=0, stop=None):
+        """HH:MM:SS labels for a row range, formatting each distinct second once."""
+        seconds = self.columns["timestamp"][start:stop] // self.resolution
+        uniq, inverse = np.unique(seconds, return_inverse=True)
+        labels = [datetime.fromtimestamp(s).strftime("%H:%M:%S") for s in uniq.tolist()]
+        return [labels[i] for i in inverse]
+
+    def iter_records(self):
+        """
+        Yields packets as the dicts the legacy pcap_parsed.json held.
+        Rows are decoded chunk by chunk to keep memory bounded.
+        """
+        for start in range(0, self.count, CHUNK_SIZE):
+            stop = min(start + CHUNK_SIZE, self.count)
+            ts = self.timestamps()[start:stop].tolist()
+            src = self.columns["src_ip"][start:stop]
+            dst = self.columns["dst_ip"][start:stop]
+            length = self.columns["length"][start:stop].tolist()
+            ttl = self.columns["ttl"][start:stop].tolist()
+            win = self.columns["tcp_window"][start:stop].tolist()
+            ja3 = self.columns["ja3"][start:stop].tolist()
+            ja3s = self.columns["ja3s"][start:stop].tolist()
+            ja4 = self.columns["ja4"][start:stop].tolist()
+            ja3s_table = self.fingerprint_tables["ja3s"]
+            ja4_table = self.fingerprint_tables["ja4"]
+
+            for i in range(stop - start):
+                yield {
+                    "timestamp": ts[i],
+                    "readable_time": datetime.fromtimestamp(ts[i]).strftime("%H:%M:%S"),
+                    "src_ip": self.ip_to_str("src_ip", src[i]),
+                    "dst_ip": self.ip_to_str("dst_ip", dst[i]),
+                    "length": length[i],
+                    "ttl": ttl[i],
+                    "tcp_window": win[i],
+                    "ja3": self.ja3_table[ja3[i]],
+                    "ja3s": ja3s_table[ja3s[i]],
+                    "ja4": ja4_table[ja4[i]]
+                }
+
+
+def store_digest(store_dir=STORE_DIR):
+    """
+    Cheap identity of a store's contents: meta.json plus each column file's
+    size and mtime. Changes whenever the store is rewritten.
+    """
+    h = hashlib.sha256()
+    with open(os.path.join(store_dir, META_FILE), "rb") as f:
+        h.update(f.read())
+    for name in sorted(os.listdir(store_dir)):
+        if name.endswith(".bin"):
+            st = os.stat(os.path.join(store_dir, name))
+            h.update(f"{name}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def store_exists(store_dir=STORE_DIR):
+    return os.path.exists(os.path.join(store_dir, META_FILE))
+
+
+def open_store(store_dir=STORE_DIR):
+    if not store_exists(store_dir):
+        print(f"[!] Missing packet store: {store_dir}")
+        return None
+    return PacketStore(store_dir)
+
+
+def load_packets(store_dir=STORE_DIR, legacy_json=LEGACY_JSON):
+    """
+    Returns packets as a list of dicts, preferring the columnar store and
+    falling back to a legacy pcap_parsed.json.
+    """
+    if store_exists(store_dir):
+        return list(PacketStore(store_dir).iter_records())
+
+    if os.path.exists(legacy_json):
+        with open(legacy_json, "r") as f:
+            return json.load(f)
+
+    print(f"[!] Missing file: {store_dir}")
+    return None
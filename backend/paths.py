@@ -0,0 +1,36 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+Where the backend reads its inputs and writes its outputs.
+
+The defaults live under backend/, wherever the process was started. SHADOWFP_DATA_DIR,
+SHADOWFP_RESULTS_DIR and SHADOWFP_CACHE_DIR move them; batch.py and
+ingest_jobs.py point them into each case's own directory. The variables
+are read here only; every module takes its paths from these constants.
+"""
+
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DATA_DIR = os.environ.get("SHADOWFP_DATA_DIR", os.path.join(BACKEND_DIR, "data"))
+RESULTS_DIR = os.environ.get("SHADOWFP_RESULTS_DIR", os.path.join(BACKEND_DIR, "results"))
+CACHE_DIR = os.environ.get("SHADOWFP_CACHE_DIR", os.path.join(BACKEND_DIR, "cache"))
+
+
+def case_environment(case_dir):
+    """
+    Environment for a pipeline process whose data, results and cache live
+    under `case_dir`, laid out like the repo root (backend/data, ...).
+    """
+    root = os.path.join(os.path.abspath(case_dir), "backend")
+    return dict(
+        os.environ,
+        SHADOWFP_DATA_DIR=os.path.join(root, "data"),
+        SHADOWFP_RESULTS_DIR=os.path.join(root, "results"),
+        SHADOWFP_CACHE_DIR=os.path.join(root, "cache"),
+    )
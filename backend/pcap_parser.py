@@ -4,15 +4,26 @@
 # HACKATHON: TN Police Hackathon 2025
 # ==============================================================================
 
-import json
 import os
+import sys
+import mmap
+import socket
+import struct
+import hashlib
 import random
+import time
+from collections import OrderedDict
+from itertools import islice
 from datetime import datetime, timedelta
 
-DATA_DIR = "backend/data"
+import numpy as np
+
+from packet_store import CHUNK_SIZE, STORE_DIR, StoreWriter, write_store
+from paths import DATA_DIR
+
 os.makedirs(DATA_DIR, exist_ok=True)
 
-OUTPUT_FILE = os.path.join(DATA_DIR, "pcap_parsed.json")
+OUTPUT_DIR = STORE_DIR
 
 INTERNAL_IPS = [
     "192.168.1.50",
@@ -27,6 +38,59 @@ TOR_EXIT_IPS = [
     "199.249.230.71"
 ]
 
+# Field order of the tuples yielded by iter_packets()
+PACKET_FIELDS = (
+    "timestamp", "src_ip", "dst_ip", "length", "ttl", "tcp_window", "ja3",
+    "proto", "src_port", "dst_port", "ja3s", "ja4"
+)
+
+# --------------------------------------------------
+# CAPTURE FORMAT CONSTANTS
+# --------------------------------------------------
+PCAP_MAGIC_US = 0xA1B2C3D4
+PCAP_MAGIC_NS = 0xA1B23C4D
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER = 0x1A2B3C4D
+
+PCAPNG_IDB = 0x00000001
+PCAPNG_PB = 0x00000002      # obsolete Packet Block
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETH_IPV4 = 0x0800
+ETH_IPV6 = 0x86DD
+ETH_VLAN = (0x8100, 0x88A8, 0x9100)
+
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+# IPv6 extension headers we walk past to reach TCP
+IPV6_EXT_HEADERS = (0, 43, 60)
+
+# JA3 must ignore GREASE values (RFC 8701)
+GREASE = frozenset((b << 8) | b for b in range(0x0A, 0x100, 0x10))
+
+# Upper bound on flows remembered for fingerprint propagation
+MAX_TRACKED_FLOWS = 1 << 20
+
+# Bytes read per poll when following a growing capture
+TAIL_READ_SIZE = 1 << 20
+
+_U16 = struct.Struct("!H")
+_U32 = struct.Struct("!I")
+
+
+# --------------------------------------------------
+# SYNTHETIC DATA (demo / offline environments)
+# --------------------------------------------------
 def generate_synthetic_pcap():
     packets = []
     base_time = datetime.now() - timedelta(minutes=10)
@@ -48,10 +112,928 @@ def generate_synthetic_pcap():
             "ja3": f"JA3_{random.randint(1,5)}"
         })
 
-    with open(OUTPUT_FILE, "w") as f:
-        json.dump(packets, f, indent=4)
+    write_store(
+        ((p["timestamp"], p["src_ip"], p["dst_ip"], p["length"],
+          p["ttl"], p["tcp_window"], p["ja3"]) for p in packets),
+        OUTPUT_DIR,
+        resolution=1
+    )
+
+    print(f"[✓] Generated synthetic PCAP data → {OUTPUT_DIR}")
+
+
+# --------------------------------------------------
+# TLS HELLOS → JA3 / JA4 / JA3S
+# --------------------------------------------------
+# JA4 names a TLS version by two characters
+JA4_VERSIONS = {
+    0x0304: "13", 0x0303: "12", 0x0302: "11", 0x0301: "10", 0x0300: "s3",
+    0x0002: "s2", 0xFEFF: "d1", 0xFEFD: "d2", 0xFEFC: "d3"
+}
+JA4_EMPTY_HASH = "000000000000"
+
+
+def _u16_list(payload, pos, n_bytes):
+    """Big-endian uint16 values of a vector body, GREASE values dropped."""
+    return [
+        v for v in struct.unpack_from(f"!{n_bytes // 2}H", payload, pos)
+        if v not in GREASE
+    ]
+
+
+def parse_client_hello(payload):
+    """
+    Returns the fields JA3 and JA4 are built from for a TLS ClientHello at
+    the start of a TCP payload, or None if the payload is not a (complete
+    enough) ClientHello. GREASE values are already dropped.
+    """
+    # TLS record: handshake(0x16), version, length | handshake: ClientHello(0x01)
+    if len(payload) < 43 or payload[0] != 0x16 or payload[5] != 0x01:
+        return None
+
+    hello = {
+        "extensions": [], "groups": [], "point_formats": [], "versions": [],
+        "alpn": None, "sig_algs": [], "sni": False
+    }
+    try:
+        end = min(len(payload), 5 + _U16.unpack_from(payload, 3)[0])
+        hello["version"] = _U16.unpack_from(payload, 9)[0]
+        pos = 43                                   # skip client_version + random
+
+        pos += 1 + payload[pos]                    # session_id
+        n = _U16.unpack_from(payload, pos)[0]
+        hello["ciphers"] = _u16_list(payload, pos + 2, n)
+        pos += 2 + n
+        pos += 1 + payload[pos]                    # compression methods
+
+        if pos + 2 <= end:
+            ext_end = min(end, pos + 2 + _U16.unpack_from(payload, pos)[0])
+            pos += 2
+            while pos + 4 <= ext_end:
+                ext_type, ext_len = struct.unpack_from("!HH", payload, pos)
+                body = pos + 4
+                if ext_type not in GREASE:
+                    hello["extensions"].append(ext_type)
+                if ext_type == 0:                               # server_name
+                    hello["sni"] = True
+                elif ext_type == 10 and body + 2 <= ext_end:    # supported_groups
+                    hello["groups"] = _u16_list(payload, body + 2, _U16.unpack_from(payload, body)[0])
+                elif ext_type == 11 and body < ext_end:         # ec_point_formats
+                    hello["point_formats"] = list(payload[body + 1: body + 1 + payload[body]])
+                elif ext_type == 13 and body + 2 <= ext_end:    # signature_algorithms
+                    hello["sig_algs"] = _u16_list(payload, body + 2, _U16.unpack_from(payload, body)[0])
+                elif ext_type == 16 and body + 3 <= ext_end:    # ALPN: first protocol
+                    hello["alpn"] = bytes(payload[body + 3: body + 3 + payload[body + 2]])
+                elif ext_type == 43 and body < ext_end:         # supported_versions
+                    hello["versions"] = _u16_list(payload, body + 1, payload[body])
+                pos = body + ext_len
+    except (IndexError, struct.error):
+        return None
+    return hello
+
+
+def ja3_hash(hello):
+    ja3_string = ",".join((
+        str(hello["version"]),
+        "-".join(map(str, hello["ciphers"])),
+        "-".join(map(str, hello["extensions"])),
+        "-".join(map(str, hello["groups"])),
+        "-".join(map(str, hello["point_formats"]))
+    ))
+    return hashlib.md5(ja3_string.encode()).hexdigest()
+
+
+def _ja4_hash(values):
+    if not values:
+        return JA4_EMPTY_HASH
+    return hashlib.sha256(values.encode()).hexdigest()[:12]
+
+
+def ja4_fingerprint(hello):
+    """
+    JA4 (TCP) of a parsed ClientHello: version, SNI, counts and ALPN in
+    the clear, then truncated SHA-256s of the sorted ciphers and of the
+    sorted extensions plus signature algorithms. Sorting makes it stable
+    under the extension-order randomization that changes JA3 per connection.
+    """
+    version = max(hello["versions"], default=hello["version"])
+    alpn = hello["alpn"] or b""
+    if not alpn:
+        alpn_code = "00"
+    elif chr(alpn[0]).isalnum() and chr(alpn[-1]).isalnum():
+        alpn_code = chr(alpn[0]) + chr(alpn[-1])
+    else:
+        alpn_code = alpn.hex()[0] + alpn.hex()[-1]
+
+    prefix = (
+        f"t{JA4_VERSIONS.get(version, '00')}{'d' if hello['sni'] else 'i'}"
+        f"{min(len(hello['ciphers']), 99):02d}{min(len(hello['extensions']), 99):02d}{alpn_code}"
+    )
+    ciphers = ",".join(f"{c:04x}" for c in sorted(hello["ciphers"]))
+    extensions = ",".join(f"{e:04x}" for e in sorted(hello["extensions"]) if e not in (0, 16))
+    if extensions and hello["sig_algs"]:
+        extensions += "_" + ",".join(f"{s:04x}" for s in hello["sig_algs"])
+    return f"{prefix}_{_ja4_hash(ciphers)}_{_ja4_hash(extensions)}"
+
+
+def compute_ja3(payload):
+    """
+    Returns the JA3 hash of a TLS ClientHello at the start of a TCP payload,
+    or None if the payload is not a (complete enough) ClientHello.
+    """
+    hello = parse_client_hello(payload)
+    return ja3_hash(hello) if hello is not None else None
+
+
+def compute_ja3s(payload):
+    """
+    Returns the JA3S hash (version, cipher, extensions) of a TLS
+    ServerHello at the start of a TCP payload, or None.
+    """
+    # TLS record: handshake(0x16), version, length | handshake: ServerHello(0x02)
+    if len(payload) < 44 or payload[0] != 0x16 or payload[5] != 0x02:
+        return None
+
+    try:
+        end = min(len(payload), 5 + _U16.unpack_from(payload, 3)[0])
+        version = _U16.unpack_from(payload, 9)[0]
+        pos = 43                                   # skip server_version + random
+        pos += 1 + payload[pos]                    # session_id
+        cipher = _U16.unpack_from(payload, pos)[0]
+        pos += 3                                   # cipher + compression method
+
+        extensions = []
+        if pos + 2 <= end:
+            ext_end = min(end, pos + 2 + _U16.unpack_from(payload, pos)[0])
+            pos += 2
+            while pos + 4 <= ext_end:
+                ext_type, ext_len = struct.unpack_from("!HH", payload, pos)
+                if ext_type not in GREASE:
+                    extensions.append(ext_type)
+                pos += 4 + ext_len
+    except (IndexError, struct.error):
+        return None
+
+    ja3s_string = f"{version},{cipher},{'-'.join(map(str, extensions))}"
+    return hashlib.md5(ja3s_string.encode()).hexdigest()
+
+
+# --------------------------------------------------
+# FRAME DECODING
+# --------------------------------------------------
+def _network_offset(linktype, frame):
+    """
+    Returns (ethertype, offset of the IP header) for a captured frame,
+    or (None, 0) when the link layer is unsupported.
+    """
+    if linktype == LINKTYPE_ETHERNET:
+        if len(frame) < 14:
+            return None, 0
+        ethertype = _U16.unpack_from(frame, 12)[0]
+        off = 14
+        while ethertype in ETH_VLAN and len(frame) >= off + 4:
+            ethertype = _U16.unpack_from(frame, off + 2)[0]
+            off += 4
+        return ethertype, off
+
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        if not frame:
+            return None, 0
+        return (ETH_IPV4 if frame[0] >> 4 == 4 else ETH_IPV6), 0
+
+    if linktype == LINKTYPE_LINUX_SLL and len(frame) >= 16:
+        return _U16.unpack_from(frame, 14)[0], 16
+
+    if linktype == LINKTYPE_LINUX_SLL2 and len(frame) >= 20:
+        return _U16.unpack_from(frame, 0)[0], 20
+
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP) and len(frame) >= 5:
+        return (ETH_IPV4 if frame[4] >> 4 == 4 else ETH_IPV6), 4
+
+    return None, 0
+
+
+def decode_frame(linktype, frame, flows):
+    """
+    Extracts (src_ip, dst_ip, ttl, tcp_window, ja3, proto, src_port,
+    dst_port, ja3s, ja4) from one captured frame.
+
+    `flows` maps a direction-independent TCP 5-tuple to the [ja3, ja3s,
+    ja4] of that connection's ClientHello and ServerHello, so every packet
+    of a TLS session carries its fingerprints rather than only the
+    handshake packets. Returns None for non-IP traffic.
+    """
+    ethertype, off = _network_offset(linktype, frame)
+
+    if ethertype == ETH_IPV4:
+        if len(frame) < off + 20:
+            return None
+        ihl = (frame[off] & 0x0F) * 4
+        ttl = frame[off + 8]
+        proto = frame[off + 9]
+        src = socket.inet_ntop(socket.AF_INET, frame[off + 12: off + 16])
+        dst = socket.inet_ntop(socket.AF_INET, frame[off + 16: off + 20])
+        l4 = off + ihl
+        # Later fragments carry no TCP header
+        if _U16.unpack_from(frame, off + 6)[0] & 0x1FFF:
+            proto = None
+    elif ethertype == ETH_IPV6:
+        if len(frame) < off + 40:
+            return None
+        proto = frame[off + 6]
+        ttl = frame[off + 7]
+        src = socket.inet_ntop(socket.AF_INET6, frame[off + 8: off + 24])
+        dst = socket.inet_ntop(socket.AF_INET6, frame[off + 24: off + 40])
+        l4 = off + 40
+        while proto in IPV6_EXT_HEADERS and len(frame) >= l4 + 8:
+            proto, l4 = frame[l4], l4 + (frame[l4 + 1] + 1) * 8
+    else:
+        return None
+
+    if proto == IPPROTO_UDP and len(frame) >= l4 + 8:
+        sport, dport = struct.unpack_from("!HH", frame, l4)
+        return src, dst, ttl, None, None, proto, sport, dport, None, None
+    if proto != IPPROTO_TCP or len(frame) < l4 + 20:
+        return src, dst, ttl, None, None, proto, 0, 0, None, None
+
+    sport, dport = struct.unpack_from("!HH", frame, l4)
+    tcp_window = _U16.unpack_from(frame, l4 + 14)[0]
+    payload_off = l4 + (frame[l4 + 12] >> 4) * 4
+
+    if (src, sport) < (dst, dport):
+        flow_key = (src, sport, dst, dport)
+    else:
+        flow_key = (dst, dport, src, sport)
+
+    session = flows.get(flow_key)
+    if len(frame) > payload_off:
+        if session is None:
+            hello = parse_client_hello(frame[payload_off:])
+            if hello is not None:
+                session = flows[flow_key] = [ja3_hash(hello), None, ja4_fingerprint(hello)]
+                if len(flows) > MAX_TRACKED_FLOWS:
+                    flows.popitem(last=False)
+        elif session[1] is None:
+            # Packets before the ServerHello carry no JA3S
+            session[1] = compute_ja3s(frame[payload_off:])
+
+    if session is None:
+        return src, dst, ttl, tcp_window, None, proto, sport, dport, None, None
+    ja3, ja3s, ja4 = session
+    return src, dst, ttl, tcp_window, ja3, proto, sport, dport, ja3s, ja4
+
+
+# --------------------------------------------------
+# CONTAINER READERS
+# --------------------------------------------------
+def _pcap_header(head):
+    """Returns (byte order, timestamp divisor, linktype) of a libpcap file."""
+    endian = "<"
+    magic = struct.unpack_from("<I", head, 0)[0]
+    if magic not in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+        endian = ">"
+        magic = struct.unpack_from(">I", head, 0)[0]
+    ts_div = 1e9 if magic == PCAP_MAGIC_NS else 1e6
+    linktype = struct.unpack_from(endian + "I", head, 20)[0] & 0x0FFFFFFF
+    return endian, ts_div, linktype
+
+
+def _iter_pcap_frames(buf):
+    """Yields (timestamp, orig_len, linktype, frame) from a libpcap file."""
+    endian, ts_div, linktype = _pcap_header(buf)
+    record = struct.Struct(endian + "IIII")
+
+    pos, size = 24, len(buf)
+    while pos + 16 <= size:
+        ts_sec, ts_frac, incl_len, orig_len = record.unpack_from(buf, pos)
+        pos += 16
+        if pos + incl_len > size:
+            break                       # truncated capture
+        yield ts_sec + ts_frac / ts_div, orig_len, linktype, buf[pos: pos + incl_len]
+        pos += incl_len
+
+
+def _if_tsresol(options, endian):
+    """Reads the if_tsresol option of an Interface Description Block."""
+    pos = 0
+    while pos + 4 <= len(options):
+        code, length = struct.unpack_from(endian + "HH", options, pos)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            value = options[pos + 4]
+            return 2 ** (value & 0x7F) if value & 0x80 else 10 ** value
+        pos += 4 + ((length + 3) & ~3)
+    return 10 ** 6
+
+
+def _interface(interfaces, if_id, warned):
+    """
+    Returns (linktype, tsresol) of a pcapng interface, or None (with a
+    warning, once per id) when no IDB of the section declared it.
+    """
+    if if_id < len(interfaces):
+        return interfaces[if_id]
+    if if_id not in warned:
+        warned.add(if_id)
+        print(f"[!] Skipping packets on undeclared pcapng interface {if_id}")
+    return None
+
+
+def _iter_pcapng_records(buf):
+    """
+    Yields (timestamp, orig_len, linktype, data offset, captured length)
+    for the packet blocks of a pcapng file; timestamp is None for Simple
+    Packet Blocks.
+    """
+    endian = "<"
+    interfaces = []
+    warned = set()
+    pos, size = 0, len(buf)
+
+    while pos + 12 <= size:
+        block_type = struct.unpack_from(endian + "I", buf, pos)[0]
+
+        if block_type == PCAPNG_SHB:
+            # Each section may switch byte order and restarts interface ids
+            bom = struct.unpack_from("<I", buf, pos + 8)[0]
+            endian = "<" if bom == PCAPNG_BYTE_ORDER else ">"
+            interfaces = []
+
+        block_len = struct.unpack_from(endian + "I", buf, pos + 4)[0]
+        if block_len < 12 or pos + block_len > size:
+            break
+        body = pos + 8
+
+        if block_type in (PCAPNG_EPB, PCAPNG_PB):
+            if block_type == PCAPNG_EPB:
+                if_id, ts_hi, ts_lo, cap_len, orig_len = struct.unpack_from(
+                    endian + "IIIII", buf, body
+                )
+            else:
+                if_id, _, ts_hi, ts_lo, cap_len, orig_len = struct.unpack_from(
+                    endian + "HHIIII", buf, body
+                )
+            interface = _interface(interfaces, if_id, warned)
+            if interface is not None:
+                linktype, resol = interface
+                data = body + 20
+                yield ((ts_hi << 32) | ts_lo) / resol, orig_len, linktype, data, min(cap_len, size - data)
+
+        elif block_type == PCAPNG_SPB and interfaces:
+            # Simple Packet Blocks carry no timestamp
+            orig_len = struct.unpack_from(endian + "I", buf, body)[0]
+            linktype, _ = interfaces[0]
+            yield None, orig_len, linktype, body + 4, min(orig_len, block_len - 16)
+
+        elif block_type == PCAPNG_IDB:
+            linktype = struct.unpack_from(endian + "H", buf, body)[0]
+            options = buf[body + 8: pos + block_len - 4]
+            interfaces.append((linktype, _if_tsresol(options, endian)))
+
+        pos += block_len
+
+
+def _iter_pcapng_frames(buf):
+    """Yields (timestamp, orig_len, linktype, frame) from a pcapng file."""
+    for ts, orig_len, linktype, data, cap_len in _iter_pcapng_records(buf):
+        yield ts, orig_len, linktype, buf[data: data + cap_len]
+
+
+def _decode_frames(frames):
+    """Decodes (timestamp, orig_len, linktype, frame) into PACKET_FIELDS tuples."""
+    flows = OrderedDict()
+    last_ts = 0.0
+    for ts, orig_len, linktype, frame in frames:
+        decoded = decode_frame(linktype, frame, flows)
+        if decoded is None:
+            continue
+        if ts is None:
+            ts = last_ts
+        last_ts = ts
+        src, dst, ttl, tcp_window, ja3, proto, sport, dport, ja3s, ja4 = decoded
+        yield ts, src, dst, orig_len, ttl, tcp_window, ja3, proto, sport, dport, ja3s, ja4
+
+
+def iter_packets(path):
+    """
+    Streams packets out of a libpcap or pcapng capture.
+
+    The file is memory-mapped and decoded one frame at a time, so memory
+    stays flat regardless of capture size. Yields tuples in PACKET_FIELDS
+    order; non-IP frames are skipped.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < 24:
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic = struct.unpack_from("<I", mm, 0)[0]
+    if magic == PCAPNG_SHB:
+        reader = _iter_pcapng_frames
+    elif magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS) or \
+            struct.unpack_from(">I", mm, 0)[0] in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+        reader = _iter_pcap_frames
+    else:
+        mm.close()
+        raise ValueError(f"{path} is not a pcap/pcapng capture")
+
+    buf = memoryview(mm)
+    frames = reader(buf)
+    packets = _decode_frames(frames)
+    try:
+        yield from packets
+    finally:
+        # Every frame view must be gone before the mapping can close
+        packets.close()
+        frames.close()
+        buf.release()
+        mm.close()
+
+
+# --------------------------------------------------
+# VECTORIZED DECODING (parse_capture)
+# --------------------------------------------------
+# Header fields sit at fixed offsets from each frame's link/IP/TCP header,
+# so whole chunks are decoded with numpy gathers over the mapped file.
+# Only TLS handshake packets, which change a flow's fingerprints, are
+# handled one at a time, by the same code decode_frame() uses.
+_KEY_WIDTH = 1 + 2 * 18         # family + both (address, port) endpoints
+
+
+def _pcap_record_chunks(buf, a):
+    """Yields (timestamp, orig_len, linktype, data offset, cap_len) arrays."""
+    endian, ts_div, linktype = _pcap_header(buf)
+    incl_len = struct.Struct(endian + "I").unpack_from
+    pos, size = 24, len(buf)
+    truncated = False
+
+    # Record offsets chain through each length, so this walk stays sequential
+    while not truncated:
+        offsets = []
+        append = offsets.append
+        for _ in range(CHUNK_SIZE):
+            if pos + 16 > size:
+                break
+            end = pos + 16 + incl_len(buf, pos + 8)[0]
+            if end > size:
+                truncated = True        # truncated capture
+                break
+            append(pos)
+            pos = end
+        if not offsets:
+            return
+
+        offsets = np.array(offsets, dtype=np.int64)
+        header = a[offsets[:, None] + np.arange(16)].view(endian + "u4")
+        yield (
+            header[:, 0] + header[:, 1] / ts_div,
+            header[:, 3].astype(np.int64),
+            np.full(len(offsets), linktype, dtype=np.int64),
+            offsets + 16,
+            header[:, 2].astype(np.int64),
+        )
+
+
+def _pcapng_record_chunks(buf, a):
+    """_pcap_record_chunks() for pcapng; Simple Packet Blocks get a NaN timestamp."""
+    records = _iter_pcapng_records(buf)
+    while True:
+        chunk = [
+            (np.nan if ts is None else ts, orig_len, linktype, data, cap_len)
+            for ts, orig_len, linktype, data, cap_len in islice(records, CHUNK_SIZE)
+        ]
+        if not chunk:
+            return
+        ts, orig_len, linktype, data, cap_len = zip(*chunk)
+        yield (
+            np.array(ts, dtype=np.float64),
+            *(np.array(column, dtype=np.int64) for column in (orig_len, linktype, data, cap_len))
+        )
+
+
+class _ChunkDecoder:
+    """
+    Decodes record chunks into StoreWriter.write_columns() chunks, giving
+    the same rows as _decode_frames(): `flows` and the timestamp of the
+    last kept packet carry over from one chunk to the next.
+    """
+
+    def __init__(self, buf, a):
+        self.buf = buf
+        self.a = a
+        self.last = len(a) - 1
+        self.flows = OrderedDict()
+        self.last_ts = 0.0
+
+    def _byte(self, pos):
+        # Reads past a frame's end are masked out by the length checks
+        return self.a[np.minimum(pos, self.last)].astype(np.int64)
+
+    def _u16(self, pos):
+        return (self._byte(pos) << 8) | self._byte(pos + 1)
+
+    def _u32(self, pos):
+        return ((self._u16(pos) << 16) | self._u16(pos + 2)).astype(np.uint32)
+
+    def _bytes(self, pos, n):
+        return self.a[np.minimum(pos[:, None] + np.arange(n), self.last)]
+
+    def _network(self, linktype, start, cap_len):
+        """Vectorized _network_offset(): (ethertype or -1, IP header offset)."""
+        n = len(start)
+        ethertype = np.full(n, -1, dtype=np.int64)
+        off = np.zeros(n, dtype=np.int64)
+
+        def link(mask, value, offset):
+            ethertype[mask] = value[mask]
+            off[mask] = offset
+
+        def version(rel):
+            return np.where(self._byte(start + rel) >> 4 == 4, ETH_IPV4, ETH_IPV6)
+
+        ether = (linktype == LINKTYPE_ETHERNET) & (cap_len >= 14)
+        link(ether, self._u16(start + 12), 14)
+        while True:
+            vlan = ether & np.isin(ethertype, ETH_VLAN) & (cap_len >= off + 4)
+            if not vlan.any():
+                break
+            ethertype[vlan] = self._u16(start + off + 2)[vlan]
+            off[vlan] += 4
+
+        raw = np.isin(linktype, (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6)) & (cap_len >= 1)
+        link(raw, version(0), 0)
+        link((linktype == LINKTYPE_LINUX_SLL) & (cap_len >= 16), self._u16(start + 14), 16)
+        link((linktype == LINKTYPE_LINUX_SLL2) & (cap_len >= 20), self._u16(start), 20)
+        null = np.isin(linktype, (LINKTYPE_NULL, LINKTYPE_LOOP)) & (cap_len >= 5)
+        link(null, version(4), 4)
+        return ethertype, off
+
+    def _addresses(self, ip, v6):
+        """uint32 addresses, or S16 for every row once the chunk has IPv6."""
+        if not v6.any():
+            return self._u32(ip)
+        out = np.zeros((len(ip), 16), dtype=np.uint8)
+        out[:, 10:12] = 0xFF
+        out[:, 12:] = self._bytes(ip, 4)
+        out[v6] = self._bytes(ip[v6], 16)
+        return out.view("S16").ravel()
+
+    def _flow_keys(self, src, dst, sport, dport, v6):
+        """Direction-independent S37 TCP flow keys (flow identity only)."""
+        def endpoint(ip, port):
+            out = np.empty((len(ip), 18), dtype=np.uint8)
+            out[:, :16] = self._bytes(ip, 16)
+            out[~v6, :12] = 0
+            out[~v6, 12:16] = self._bytes(ip[~v6], 4)
+            out[:, 16] = port >> 8
+            out[:, 17] = port & 0xFF
+            return out.view("S18").ravel()
+
+        a, b = endpoint(src, sport), endpoint(dst, dport)
+        swap = b < a
+        keys = np.empty((len(a), _KEY_WIDTH), dtype=np.uint8)
+        keys[:, 0] = np.where(v6, 6, 4)
+        keys[:, 1:19] = np.where(swap, b, a).view(np.uint8).reshape(-1, 18)
+        keys[:, 19:] = np.where(swap, a, b).view(np.uint8).reshape(-1, 18)
+        return keys.view(f"S{_KEY_WIDTH}").ravel()
+
+    def _sessions(self, tcp, keys, start, payload_off, cap_len):
+        """
+        Per-row index into a list of (ja3, ja3s, ja4) states (0 = none).
+
+        Handshake rows run decode_frame()'s session logic in order; each
+        leaves a marker (flow, row, state), as does every flow it evicts.
+        Every other TCP row takes the state of its flow's latest marker.
+        """
+        n = len(tcp)
+        state = np.zeros(n, dtype=np.int64)
+        states = [(None, None, None)]
+        rows = np.flatnonzero(tcp)
+
+        candidate = (
+            (cap_len[rows] - payload_off[rows] >= 43)
+            & (self._byte(start[rows] + payload_off[rows]) == 0x16)
+            & np.isin(self._byte(start[rows] + payload_off[rows] + 5), (1, 2))
+        )
+        if not self.flows and not candidate.any():
+            return state, states
+
+        unique, flow = np.unique(keys, return_inverse=True)
+        unique = unique.tolist()
+        index = {key: i for i, key in enumerate(unique)}
+        state_ids = {states[0]: 0}
+
+        def intern(session):
+            key = tuple(session) if session is not None else states[0]
+            if key not in state_ids:
+                state_ids[key] = len(states)
+                states.append(key)
+            return state_ids[key]
+
+        # Initial marker of each flow: its state when the chunk starts
+        marker_flow = list(range(len(unique)))
+        marker_row = [-1] * len(unique)
+        marker_state = [intern(self.flows.get(key)) for key in unique]
+
+        flows = self.flows
+        for i in np.flatnonzero(candidate).tolist():
+            row = int(rows[i])
+            key = unique[flow[i]]
+            data = int(start[row])
+            payload = self.buf[data + int(payload_off[row]): data + int(cap_len[row])]
+
+            session = flows.get(key)
+            if session is None:
+                hello = parse_client_hello(payload)
+                if hello is not None:
+                    session = flows[key] = [ja3_hash(hello), None, ja4_fingerprint(hello)]
+                    if len(flows) > MAX_TRACKED_FLOWS:
+                        evicted, _ = flows.popitem(last=False)
+                        if evicted in index:
+                            marker_flow.append(index[evicted])
+                            marker_row.append(row)
+                            marker_state.append(0)
+            elif session[1] is None:
+                # Packets before the ServerHello carry no JA3S
+                session[1] = compute_ja3s(payload)
+            del payload
+
+            marker_flow.append(int(flow[i]))
+            marker_row.append(row)
+            marker_state.append(intern(session))
+
+        marker_key = np.array(marker_flow, dtype=np.int64) * (n + 1) + np.array(marker_row) + 1
+        order = np.argsort(marker_key, kind="stable")
+        marker_key = marker_key[order]
+        marker_state = np.array(marker_state, dtype=np.int64)[order]
+
+        row_key = flow * (n + 1) + rows + 1
+        state[rows] = marker_state[np.searchsorted(marker_key, row_key, side="right") - 1]
+        return state, states
+
+    def decode(self, ts, orig_len, linktype, start, cap_len):
+        ethertype, off = self._network(linktype, start, cap_len)
+        v4 = (ethertype == ETH_IPV4) & (cap_len >= off + 20)
+        v6 = (ethertype == ETH_IPV6) & (cap_len >= off + 40)
+        keep = v4 | v6
+        if not keep.any():
+            return None
+        ts, orig_len, start, cap_len, off, v4, v6 = (
+            column[keep] for column in (ts, orig_len, start, cap_len, off, v4, v6)
+        )
+        ip = start + off
+
+        # SPB packets take the timestamp of the last kept packet
+        missing = np.isnan(ts)
+        if missing.any():
+            filled = np.maximum.accumulate(np.where(missing, -1, np.arange(len(ts))))
+            ts = np.where(filled >= 0, ts[np.maximum(filled, 0)], self.last_ts)
+        self.last_ts = float(ts[-1])
+
+        ttl = np.where(v4, self._byte(ip + 8), self._byte(ip + 7))
+        proto = np.where(v4, self._byte(ip + 9), self._byte(ip + 6))
+        l4 = np.where(v4, off + (self._byte(ip) & 0x0F) * 4, off + 40)
+        # Later fragments carry no TCP header
+        proto[v4 & (self._u16(ip + 6) & 0x1FFF != 0)] = -1
+        while True:
+            ext = v6 & np.isin(proto, IPV6_EXT_HEADERS) & (cap_len >= l4 + 8)
+            if not ext.any():
+                break
+            proto[ext] = self._byte(start + l4)[ext]
+            l4[ext] += (self._byte(start + l4 + 1)[ext] + 1) * 8
+
+        udp = (proto == IPPROTO_UDP) & (cap_len >= l4 + 8)
+        tcp = (proto == IPPROTO_TCP) & (cap_len >= l4 + 20)
+        ports = udp | tcp
+        transport = start + l4
+        sport = np.where(ports, self._u16(transport), 0)
+        dport = np.where(ports, self._u16(transport + 2), 0)
+        window = np.where(tcp, self._u16(transport + 14), 0)
+        payload_off = l4 + (self._byte(transport + 12) >> 4) * 4
+
+        src = np.where(v4, ip + 12, ip + 8)
+        dst = np.where(v4, ip + 16, ip + 24)
+        keys = self._flow_keys(src[tcp], dst[tcp], sport[tcp], dport[tcp], v6[tcp])
+        state, states = self._sessions(tcp, keys, start, payload_off, cap_len)
+
+        return {
+            "timestamp": ts,
+            "src_ip": self._addresses(src, v6),
+            "dst_ip": self._addresses(dst, v6),
+            "length": orig_len,
+            "ttl": ttl,
+            "tcp_window": window,
+            "proto": np.maximum(proto, 0),
+            "src_port": sport,
+            "dst_port": dport,
+            **{
+                name: (state, [s[i] for s in states])
+                for i, name in enumerate(("ja3", "ja3s", "ja4"))
+            },
+        }
+
+
+def decode_capture(path, writer, progress=None):
+    """
+    Decodes a libpcap or pcapng capture chunk by chunk into a StoreWriter,
+    with the rows iter_packets() would yield. `progress(count)` is called
+    after every chunk.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < 24:
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic = struct.unpack_from("<I", mm, 0)[0]
+    if magic == PCAPNG_SHB:
+        reader = _pcapng_record_chunks
+    elif magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS) or \
+            struct.unpack_from(">I", mm, 0)[0] in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+        reader = _pcap_record_chunks
+    else:
+        mm.close()
+        raise ValueError(f"{path} is not a pcap/pcapng capture")
+
+    buf = memoryview(mm)
+    a = np.frombuffer(mm, dtype=np.uint8)
+    decoder = _ChunkDecoder(buf, a)
+    try:
+        for chunk in reader(buf, a):
+            columns = decoder.decode(*chunk)
+            if columns is not None:
+                writer.write_columns(columns)
+                if progress:
+                    progress(writer.count)
+    finally:
+        # Every view must be gone before the mapping can close
+        del decoder, a
+        try:
+            buf.release()
+            mm.close()
+        except BufferError:
+            # Frames of a propagating exception still hold views; the
+            # mapping is released along with them
+            pass
+
+
+# --------------------------------------------------
+# FOLLOWING A GROWING CAPTURE
+# --------------------------------------------------
+class _TailReader:
+    """
+    Reads a file that another process is still appending to. need(n)
+    blocks until n unread bytes are buffered, polling every `poll_sec`;
+    it returns False once `idle_timeout` seconds pass without growth.
+    """
+
+    def __init__(self, f, poll_sec, idle_timeout, on_idle):
+        self.f = f
+        self.poll_sec = poll_sec
+        self.idle_timeout = idle_timeout
+        self.on_idle = on_idle
+        self.buf = bytearray()
+        self.pos = 0
+
+    def need(self, n):
+        idle_since = None
+        while len(self.buf) - self.pos < n:
+            data = self.f.read(TAIL_READ_SIZE)
+            if data:
+                if self.pos:
+                    del self.buf[:self.pos]
+                    self.pos = 0
+                self.buf += data
+                idle_since = None
+                continue
+
+            now = time.monotonic()
+            if idle_since is None:
+                idle_since = now
+            elif self.idle_timeout is not None and now - idle_since >= self.idle_timeout:
+                return False
+            if self.on_idle:
+                self.on_idle()
+            time.sleep(self.poll_sec)
+        return True
+
+    def peek(self, n):
+        return bytes(self.buf[self.pos: self.pos + n])
+
+    def take(self, n):
+        data = self.peek(n)
+        self.pos += n
+        return data
+
+
+def _tail_pcap_frames(reader):
+    """_iter_pcap_frames() for a file that is still growing."""
+    endian, ts_div, linktype = _pcap_header(reader.take(24))
+    record = struct.Struct(endian + "IIII")
+
+    while reader.need(16):
+        ts_sec, ts_frac, incl_len, orig_len = record.unpack(reader.peek(16))
+        # A record only counts once its whole frame is on disk
+        if not reader.need(16 + incl_len):
+            return
+        reader.take(16)
+        yield ts_sec + ts_frac / ts_div, orig_len, linktype, reader.take(incl_len)
+
+
+def _tail_pcapng_frames(reader):
+    """_iter_pcapng_frames() for a file that is still growing."""
+    endian = "<"
+    interfaces = []
+    warned = set()
+
+    while reader.need(12):
+        head = reader.peek(12)
+        block_type = struct.unpack_from(endian + "I", head, 0)[0]
+        if block_type == PCAPNG_SHB:
+            bom = struct.unpack_from("<I", head, 8)[0]
+            endian = "<" if bom == PCAPNG_BYTE_ORDER else ">"
+            interfaces = []
+
+        block_len = struct.unpack_from(endian + "I", head, 4)[0]
+        if block_len < 12 or not reader.need(block_len):
+            return
+        block = reader.take(block_len)
+
+        if block_type in (PCAPNG_EPB, PCAPNG_PB):
+            if block_type == PCAPNG_EPB:
+                if_id, ts_hi, ts_lo, cap_len, orig_len = struct.unpack_from(
+                    endian + "IIIII", block, 8
+                )
+            else:
+                if_id, _, ts_hi, ts_lo, cap_len, orig_len = struct.unpack_from(
+                    endian + "HHIIII", block, 8
+                )
+            interface = _interface(interfaces, if_id, warned)
+            if interface is not None:
+                linktype, resol = interface
+                yield ((ts_hi << 32) | ts_lo) / resol, orig_len, linktype, block[28: 28 + cap_len]
+
+        elif block_type == PCAPNG_SPB and interfaces:
+            orig_len = struct.unpack_from(endian + "I", block, 8)[0]
+            linktype, _ = interfaces[0]
+            cap_len = min(orig_len, block_len - 16)
+            yield None, orig_len, linktype, block[12: 12 + cap_len]
+
+        elif block_type == PCAPNG_IDB:
+            linktype = struct.unpack_from(endian + "H", block, 8)[0]
+            interfaces.append((linktype, _if_tsresol(block[16: block_len - 4], endian)))
+
+
+def tail_packets(path, poll_sec=0.5, idle_timeout=None, on_idle=None):
+    """
+    Follows a capture that is still being written (tcpdump -w, dumpcap),
+    yielding packets in PACKET_FIELDS order as complete records reach the
+    disk. Stops after `idle_timeout` seconds without new data (None =
+    follow until interrupted); `on_idle()` is called on every empty poll.
+    """
+    with open(path, "rb") as f:
+        reader = _TailReader(f, poll_sec, idle_timeout, on_idle)
+        if not reader.need(4):
+            return
+
+        magic = struct.unpack_from("<I", reader.peek(4), 0)[0]
+        if magic == PCAPNG_SHB:
+            frames = _tail_pcapng_frames(reader)
+        elif magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS) or \
+                struct.unpack_from(">I", reader.peek(4), 0)[0] in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+            if not reader.need(24):
+                return
+            frames = _tail_pcap_frames(reader)
+        else:
+            raise ValueError(f"{path} is not a pcap/pcapng capture")
+
+        yield from _decode_frames(frames)
+
+
+def as_record(packet):
+    """Expands an iter_packets() tuple into the pipeline's packet dict."""
+    record = dict(zip(PACKET_FIELDS, packet))
+    record["readable_time"] = datetime.fromtimestamp(packet[0]).strftime("%H:%M:%S")
+    return record
+
+
+def parse_capture(path, progress=None):
+    """
+    Parses a real capture into the columnar packet store, writing columns
+    as chunks are decoded instead of building the whole list in memory.
+    `progress(count)` is called as chunks of packets are written.
+    """
+    print(f"[+] Parsing capture {path}...")
+
+    with StoreWriter(OUTPUT_DIR) as writer:
+        decode_capture(path, writer, progress)
+    count = writer.count
+
+    print(f"[✓] Parsed {count} packets → {OUTPUT_DIR}")
 
-    print(f"[✓] Generated synthetic PCAP data → {OUTPUT_FILE}")
 
 if __name__ == "__main__":
-    generate_synthetic_pcap()
+    if len(sys.argv) > 1:
+        parse_capture(sys.argv[1])
+    else:
+        generate_synthetic_pcap()
@@ -0,0 +1,664 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+In-process pipeline runner.
+
+Runs pcap_parser → tor_collect → synthetic_exits → flow_assembly →
+node_correlation / shape_correlation → entry_identification → guard_predictor →
+fusion_engine → visualize_data as a DAG in one process, passing results
+in memory. Every stage's output is cached under a hash of its parameters,
+the pipeline code and its upstream stages' keys, so only invalidated
+stages re-run:
+
+    python backend/pipeline.py capture.pcap
+    python backend/pipeline.py --set fusion_engine.weights.temporal=0.7
+    python backend/pipeline.py capture.pcap --progress progress.json
+
+Each stage that runs is profiled into backend/results/metrics.json and
+metrics.prom (see profiling.py). backend/batch.py runs it over a directory of cases.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import entry_identification
+import flow_assembly
+import fusion_engine
+import guard_predictor
+import node_correlation
+import pcap_parser
+import shape_correlation
+import tor_collect
+import visualize_data
+from ip_index import ExitIndex
+from packet_store import STORE_DIR, PacketStore, open_store, store_digest, store_exists
+from paths import CACHE_DIR, RESULTS_DIR
+from profiling import count, record_metrics, stage_profile
+from ranking import select_top
+
+# --------------------------------------------------
+# PATHS
+# --------------------------------------------------
+# Which cache key each results file was last written from
+STAMP_FILE = os.path.join(RESULTS_DIR, ".pipeline_keys.json")
+STORE_SOURCE_FILE = os.path.join(STORE_DIR, "source.json")
+
+# Cached outputs kept per stage
+MAX_CACHED_VERSIONS = 8
+
+DEFAULT_PARAMS = {
+    "pcap_parser": {"capture": None},
+    # relay_index: a tor_collect.save_relay_index() directory to use instead
+    "tor_collect": {"offline": False, "relay_index": None},
+    # Exits drawn from the capture when tor_collect has no relays
+    "synthetic_exits": {"seed": 0},
+    # enabled=False correlates individual packets instead of flows
+    "flow_assembly": {
+        "enabled": True,
+        "idle_timeout": flow_assembly.FLOW_IDLE_TIMEOUT,
+        "active_timeout": flow_assembly.FLOW_ACTIVE_TIMEOUT,
+        "series_bin_sec": flow_assembly.SERIES_BIN_SEC,
+    },
+    "node_correlation": {"window_sec": 5},
+    # Needs flow_assembly; adds the shape signal to fusion
+    "shape_correlation": {
+        "enabled": True,
+        "max_lag_sec": shape_correlation.MAX_LAG_SEC,
+        "max_candidates": shape_correlation.MAX_CANDIDATES,
+        "min_score": shape_correlation.MIN_SHAPE_SCORE,
+    },
+    # top_k=None keeps every user; a K bounds what is ranked and written
+    "entry_identification": {"top_k": None},
+    "guard_predictor": {"top_n": 5},
+    "fusion_engine": {"weights": dict(fusion_engine.WEIGHTS), "top_k": None},
+    "visualize_data": {},
+}
+
+
+# --------------------------------------------------
+# HASHING
+# --------------------------------------------------
+def _sha(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def digest_json(obj):
+    return _sha(json.dumps(obj, sort_keys=True, default=str))
+
+
+def code_digest():
+    """Any edit to the backend code invalidates every cached stage."""
+    h = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+# --------------------------------------------------
+# PROGRESS REPORTING
+# --------------------------------------------------
+class ProgressFile:
+    """
+    Mirrors a run's progress into a JSON file (atomically replaced), for
+    whoever launched the pipeline in the background:
+
+        {"state": "running", "packets": ..., "parsed_packets": ...,
+         "stages": {name: {"status", "started", "seconds"}}}
+    """
+
+    def __init__(self, path, capture=None, total_stages=None):
+        self.path = path
+        self.state = {
+            "state": "running",
+            "total_stages": total_stages,
+            "pid": os.getpid(),
+            "started": time.time(),
+            "capture_bytes": os.path.getsize(capture) if capture else None,
+            "packets": None,
+            "parsed_packets": 0,
+            "stages": {},
+            "error": None
+        }
+        self._lock = threading.Lock()
+        self._write()
+
+    def _write(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(tmp, self.path)
+
+    def stage(self, name, status, seconds=None):
+        with self._lock:
+            info = self.state["stages"].setdefault(name, {})
+            info["status"] = status
+            if status == "running":
+                info["started"] = time.time()
+            if seconds is not None:
+                info["seconds"] = round(seconds, 4)
+            if name == "pcap_parser" and status in ("ran", "cached") and store_exists():
+                self.state["packets"] = self.state["parsed_packets"] = len(PacketStore())
+            self._write()
+
+    def parsed(self, count):
+        with self._lock:
+            self.state["parsed_packets"] = count
+            self._write()
+
+    def finish(self, state, error=None):
+        with self._lock:
+            self.state["state"] = state
+            self.state["error"] = error
+            self.state["finished"] = time.time()
+            self._write()
+
+
+# Live packet count while a capture is being parsed; set by run_pipeline()
+_parse_progress = None
+
+
+# --------------------------------------------------
+# STAGES
+# --------------------------------------------------
+class Stage:
+    """
+    One pipeline step. `run(inputs, params)` gets the outputs of `deps` by
+    name; `save(output)` writes the stage's files under backend/results.
+    Volatile stages (external sources) always run, and their key is taken
+    from their params and `digest(output)`. If `source(params)`
+    gives that same digest for the source it would read, without reading
+    it, the stage is cached on it and only runs when it returns None.
+    """
+
+    def __init__(self, name, deps, run, save=None, volatile=False, digest=None, source=None):
+        self.name = name
+        self.deps = deps
+        self.run = run
+        self.save = save
+        self.volatile = volatile
+        self.digest = digest
+        self.source = source
+
+
+def _capture_identity(path):
+    st = os.stat(path)
+    return {"capture": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _run_parse(inputs, params):
+    capture = params["capture"]
+    if capture:
+        identity = _capture_identity(capture)
+        source = current = None
+        if store_exists() and os.path.exists(STORE_SOURCE_FILE):
+            with open(STORE_SOURCE_FILE, "r") as f:
+                source = json.load(f)
+            current = dict(identity, store=store_digest())
+
+        # Re-parse unless the store still holds exactly this capture
+        if source is None or source != current:
+            pcap_parser.parse_capture(capture, progress=_parse_progress)
+            with open(STORE_SOURCE_FILE, "w") as f:
+                json.dump(dict(identity, store=store_digest()), f)
+        else:
+            print(f"[✓] Packet store already holds {capture}")
+    elif not store_exists():
+        pcap_parser.generate_synthetic_pcap()
+    count(records_out=len(open_store(STORE_DIR)))
+    return STORE_DIR
+
+
+def _run_relays(inputs, params):
+    """
+    {"relays", "relays_published", "exit_index", "guard_table"}; the two
+    indexes are the memory-mapped ones of a shared relay index, else None.
+    """
+    if params["relay_index"]:
+        relays, exit_index, guard_table = tor_collect.load_relay_index(params["relay_index"])
+        print(f"[✓] Using shared relay index ({len(exit_index):,} exit addresses, "
+              f"{len(guard_table):,} guard ORPorts)")
+        return {"relays": relays, "relays_published": None,
+                "exit_index": exit_index, "guard_table": guard_table}
+    snapshot = tor_collect.get_relay_snapshot(offline=params["offline"], synthetic_fallback=False)
+    return dict(snapshot, exit_index=None, guard_table=None)
+
+
+def _relays_source(params):
+    """The cached snapshot tor_collect would serve without a refresh (a shared index always loads)."""
+    if params["relay_index"]:
+        return None
+    return tor_collect.snapshot_identity(params["offline"])
+
+
+def _relays_digest(collected):
+    """The snapshot's _relays_source() identity when it has one, so a served cache keeps its key."""
+    if collected["relays_published"]:
+        return tor_collect.snapshot_stamp(collected["relays_published"])
+    return digest_json(collected["relays"])
+
+
+def _exit_index(inputs):
+    """The shared index when tor_collect loaded one, else built from _relays()."""
+    exit_index = inputs["tor_collect"]["exit_index"]
+    return exit_index if exit_index is not None else ExitIndex.from_relays(_relays(inputs))
+
+
+def _guard_table(collected):
+    """Like _exit_index(), for the cached GuardTable of tor_collect's relays (None without)."""
+    if collected["guard_table"] is not None:
+        return collected["guard_table"]
+    if collected["relays"] is None:
+        return None
+    return tor_collect.load_guard_table(collected["relays"], collected["relays_published"])
+
+
+def _save_relays(relays):
+    if relays is not None:
+        tor_collect.save_relays(relays)
+
+
+def _save_collected_relays(collected):
+    if collected["relays"] is not None:
+        tor_collect.save_relays(collected["relays"], collected["relays_published"])
+
+
+def _run_synthetic_exits(inputs, params):
+    """Seeded exits aligned with the capture, only when tor_collect found no relays."""
+    if inputs["tor_collect"]["relays"] is not None:
+        return None
+    store = open_store(inputs["pcap_parser"])
+    return tor_collect.generate_synthetic_tor_exits(
+        store.unique_ips("dst_ip") if store is not None else [], seed=params["seed"]
+    )
+
+
+def _relays(inputs):
+    """The relays correlation runs against: tor_collect's, else the synthetic exits."""
+    relays = inputs["tor_collect"]["relays"]
+    return relays if relays is not None else inputs["synthetic_exits"]
+
+
+def _run_flows(inputs, params):
+    if not params["enabled"]:
+        return None
+    return flow_assembly.assemble_flows(
+        open_store(inputs["pcap_parser"]), params["idle_timeout"], params["active_timeout"],
+        series_bin_sec=params["series_bin_sec"]
+    )
+
+
+def _run_correlation(inputs, params):
+    relays = _relays(inputs)
+    flows = inputs["flow_assembly"]
+    packets = flows if flows is not None else open_store(inputs["pcap_parser"])
+    return node_correlation.correlate_data(
+        packets, relays, window_sec=params["window_sec"], exit_index=_exit_index(inputs)
+    )
+
+
+def _run_shapes(inputs, params):
+    flows = inputs["flow_assembly"]
+    if not params["enabled"] or flows is None:
+        return None
+    relays = _relays(inputs)
+    return shape_correlation.correlate_shapes(
+        flows, relays, params["max_lag_sec"], params["max_candidates"], params["min_score"],
+        exit_index=_exit_index(inputs)
+    )
+
+
+def _save_shapes(matches):
+    # node_correlation's save already removed any earlier matches
+    if matches is not None:
+        shape_correlation.save_shape_matches(matches)
+
+
+def _run_entry(inputs, params):
+    """
+    (every user's entry row, unranked; the ranked top_k). Guard and fusion
+    read all rows, only the ranked ones are written out.
+    """
+    paths, _ = inputs["node_correlation"]
+    rows = entry_identification.entry_rows(paths) if paths else []
+    return rows, select_top(rows, params["top_k"], key=entry_identification.ENTRY_KEY)
+
+
+def _save_entry(output):
+    entry_identification.save_entry_nodes(output[1])
+
+
+def _run_guard(inputs, params):
+    paths, _ = inputs["node_correlation"]
+    entry_nodes, _ = inputs["entry_identification"]
+    if not paths or not entry_nodes:
+        return []
+    flows = inputs["flow_assembly"]
+    connections = flows if flows is not None else open_store(inputs["pcap_parser"])
+    return guard_predictor.score_guard_nodes(
+        paths, entry_nodes, top_n=params["top_n"],
+        connections=connections, guard_table=_guard_table(inputs["tor_collect"])
+    )
+
+
+def _run_fusion(inputs, params):
+    paths, _ = inputs["node_correlation"]
+    if not paths:
+        print("[!] Correlated traffic missing. Cannot score suspects.")
+        return None
+    entry_nodes, _ = inputs["entry_identification"]
+    shapes = inputs["shape_correlation"]
+    suspects = fusion_engine.score_suspects(
+        paths, entry_nodes, inputs["guard_predictor"], params["weights"], params["top_k"], shapes
+    )
+    total = fusion_engine.count_suspects(paths, shapes)
+    return suspects, fusion_engine.build_forensic_report(suspects, total)
+
+
+def _save_fusion(output):
+    if output is not None:
+        fusion_engine.save_fusion_outputs(*output)
+
+
+def _run_visual(inputs, params):
+    paths, timeline = inputs["node_correlation"]
+    fusion = inputs["fusion_engine"]
+    return visualize_data.assemble_visual_data(
+        paths, timeline,
+        inputs["entry_identification"][1],
+        inputs["guard_predictor"],
+        fusion[0] if fusion else []
+    )
+
+
+STAGES = [
+    Stage("pcap_parser", (), _run_parse, volatile=True, digest=store_digest),
+    Stage("tor_collect", (), _run_relays, save=_save_collected_relays, volatile=True,
+          digest=_relays_digest, source=_relays_source),
+    Stage("synthetic_exits", ("pcap_parser", "tor_collect"), _run_synthetic_exits,
+          save=_save_relays),
+    Stage("flow_assembly", ("pcap_parser",), _run_flows),
+    Stage("node_correlation", ("pcap_parser", "flow_assembly", "tor_collect", "synthetic_exits"),
+          _run_correlation, save=lambda out: node_correlation.save_correlation(*out)),
+    Stage("shape_correlation", ("flow_assembly", "tor_collect", "synthetic_exits",
+                                "node_correlation"), _run_shapes, save=_save_shapes),
+    Stage("entry_identification", ("node_correlation",), _run_entry,
+          save=_save_entry),
+    Stage("guard_predictor", ("pcap_parser", "flow_assembly", "tor_collect", "node_correlation",
+                              "entry_identification"), _run_guard,
+          save=guard_predictor.save_guard_nodes),
+    Stage("fusion_engine", ("node_correlation", "entry_identification", "guard_predictor",
+                            "shape_correlation"), _run_fusion, save=_save_fusion),
+    Stage("visualize_data", ("node_correlation", "entry_identification", "guard_predictor",
+                             "fusion_engine"), _run_visual, save=visualize_data.save_visual_data),
+]
+
+
+def _records(output):
+    """Rows in a stage output for its metrics (the first item of a tuple), if countable."""
+    if isinstance(output, tuple):
+        output = output[0]
+    elif isinstance(output, dict) and "relays" in output:
+        output = output["relays"]
+    if output is None or isinstance(output, (str, dict)):
+        return None
+    return len(output)
+
+
+# --------------------------------------------------
+# RUNNER
+# --------------------------------------------------
+class PipelineRunner:
+    """
+    Executes STAGES with a thread pool: a stage is scheduled as soon as
+    its dependencies have keys, cache hits are resolved without loading
+    anything, and cached outputs are only unpickled when a re-running
+    stage actually needs them.
+    """
+
+    def __init__(self, params=None, force=(), jobs=4, stages=STAGES, progress=None):
+        self.stages = {s.name: s for s in stages}
+        self.order = [s.name for s in stages]
+        self.params = {name: dict(DEFAULT_PARAMS.get(name, {})) for name in self.order}
+        for name, overrides in (params or {}).items():
+            self.params.setdefault(name, {}).update(overrides)
+        self.force = set(force)
+        self.jobs = jobs
+        self.progress = progress
+
+        self.code = code_digest()
+        self.keys = {}
+        self.outputs = {}
+        self.report = {}
+        self._locks = {name: threading.Lock() for name in self.order}
+
+    # ---------- cache ----------
+    def _cache_path(self, name, key):
+        return os.path.join(CACHE_DIR, name, f"{key}.pkl")
+
+    def _store(self, name, key, output):
+        path = self._cache_path(name, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+        versions = sorted(glob.glob(os.path.join(CACHE_DIR, name, "*.pkl")), key=os.path.getmtime)
+        for old in versions[:-MAX_CACHED_VERSIONS]:
+            os.remove(old)
+
+    def output(self, name):
+        """A stage's output, unpickled from the cache on first use."""
+        with self._locks[name]:
+            if name not in self.outputs:
+                with open(self._cache_path(name, self.keys[name]), "rb") as f:
+                    self.outputs[name] = pickle.load(f)
+            return self.outputs[name]
+
+    def _key(self, stage, version=None):
+        """
+        Key from params and dependency keys, plus the source `version` of a
+        volatile stage (its source() if not given); None while unknown.
+        """
+        if stage.volatile:
+            if version is None and stage.source is not None:
+                version = stage.source(self.params[stage.name])
+            if version is None:
+                return None
+        return _sha(
+            stage.name, self.code, digest_json(self.params[stage.name]),
+            *(self.keys[d] for d in stage.deps), *([version] if stage.volatile else [])
+        )
+
+    # ---------- execution ----------
+    def _execute(self, stage, key):
+        inputs = {d: self.output(d) for d in stage.deps}
+
+        with stage_profile(stage.name) as profile:
+            output = stage.run(inputs, self.params[stage.name])
+            count(
+                records_in=_records(inputs[stage.deps[0]]) if stage.deps else None,
+                records_out=_records(output)
+            )
+        elapsed = profile.metrics["wall_seconds"]
+
+        if stage.volatile:
+            # Keyed on what was read, which a refresh may have changed
+            key = self._key(stage, stage.digest(output) if output is not None else "none")
+        if not stage.volatile or (stage.source is not None and stage.source(self.params[stage.name])):
+            self._store(stage.name, key, output)
+
+        self.outputs[stage.name] = output
+        self.report[stage.name] = {"status": "ran", "seconds": round(elapsed, 4)}
+        self._progress(stage.name, "ran", elapsed)
+        return key
+
+    def _progress(self, name, status, seconds=None):
+        if self.progress is not None:
+            self.progress.stage(name, status, seconds)
+
+    def run(self):
+        pending = list(self.order)
+        running = {}
+        cached = {}
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or running:
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name in list(pending):
+                        stage = self.stages[name]
+                        if not all(d in self.keys for d in stage.deps):
+                            continue
+                        pending.remove(name)
+                        progressed = True
+
+                        key = self._key(stage)
+                        if key and name not in self.force and os.path.exists(self._cache_path(name, key)):
+                            self.keys[name] = key
+                            self.report[name] = {"status": "cached", "seconds": 0.0}
+                            self._progress(name, "cached", 0.0)
+                            cached[name] = {
+                                "status": "cached", "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                                "finished": round(time.time(), 3)
+                            }
+                            continue
+                        self._progress(name, "running")
+                        running[pool.submit(self._execute, stage, key)] = name
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.keys[running.pop(future)] = future.result()
+
+        self._save_results()
+        if cached:
+            record_metrics(cached)
+        return self.report
+
+    def _save_results(self):
+        """
+        Writes results files for every stage whose file is not already from its
+        key, and for every stage downstream of a file rewritten here.
+        """
+        stamps = {}
+        if os.path.exists(STAMP_FILE):
+            with open(STAMP_FILE, "r") as f:
+                stamps = json.load(f)
+
+        saved = set()
+        for name in self.order:
+            stage = self.stages[name]
+            forced = self.report[name]["status"] == "ran" and not stage.volatile
+            stale = stage.save is not None and (forced or stamps.get(name) != self.keys[name])
+            if not (stale or saved.intersection(stage.deps)):
+                continue
+            saved.add(name)
+            if stage.save is not None:
+                stage.save(self.output(name))
+                stamps[name] = self.keys[name]
+
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(STAMP_FILE, "w") as f:
+            json.dump(stamps, f, indent=4)
+
+
+def run_pipeline(params=None, force=(), jobs=4, progress_file=None):
+    """
+    Runs the pipeline and prints a per-stage summary. With `progress_file`,
+    stage status and parse progress are also written there as they change.
+    """
+    global _parse_progress
+
+    print("[+] Running ShadowFingerprint pipeline...")
+    start = time.perf_counter()
+
+    progress = None
+    if progress_file:
+        capture = (params or {}).get("pcap_parser", {}).get("capture")
+        progress = ProgressFile(progress_file, capture, len(STAGES))
+        _parse_progress = progress.parsed
+
+    try:
+        report = PipelineRunner(params, force, jobs, progress=progress).run()
+    except Exception as e:
+        if progress:
+            progress.finish("failed", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _parse_progress = None
+    if progress:
+        progress.finish("done")
+
+    for name, info in report.items():
+        mark = "✓" if info["status"] == "cached" else "+"
+        print(f"[{mark}] {name:<22} {info['status']:<7} {info['seconds']:.3f}s")
+    print(f"[✓] Pipeline finished in {time.perf_counter() - start:.3f}s")
+    return report
+
+
+def _parse_overrides(pairs):
+    """["stage.key.sub=value", ...] → nested params dict (values parsed as JSON when possible)."""
+    params = {}
+    for pair in pairs:
+        path, _, raw = pair.partition("=")
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        stage, *keys = path.split(".")
+        target = params.setdefault(stage, {})
+        if keys[:-1]:
+            # Nested dicts start from the stage default so siblings survive
+            default = DEFAULT_PARAMS.get(stage, {})
+            for k in keys[:-1]:
+                default = default.get(k, {}) if isinstance(default, dict) else {}
+                target = target.setdefault(k, dict(default))
+        target[keys[-1]] = value
+    return params
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the ShadowFingerprint pipeline in-process")
+    parser.add_argument("capture", nargs="?", help="pcap/pcapng capture (default: synthetic data)")
+    parser.add_argument("--offline", action="store_true", help="serve Tor relays from the local cache only")
+    parser.add_argument("--relay-index", metavar="DIR",
+                        help="read relays and exit index from a shared relay index directory")
+    parser.add_argument("--set", dest="overrides", action="append", default=[],
+                        metavar="STAGE.PARAM=VALUE", help="override a stage parameter")
+    parser.add_argument("--force", action="append", default=[], metavar="STAGE",
+                        help="re-run a stage even if cached")
+    parser.add_argument("--jobs", type=int, default=4, help="stages run concurrently")
+    parser.add_argument("--progress", metavar="FILE", help="write live progress JSON here")
+    parser.add_argument("--top-k", type=int, metavar="K",
+                        help="rank and write only the K most suspicious entry nodes and suspects")
+    args = parser.parse_args()
+
+    params = _parse_overrides(args.overrides)
+    if args.top_k is not None:
+        for stage in ("entry_identification", "fusion_engine"):
+            params.setdefault(stage, {})["top_k"] = args.top_k
+    params.setdefault("pcap_parser", {})["capture"] = args.capture
+    params.setdefault("tor_collect", {})["offline"] = args.offline
+    if args.relay_index:
+        params["tor_collect"]["relay_index"] = os.path.abspath(args.relay_index)
+
+    run_pipeline(params, force=args.force, jobs=args.jobs, progress_file=args.progress)
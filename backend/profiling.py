@@ -0,0 +1,365 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+Per-stage profiling and metrics export.
+
+Every stage entry point (correlate, identify_entry_nodes, ...) and every
+pipeline.py stage is wrapped in stage_profile(), which records wall time,
+CPU time (including waited-for worker processes), records in/out, peak
+RSS and I/O bytes. The latest figures per stage are kept in
+backend/results/metrics.json and mirrored to metrics.prom in Prometheus
+text format, which the dashboard's "Pipeline Performance" page reads.
+
+    SHADOWFP_PROFILE=cprofile python backend/pipeline.py capture.pcap
+    SHADOWFP_PROFILE=sample   python backend/node_correlation.py
+
+add a cProfile dump (<stage>.prof) or a sampled stack profile in
+collapsed-stack format (<stage>.folded, for flamegraph.pl / speedscope)
+under backend/results/profiles.
+
+Stages sharing a process (pipeline.py runs them in threads) share its
+RSS and I/O counters, so those figures are for the process while the
+stage ran.
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from paths import RESULTS_DIR
+
+# resource / fcntl are POSIX-only; metrics degrade without them
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# --------------------------------------------------
+# PATHS
+# --------------------------------------------------
+# Under each results directory
+METRICS_NAME = "metrics.json"
+PROMETHEUS_NAME = "metrics.prom"
+PROFILE_DIR_NAME = "profiles"
+
+METRICS_FILE = os.path.join(RESULTS_DIR, METRICS_NAME)
+PROMETHEUS_FILE = os.path.join(RESULTS_DIR, PROMETHEUS_NAME)
+
+# --------------------------------------------------
+# SETTINGS
+# --------------------------------------------------
+# "", "cprofile" or "sample"
+PROFILE_MODE = os.environ.get("SHADOWFP_PROFILE", "").lower()
+SAMPLE_INTERVAL_SEC = 0.01
+
+# metric → (Prometheus name, help text)
+PROMETHEUS_METRICS = {
+    "wall_seconds": ("shadowfp_stage_wall_seconds", "Wall-clock time of the stage's last run"),
+    "cpu_seconds": ("shadowfp_stage_cpu_seconds", "User+system CPU time, worker processes included"),
+    "records_in": ("shadowfp_stage_records_in", "Records the stage read"),
+    "records_out": ("shadowfp_stage_records_out", "Records the stage produced"),
+    "peak_rss_bytes": ("shadowfp_stage_peak_rss_bytes", "Peak resident memory while the stage ran"),
+    "io_read_bytes": ("shadowfp_stage_io_read_bytes", "Bytes read through read() calls"),
+    "io_write_bytes": ("shadowfp_stage_io_write_bytes", "Bytes written through write() calls"),
+    "finished": ("shadowfp_stage_finished_timestamp_seconds", "When the stage's last run finished"),
+    "ok": ("shadowfp_stage_ok", "1 if the stage's last run succeeded (or was cached), else 0"),
+}
+
+_lock = threading.Lock()
+# Profiled stages currently running in this process
+_active = 0
+_current = threading.local()
+
+
+# --------------------------------------------------
+# PROCESS COUNTERS
+# --------------------------------------------------
+def _proc_fields(path, fields):
+    """{field: int} from a /proc "Key: value" file; {} where /proc is missing."""
+    values = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    values[key] = int(rest.split()[0])
+    except (OSError, ValueError):
+        pass
+    return values
+
+
+def _reset_peak_rss():
+    """Restarts VmHWM at the current RSS (Linux); elsewhere the peak is lifetime."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_bytes():
+    hwm = _proc_fields("/proc/self/status", ("VmHWM",)).get("VmHWM")
+    if hwm is not None:
+        return hwm * 1024
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _children_peak_rss_bytes():
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _cpu_seconds():
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _io_bytes():
+    """(read, written) bytes of this process; block counts where /proc/self/io is missing."""
+    io = _proc_fields("/proc/self/io", ("rchar", "wchar"))
+    if io:
+        return io.get("rchar", 0), io.get("wchar", 0)
+    if resource is None:
+        return 0, 0
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_inblock * 512, usage.ru_oublock * 512
+
+
+# --------------------------------------------------
+# OPTIONAL PROFILERS
+# --------------------------------------------------
+class StackSampler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a
+    background thread and counts identical stacks ("a;b;c" → samples).
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL_SEC):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def save(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _start_profiler(mode):
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another stage's profiler is active (one per process on 3.12+)
+            return None
+        return profiler
+    if mode == "sample":
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        return sampler
+    return None
+
+
+def _stop_profiler(profiler, stage, results_dir):
+    if profiler is None:
+        return None
+    profile_dir = os.path.join(results_dir, PROFILE_DIR_NAME)
+    os.makedirs(profile_dir, exist_ok=True)
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        path = os.path.join(profile_dir, f"{stage}.prof")
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = os.path.join(profile_dir, f"{stage}.folded")
+        profiler.save(path)
+    return path
+
+
+# --------------------------------------------------
+# STAGE PROFILE
+# --------------------------------------------------
+class StageRecord:
+    """What a running stage reports about itself (see count())."""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.records_in = None
+        self.records_out = None
+        self.metrics = None
+
+
+def count(records_in=None, records_out=None):
+    """Sets the record counts of the stage profiled on this thread, if any."""
+    record = getattr(_current, "record", None)
+    if record is None:
+        return
+    if records_in is not None:
+        record.records_in = int(records_in)
+    if records_out is not None:
+        record.records_out = int(records_out)
+
+
+@contextmanager
+def stage_profile(stage, results_dir=RESULTS_DIR, mode=None, save=True):
+    """
+    Measures the enclosed block as `stage`. The block reports its record
+    counts with count(); on exit the metrics are stored on the yielded
+    record's `metrics` and, unless save=False, merged into the metrics
+    files of `results_dir`.
+    """
+    global _active
+
+    with _lock:
+        # Only a stage running alone gets a fresh peak
+        if _active == 0:
+            _reset_peak_rss()
+        _active += 1
+
+    record = StageRecord(stage)
+    outer, _current.record = getattr(_current, "record", None), record
+    profiler = _start_profiler(mode if mode is not None else PROFILE_MODE)
+
+    status = "ok"
+    read0, write0 = _io_bytes()
+    cpu0 = _cpu_seconds()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        wall = time.perf_counter() - start
+        cpu = _cpu_seconds() - cpu0
+        read1, write1 = _io_bytes()
+        profile_path = _stop_profiler(profiler, stage, results_dir)
+        _current.record = outer
+        with _lock:
+            _active -= 1
+
+        peak = _peak_rss_bytes()
+        record.metrics = {
+            "status": status,
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4),
+            "records_in": record.records_in,
+            "records_out": record.records_out,
+            "peak_rss_bytes": max(peak, _children_peak_rss_bytes()) if peak is not None else None,
+            "io_read_bytes": read1 - read0,
+            "io_write_bytes": write1 - write0,
+            "finished": round(time.time(), 3),
+            "profile": profile_path,
+        }
+        if save:
+            record_metrics({stage: record.metrics}, results_dir)
+
+
+def profiled(stage):
+    """Decorator form of stage_profile() for a stage's entry point."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_profile(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --------------------------------------------------
+# EXPORT
+# --------------------------------------------------
+@contextmanager
+def _file_lock(path):
+    """Serializes metrics writers across processes (no-op without fcntl)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def load_metrics(results_dir=RESULTS_DIR):
+    path = os.path.join(results_dir, METRICS_NAME)
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"stages": {}}
+
+
+def _replace(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def record_metrics(stages, results_dir=RESULTS_DIR):
+    """Merges {stage: metrics} into metrics.json and rewrites metrics.prom."""
+    path = os.path.join(results_dir, METRICS_NAME)
+    with _lock, _file_lock(path):
+        metrics = load_metrics(results_dir)
+        metrics["stages"].update(stages)
+        metrics["updated"] = round(time.time(), 3)
+        _replace(path, json.dumps(metrics, indent=4))
+        _replace(os.path.join(results_dir, PROMETHEUS_NAME), prometheus_text(metrics))
+
+
+def prometheus_text(metrics):
+    """The metrics as Prometheus text exposition format, one gauge per metric."""
+    lines = []
+    stages = metrics.get("stages", {})
+    for key, (name, help_text) in PROMETHEUS_METRICS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for stage, values in sorted(stages.items()):
+            value = values.get(key)
+            if key == "ok":
+                value = int(values.get("status") != "failed")
+            if value is not None:
+                lines.append(f'{name}{{stage="{stage}"}} {value}')
+    return "\n".join(lines) + "\n"
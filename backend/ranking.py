@@ -0,0 +1,79 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+Top-K selection and paged iteration over scored rows.
+
+Every stage ranks its rows highest score first with ties kept in input
+order (a stable descending sort). These helpers give the same order
+without sorting everything: iter_ranked() heapifies once, O(n), and pays
+O(log n) per row actually taken, so reading the first pages of a
+million-user ranking costs little more than building it. iter_pages()
+cuts a ranking into "next page" lists; its first page, select_top(), is
+a bounded heap, O(n log k).
+"""
+
+import heapq
+from itertools import islice
+
+
+def score_key(field):
+    """Sort key reading one numeric field of a row dict."""
+    return lambda row: row[field]
+
+
+def select_top(rows, k=None, key=None):
+    """
+    The `k` rows with the highest key, highest first (ties in input
+    order): the first page of iter_pages(). k=None ranks every row.
+    """
+    if k is None:
+        return sorted(rows, key=key, reverse=True)
+    if k < 1:
+        return []
+    return next(iter_pages(rows, k, key), [])
+
+
+def iter_ranked(rows, key):
+    """
+    Yields rows highest key first, ties in input order, sorting lazily:
+    a consumer that stops early never pays for the rest of the order.
+    """
+    rows = rows if isinstance(rows, list) else list(rows)
+    heap = [(-key(row), i) for i, row in enumerate(rows)]
+    heapq.heapify(heap)
+    while heap:
+        yield rows[heapq.heappop(heap)[1]]
+
+
+def iter_pages(rows, page_size, key=None):
+    """
+    Yields the ranking as consecutive lists of `page_size` rows ("next
+    page"), computed one page at a time. Without `key`, `rows` is taken
+    to be ranked already (e.g. read back from a results file) and is only
+    consumed as far as the pages taken, so it can be a generator.
+    """
+    if page_size < 1:
+        raise ValueError("page_size must be at least 1")
+    if key is None:
+        ranked = iter(rows)
+    else:
+        rows = rows if isinstance(rows, list) else list(rows)
+        # Most readers stop after the first page (a top K): a bounded
+        # heap gives it in O(n log k); the full heap is only built for
+        # a second page
+        first = heapq.nlargest(page_size, rows, key=key)
+        if not first:
+            return
+        yield first
+        ranked = islice(iter_ranked(rows, key), page_size, None)
+    while page := list(islice(ranked, page_size)):
+        yield page
+
+
+def get_page(rows, number, page_size, key=None):
+    """Page `number` (0-based) of iter_pages(), or [] past the end."""
+    return next(islice(iter_pages(rows, page_size, key), number, None), [])
@@ -0,0 +1,244 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+Traffic-shape cross-correlation.
+
+A second correlation engine next to the JA3/TTL temporal match. Every
+exit flow's byte-count time series is cross-correlated with those of the
+entry flows that began up to MAX_LAG_SEC before it; the entry flow whose
+shape best matches (at any lag in the window) names the probable user.
+
+Pairs are scored in batches: the flows of a batch are FFT'd once, each
+pair costs one spectrum product and one inverse FFT, and every lag in the
+window is read off that one result. Candidate entry flows are capped per
+exit flow, so the work grows with the number of flows rather than with
+their product.
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+from scipy import fft
+
+from flow_assembly import assemble_flows
+from ip_index import ExitIndex
+from packet_store import STORE_DIR, open_store
+from paths import DATA_DIR, RESULTS_DIR
+
+# --------------------------------------------------
+# PATHS
+# --------------------------------------------------
+TOR_FILE = os.path.join(DATA_DIR, "tor_nodes.json")
+OUT_FILE = os.path.join(RESULTS_DIR, "shape_matches.json")
+
+# Longest delay between an entry flow starting and its exit flow starting
+MAX_LAG_SEC = 5.0
+# Entry flows tried per exit flow, latest-starting first
+MAX_CANDIDATES = 16
+# Best matches below this normalized correlation are dropped
+MIN_SHAPE_SCORE = 0.5
+# Pairs transformed together (bounds the spectra held in memory)
+PAIR_BATCH = 2048
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        print(f"[!] Missing file: {path}")
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+# --------------------------------------------------
+# SERIES
+# --------------------------------------------------
+def series_stats(flows):
+    """
+    (length in bins, norm of the mean-removed series) per flow. A flow
+    whose series is flat (e.g. a single bin) has norm 0 and no shape.
+    """
+    offsets = flows.series_offsets
+    counts = np.diff(offsets)
+    if len(flows.series_bins) == 0:
+        return counts, np.zeros(len(counts))
+
+    nonempty = counts > 0
+    starts = offsets[:-1][nonempty]
+    values = flows.series_bytes.astype(np.float64)
+
+    length = np.zeros(len(counts), dtype=np.int64)
+    length[nonempty] = flows.series_bins[offsets[1:][nonempty] - 1] + 1
+    total = np.zeros(len(counts))
+    total[nonempty] = np.add.reduceat(values, starts)
+    squares = np.zeros(len(counts))
+    squares[nonempty] = np.add.reduceat(values * values, starts)
+
+    centered = squares - np.divide(total * total, length, out=np.zeros(len(counts)), where=nonempty)
+    return length, np.sqrt(np.maximum(centered, 0.0))
+
+
+def dense_series(flows, idx, size, length):
+    """Mean-removed series of flows `idx`, zero-padded to `size` columns."""
+    lo, hi = flows.series_offsets[idx], flows.series_offsets[idx + 1]
+    counts = hi - lo
+    rows = np.repeat(np.arange(len(idx)), counts)
+    take = np.repeat(lo - np.r_[0, np.cumsum(counts)[:-1]], counts) + np.arange(counts.sum())
+
+    out = np.zeros((len(idx), size))
+    out[rows, flows.series_bins[take]] = flows.series_bytes[take]
+    span = length[idx]
+    mean = out.sum(axis=1) / np.maximum(span, 1)
+    out -= np.where(np.arange(size) < span[:, None], mean[:, None], 0.0)
+    return out
+
+
+# --------------------------------------------------
+# PAIRING & SCORING
+# --------------------------------------------------
+def candidate_pairs(flows, exit_mask, usable, max_lag_sec=MAX_LAG_SEC, max_candidates=MAX_CANDIDATES):
+    """
+    (entry flow, exit flow) index pairs: for every exit flow, the latest
+    `max_candidates` non-exit flows that started at most `max_lag_sec`
+    before it. Flows are in start order, so this is two searchsorted().
+    """
+    start = np.asarray(flows["timestamp"])
+    entries = np.flatnonzero(~exit_mask & usable)
+    exits = np.flatnonzero(exit_mask & usable)
+
+    entry_start = start[entries]
+    hi = np.searchsorted(entry_start, start[exits], side="right")
+    lo = np.searchsorted(entry_start, start[exits] - max_lag_sec * flows.resolution, side="left")
+    lo = np.maximum(lo, hi - max_candidates)
+    counts = hi - lo
+
+    first = np.repeat(lo - np.r_[0, np.cumsum(counts)[:-1]], counts) + np.arange(counts.sum())
+    return entries[first], np.repeat(exits, counts)
+
+
+def score_pairs(flows, entry_idx, exit_idx, max_lag_sec=MAX_LAG_SEC):
+    """
+    Peak normalized cross-correlation of each pair over lags 0 ..
+    max_lag_sec (exit after entry) → (scores in [0, 1], lags in seconds).
+    """
+    n = len(entry_idx)
+    scores, lags = np.zeros(n), np.zeros(n)
+    if n == 0:
+        return scores, lags
+
+    length, norm = series_stats(flows)
+    bin_ticks = flows.series_bin_sec * flows.resolution
+    start = np.asarray(flows["timestamp"], dtype=np.int64)
+    offset = np.rint((start[exit_idx] - start[entry_idx]) / bin_ticks).astype(np.int64)
+    lag_bins = np.arange(int(max_lag_sec / flows.series_bin_sec) + 1)
+
+    # Transform size per pair: no circular wrap between the two series
+    need = length[entry_idx] + length[exit_idx] - 1
+    sizes = 1 << np.ceil(np.log2(np.maximum(need, 1))).astype(np.int64)
+
+    for size in np.unique(sizes).tolist():
+        group = np.flatnonzero(sizes == size)
+        for b in range(0, len(group), PAIR_BATCH):
+            part = group[b: b + PAIR_BATCH]
+            e_flows, e_row = np.unique(entry_idx[part], return_inverse=True)
+            x_flows, x_row = np.unique(exit_idx[part], return_inverse=True)
+            e_spec = fft.rfft(dense_series(flows, e_flows, size, length), axis=1)
+            x_spec = fft.rfft(dense_series(flows, x_flows, size, length), axis=1)
+
+            # corr[d] = sum_i entry[i] * exit[i + d], for every shift d at once
+            corr = fft.irfft(np.conj(e_spec[e_row]) * x_spec[x_row], n=size, axis=1)
+
+            # Absolute lag = start offset + shift; keep shifts where both overlap
+            d = lag_bins[None, :] - offset[part][:, None]
+            valid = (d > -length[entry_idx[part]][:, None]) & (d < length[exit_idx[part]][:, None])
+            values = np.where(valid, np.take_along_axis(corr, d % size, axis=1), -np.inf)
+            best = values.argmax(axis=1)
+            peak = values[np.arange(len(part)), best]
+
+            denom = norm[entry_idx[part]] * norm[exit_idx[part]]
+            scores[part] = np.where(
+                np.isfinite(peak), np.clip(peak / np.where(denom > 0, denom, 1), 0.0, 1.0), 0.0
+            )
+            lags[part] = best * flows.series_bin_sec
+
+    return scores, lags
+
+
+def correlate_shapes(flows, relays, max_lag_sec=MAX_LAG_SEC, max_candidates=MAX_CANDIDATES,
+                     min_score=MIN_SHAPE_SCORE, exit_index=None):
+    """
+    Best traffic-shape match per exit flow, as dicts like a correlated
+    path: src_ip (the entry flow's initiator), exit_node, timestamp and
+    readable_time of the exit flow, shape_score and lag_sec.
+    """
+    if len(flows) == 0:
+        return []
+
+    if exit_index is None:
+        exit_index = ExitIndex.from_relays(relays)
+    exit_mask = exit_index.contains_column(flows["dst_ip"])
+    usable = series_stats(flows)[1] > 0
+    entry_idx, exit_idx = candidate_pairs(flows, exit_mask, usable, max_lag_sec, max_candidates)
+    if len(entry_idx) == 0:
+        print("[!] No flow pairs with a traffic shape to compare")
+        return []
+    scores, lags = score_pairs(flows, entry_idx, exit_idx, max_lag_sec)
+
+    # Best entry flow per exit flow, in exit-flow order
+    order = np.lexsort((-scores, exit_idx))
+    best = order[np.r_[True, np.diff(exit_idx[order]) != 0]]
+    best = best[scores[best] >= min_score]
+
+    seconds = flows.timestamps()
+    matches = []
+    for i in best.tolist():
+        e, x = int(entry_idx[i]), int(exit_idx[i])
+        ts = seconds[x].item()
+        matches.append({
+            "src_ip": flows.ip_to_str("src_ip", flows["src_ip"][e]),
+            "exit_node": flows.ip_to_str("dst_ip", flows["dst_ip"][x]),
+            "timestamp": ts,
+            "readable_time": datetime.fromtimestamp(ts).strftime("%H:%M:%S"),
+            "shape_score": round(float(scores[i]), 4),
+            "lag_sec": round(float(lags[i]), 6)
+        })
+
+    print(f"[✓] Found {len(matches)} traffic-shape matches from {len(entry_idx):,} flow pairs")
+    return matches
+
+
+def save_shape_matches(matches):
+    with open(OUT_FILE, "w") as f:
+        json.dump(matches, f, indent=4)
+
+    print(f"[✓] Saved → {OUT_FILE}")
+
+
+def shape_correlate(max_lag_sec=MAX_LAG_SEC, max_candidates=MAX_CANDIDATES):
+    print("[+] Cross-correlating flow traffic shapes with Tor exit flows...")
+
+    tor = load_json(TOR_FILE)
+    store = open_store(STORE_DIR)
+    if store is None or not tor:
+        print("[!] Required inputs missing")
+        return
+
+    flows = assemble_flows(store)
+    save_shape_matches(correlate_shapes(flows, tor["relays"], max_lag_sec, max_candidates))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Traffic-shape correlation of entry and exit flows")
+    parser.add_argument("--max-lag", type=float, default=MAX_LAG_SEC, metavar="SEC",
+                        help="longest entry-to-exit delay considered")
+    parser.add_argument("--candidates", type=int, default=MAX_CANDIDATES, metavar="N",
+                        help="entry flows tried per exit flow")
+    args = parser.parse_args()
+
+    shape_correlate(args.max_lag, args.candidates)
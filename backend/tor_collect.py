@@ -4,17 +4,52 @@
 # HACKATHON: TN Police Hackathon 2025
 # ==============================================================================
 
-import requests
+import asyncio
 import json
 import os
+import shutil
+import sys
+import time
 import random
 from datetime import datetime
 
-DATA_DIR = "backend/data"
+from ip_index import GUARD_RELAYS_FILE, ExitIndex, GuardTable
+from onionoo_client import fetch_documents
+from packet_store import STORE_DIR, open_store, store_exists
+from paths import DATA_DIR
+
 os.makedirs(DATA_DIR, exist_ok=True)
 
 TOR_FILE = os.path.join(DATA_DIR, "tor_nodes.json")
-PCAP_FILE = os.path.join(DATA_DIR, "pcap_parsed.json")
+PCAP_FILE = os.path.join(DATA_DIR, "pcap_parsed.json")  # legacy fallback
+PCAP_STORE = STORE_DIR
+
+# --------------------------------------------------
+# ONIONOO + LOCAL SNAPSHOT CACHE
+# --------------------------------------------------
+ONIONOO_URL = os.environ.get("ONIONOO_URL", "https://onionoo.torproject.org")
+RELAY_CACHE_DIR = os.path.join(DATA_DIR, "relay_cache")
+
+# Onionoo republishes hourly; younger snapshots are served without asking
+REFRESH_INTERVAL_SEC = 3600
+# Timestamped snapshot versions kept on disk
+MAX_SNAPSHOTS = 48
+
+# Documents fetched alongside details: document → (relay field, history
+# member summarized into it). A failed one leaves the field None.
+ENRICHMENT_DOCUMENTS = {
+    "bandwidth": ("write_bandwidth", "write_history"),
+    "uptime": ("uptime", "uptime"),
+}
+# History period summarized, most preferred first
+HISTORY_PERIODS = ("1_month", "6_months", "1_week", "3_days")
+
+# Guard tables built from relay snapshots, one directory per snapshot
+GUARD_TABLE_DIR = os.path.join(RELAY_CACHE_DIR, "guard_tables")
+MAX_GUARD_TABLES = 8
+# Bumped whenever GuardTable's rows or probabilities change meaning, so
+# tables cached by an older build are rebuilt
+GUARD_TABLE_VERSION = 2
 
 
 def load_pcap_ips():
@@ -22,6 +57,9 @@ def load_pcap_ips():
     Extract destination IPs from parsed PCAP
     Used to align synthetic Tor exits with observed traffic
     """
+    if store_exists(PCAP_STORE):
+        return open_store(PCAP_STORE).unique_ips("dst_ip")
+
     if not os.path.exists(PCAP_FILE):
         return []
 
@@ -35,47 +73,272 @@ def load_pcap_ips():
     return dst_ips
 
 
-def fetch_real_tor_relays():
+def _history_mean(histories):
+    """Mean of an Onionoo history (values × factor) over HISTORY_PERIODS' first present period."""
+    for period in HISTORY_PERIODS:
+        history = (histories or {}).get(period)
+        values = [v for v in (history or {}).get("values", []) if v is not None]
+        if values:
+            return history.get("factor", 1) * sum(values) / len(values)
+    return None
+
+
+def compact_relay(r):
+    """The fields kept of an Onionoo details relay object."""
+    return {
+        "fingerprint": r.get("fingerprint"),
+        "nickname": r.get("nickname"),
+        "flags": r.get("flags", []),
+        "or_addresses": r.get("or_addresses", []),
+        "exit_addresses": r.get("exit_addresses", []),
+        "last_seen": r.get("last_seen"),
+        "advertised_bandwidth": r.get("advertised_bandwidth", 0),
+        "guard_probability": r.get("guard_probability")
+    }
+
+
+def fetch_relay_document(if_modified_since=None):
     """
-    Fetch real Tor relay metadata from Onionoo
+    Conditionally fetch the Onionoo relay details document, with the
+    bandwidth and uptime documents fetched concurrently over one
+    connection pool (onionoo_client). Every relay object is compacted as
+    soon as it is parsed off the wire; the bandwidth and uptime documents
+    add each relay's mean written bytes/s ("write_bandwidth") and uptime
+    fraction ("uptime").
+
+    Returns None when Onionoo answers 304 Not Modified, otherwise a
+    snapshot dict: relays, relays_published and the Last-Modified header
+    to send back on the next refresh.
     """
     print("[+] Fetching real Tor relay metadata from Onionoo…")
-    url = "https://onionoo.torproject.org/details?type=relay"
 
-    response = requests.get(url, timeout=10)
-    response.raise_for_status()
+    relays = []
+    summaries = {name: {} for name in ENRICHMENT_DOCUMENTS}
 
-    data = response.json()
+    def summarize(name, member):
+        def handle(r):
+            summaries[name][r.get("fingerprint")] = _history_mean(r.get(member))
+        return handle
 
-    relays = []
-    for r in data.get("relays", []):
-        relays.append({
-            "fingerprint": r.get("fingerprint"),
-            "nickname": r.get("nickname"),
-            "flags": r.get("flags", []),
-            "or_addresses": r.get("or_addresses", []),
-            "exit_addresses": r.get("exit_addresses", []),
-            "last_seen": r.get("last_seen"),
-            "advertised_bandwidth": r.get("advertised_bandwidth", 0)
-        })
+    handlers = {"details": lambda r: relays.append(compact_relay(r))}
+    for name, (_, member) in ENRICHMENT_DOCUMENTS.items():
+        handlers[name] = summarize(name, member)
+
+    # Only details is conditional: once it has changed, the enrichment
+    # documents are needed in full even if they have not
+    results = asyncio.run(fetch_documents(
+        ONIONOO_URL, handlers, {"type": "relay"}, {"details": if_modified_since}
+    ))
+
+    details = results["details"]
+    if isinstance(details, Exception):
+        raise details
+    if details is None:
+        print("[✓] Onionoo relay list unchanged since last snapshot")
+        return None
+
+    for name, (field, _) in ENRICHMENT_DOCUMENTS.items():
+        if isinstance(results[name], Exception):
+            print(f"[!] Onionoo {name} document unavailable ({results[name]})")
+        # A failed document contributes nothing
+        values = summaries[name] if isinstance(results[name], dict) else {}
+        for relay in relays:
+            value = values.get(relay["fingerprint"])
+            relay[field] = round(value, 4) if value is not None else None
 
     print(f"[✓] Retrieved {len(relays)} real Tor relays")
-    return relays
+    return {
+        "relays_published": details["fields"].get("relays_published"),
+        "last_modified": details["last_modified"],
+        "relays": relays
+    }
+
+
+def fetch_real_tor_relays():
+    """
+    Fetch real Tor relay metadata from Onionoo
+    """
+    return fetch_relay_document()["relays"]
+
+
+# --------------------------------------------------
+# SNAPSHOT CACHE
+# --------------------------------------------------
+def _snapshot_files():
+    """Snapshot files, oldest first (names sort by publication time)."""
+    if not os.path.isdir(RELAY_CACHE_DIR):
+        return []
+    return sorted(
+        f for f in os.listdir(RELAY_CACHE_DIR)
+        if f.startswith("relays_") and f.endswith(".json")
+    )
+
+
+def latest_snapshot_path():
+    files = _snapshot_files()
+    return os.path.join(RELAY_CACHE_DIR, files[-1]) if files else None
+
+
+def load_cached_snapshot():
+    """Newest cached relay snapshot, or None if the cache is empty."""
+    path = latest_snapshot_path()
+    if path is None:
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_snapshot(snapshot):
+    """
+    Stores a snapshot as relays_<relays_published>.json and prunes the
+    oldest versions beyond MAX_SNAPSHOTS.
+    """
+    os.makedirs(RELAY_CACHE_DIR, exist_ok=True)
+
+    published = snapshot.get("relays_published") or datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    path = os.path.join(RELAY_CACHE_DIR, f"relays_{snapshot_stamp(published)}.json")
+
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+    for old in _snapshot_files()[:-MAX_SNAPSHOTS]:
+        os.remove(os.path.join(RELAY_CACHE_DIR, old))
+
+    return path
 
 
-def generate_synthetic_tor_exits():
+def snapshot_stamp(published):
+    """A relays_published time as the digits its snapshot file is named by."""
+    return "".join(c for c in published if c.isdigit())
+
+
+def snapshot_age():
+    """Seconds since the newest snapshot was fetched or last confirmed fresh."""
+    path = latest_snapshot_path()
+    return time.time() - os.path.getmtime(path) if path else None
+
+
+def snapshot_identity(offline=False):
+    """
+    snapshot_stamp() of the cached snapshot get_relay_snapshot() would
+    serve without contacting Onionoo, or None when it would refresh first.
+    """
+    age = snapshot_age()
+    if age is None or not (offline or age < REFRESH_INTERVAL_SEC):
+        return None
+    return os.path.basename(latest_snapshot_path())[len("relays_"):-len(".json")]
+
+
+def get_relay_snapshot(offline=False, synthetic_fallback=True):
+    """
+    Serve relays from the local snapshot cache, refreshing it only when it
+    is older than REFRESH_INTERVAL_SEC and only if Onionoo has published a
+    newer document. Offline (or when Onionoo is unreachable) the newest
+    snapshot is used as-is; synthetic exits are the last resort (or None
+    when `synthetic_fallback` is off). Returns {"relays_published",
+    "relays"}; relays_published is None unless the relays came from
+    Onionoo.
+    """
+    def fallback():
+        relays = generate_synthetic_tor_exits() if synthetic_fallback else None
+        return {"relays_published": None, "relays": relays}
+
+    def served(snapshot):
+        return {"relays_published": snapshot.get("relays_published"), "relays": snapshot["relays"]}
+
+    age = snapshot_age()
+    cached = load_cached_snapshot()
+
+    if cached and (offline or age < REFRESH_INTERVAL_SEC):
+        print(f"[✓] Using cached relay snapshot ({cached.get('relays_published')})")
+        return served(cached)
+
+    if offline:
+        print("[!] Offline mode and no cached relay snapshot")
+        return fallback()
+
+    try:
+        fresh = fetch_relay_document(cached.get("last_modified") if cached else None)
+    except Exception as e:
+        if cached:
+            print(f"[!] Onionoo unavailable ({e}) — using cached snapshot "
+                  f"({cached.get('relays_published')})")
+            return served(cached)
+        return fallback()
+
+    if fresh is None or (
+        cached and fresh["relays_published"] == cached.get("relays_published")
+    ):
+        # Confirmed fresh: restart the refresh interval (file mtime)
+        os.utime(latest_snapshot_path())
+        return served(cached)
+
+    path = save_snapshot(fresh)
+    print(f"[✓] Cached relay snapshot → {path}")
+    return served(fresh)
+
+
+def get_relays(offline=False, synthetic_fallback=True):
+    """The relays of get_relay_snapshot()."""
+    return get_relay_snapshot(offline, synthetic_fallback)["relays"]
+
+
+# --------------------------------------------------
+# GUARD TABLE CACHE
+# --------------------------------------------------
+def load_guard_table(relays, published=None):
+    """
+    GuardTable of `relays`, built once per Onionoo snapshot and cached
+    under GUARD_TABLE_DIR (oldest tables pruned beyond MAX_GUARD_TABLES).
+    The cache key is the snapshot's relays_published plus the relay
+    count; relays without a `published` time (synthetic or hand-made
+    sets) are not cached.
+    """
+    if not published:
+        return GuardTable.from_relays(relays)
+
+    stamp = "".join(c for c in published if c.isdigit())
+    table_dir = os.path.join(GUARD_TABLE_DIR, f"v{GUARD_TABLE_VERSION}_{stamp}_{len(relays)}")
+    if os.path.exists(os.path.join(table_dir, GUARD_RELAYS_FILE)):
+        return GuardTable.load(table_dir)
+
+    table = GuardTable.from_relays(relays)
+    tmp = f"{table_dir}.{os.getpid()}.tmp"
+    table.save(tmp)
+    try:
+        os.replace(tmp, table_dir)
+    except OSError:
+        # Another process cached the same relay set first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    tables = sorted(
+        (os.path.join(GUARD_TABLE_DIR, d) for d in os.listdir(GUARD_TABLE_DIR)
+         if not d.endswith(".tmp")),
+        key=os.path.getmtime
+    )
+    for old in tables[:-MAX_GUARD_TABLES]:
+        shutil.rmtree(old, ignore_errors=True)
+    return table
+
+
+def generate_synthetic_tor_exits(pcap_ips=None, seed=None):
     """
     Generate Tor exits aligned with PCAP destination IPs
-    (for demo / offline environments)
+    (for demo / offline environments). `pcap_ips` defaults to the parsed
+    capture's; the same `seed` and addresses draw the same exits.
     """
     print("[!] Onionoo unavailable — using PCAP-aligned synthetic exits")
 
-    pcap_ips = load_pcap_ips()
+    if pcap_ips is None:
+        pcap_ips = load_pcap_ips()
     if not pcap_ips:
         print("[!] No PCAP IPs available, cannot generate synthetic exits")
         return []
 
-    exits = random.sample(pcap_ips, min(5, len(pcap_ips)))
+    rng = random.Random(seed)
+    exits = rng.sample(sorted(pcap_ips), min(5, len(pcap_ips)))
 
     relays = []
     for i, ip in enumerate(exits):
@@ -86,24 +349,54 @@ def generate_synthetic_tor_exits():
             "or_addresses": [f"{ip}:9001"],
             "exit_addresses": [ip],
             "last_seen": datetime.utcnow().isoformat(),
-            "advertised_bandwidth": random.randint(100_000, 900_000)
+            "advertised_bandwidth": rng.randint(100_000, 900_000)
         })
 
     print(f"[✓] Generated {len(relays)} synthetic Tor exits aligned with PCAP")
     return relays
 
 
-def main():
-    try:
-        relays = fetch_real_tor_relays()
-    except Exception:
-        relays = generate_synthetic_tor_exits()
-
+def save_relays(relays, published=None):
+    data = {"relays": relays}
+    if published:
+        data["relays_published"] = published
     with open(TOR_FILE, "w") as f:
-        json.dump({"relays": relays}, f, indent=4)
+        json.dump(data, f, indent=4)
 
     print(f"[✓] Tor relay data saved → {TOR_FILE}")
 
 
+# --------------------------------------------------
+# SHARED RELAY INDEX (batch mode)
+# --------------------------------------------------
+RELAY_INDEX_RELAYS = "relays.json"
+
+
+def save_relay_index(relays, index_dir):
+    """
+    Writes a relay set, its exit index and its guard table to
+    `index_dir`, for many pipeline processes to load read-only (see
+    batch.py).
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, RELAY_INDEX_RELAYS), "w") as f:
+        json.dump({"relays": relays}, f)
+    ExitIndex.from_relays(relays).save(index_dir)
+    GuardTable.from_relays(relays).save(index_dir)
+    print(f"[✓] Relay index saved → {index_dir}")
+
+
+def load_relay_index(index_dir):
+    """(relays, ExitIndex, GuardTable), memory-mapped, from save_relay_index()."""
+    with open(os.path.join(index_dir, RELAY_INDEX_RELAYS), "r") as f:
+        relays = json.load(f)["relays"]
+    return relays, ExitIndex.load(index_dir), GuardTable.load(index_dir)
+
+
+def main(offline=False):
+    snapshot = get_relay_snapshot(offline=offline)
+    save_relays(snapshot["relays"], snapshot["relays_published"])
+
+
 if __name__ == "__main__":
-    main()
+    main(offline="--offline" in sys.argv or os.environ.get("SHADOWFP_OFFLINE") == "1")
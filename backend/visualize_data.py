@@ -6,9 +6,12 @@
 
 import json
 import os
-from collections import defaultdict
+from collections import Counter, defaultdict
 
-RESULTS_DIR = "backend/results"
+import numpy as np
+
+from paths import RESULTS_DIR
+from profiling import count, profiled
 
 CORRELATED_FILE = os.path.join(RESULTS_DIR, "correlated_paths.json")
 TIMELINE_FILE = os.path.join(RESULTS_DIR, "timeline.json")
@@ -18,6 +21,14 @@ SUSPECTS_FILE = os.path.join(RESULTS_DIR, "suspects.json")
 
 OUTPUT_FILE = os.path.join(RESULTS_DIR, "visual_data.json")
 
+# Timeline pyramid: bucket widths in seconds (1s, 10s, 1m, 10m, 1h)
+ROLLUP_RESOLUTIONS = (1, 10, 60, 600, 3600)
+EVENT_TYPES = ("Clearnet Entry", "TOR Exit")
+
+# Path graph layout: exits on the unit circle, users pulled inside it
+USER_RADIUS = 0.7
+USER_JITTER = 0.04
+
 
 def load_json(path):
     if not os.path.exists(path):
@@ -26,25 +37,147 @@ def load_json(path):
         return json.load(f)
 
 
-def build_visual_data():
-    print("[+] Creating visualization JSON...")
+def build_timeline_rollups(timeline, resolutions=ROLLUP_RESOLUTIONS):
+    """
+    Pre-aggregates timeline events into per-type counts at every bucket
+    width in `resolutions`. Each level holds only non-empty buckets:
+
+        {"t": [bucket start, epoch s], "TOR Exit": [...], "Clearnet Entry": [...]}
+
+    The finest level comes from the events; each coarser one from the
+    level below it, so the raw events are walked once.
+    """
+    types = list(EVENT_TYPES) + sorted({e["type"] for e in timeline} - set(EVENT_TYPES))
+    rollups = {
+        "resolutions": list(resolutions),
+        "types": types,
+        "start": None,
+        "end": None,
+        "levels": {}
+    }
+    if not timeline:
+        return rollups
+
+    codes = {name: i for i, name in enumerate(types)}
+    seconds = np.floor(np.fromiter(
+        (e["timestamp"] for e in timeline), dtype=np.float64, count=len(timeline)
+    )).astype(np.int64)
+    type_codes = np.fromiter(
+        (codes[e["type"]] for e in timeline), dtype=np.int64, count=len(timeline)
+    )
+    rollups["start"], rollups["end"] = int(seconds.min()), int(seconds.max())
+
+    resolutions = sorted(resolutions)
+    n_types = len(types)
+
+    # Finest level straight from the events
+    res = resolutions[0]
+    keys, inverse = np.unique(seconds // res * res, return_inverse=True)
+    counts = np.bincount(
+        inverse * n_types + type_codes, minlength=len(keys) * n_types
+    ).reshape(len(keys), n_types)
+
+    for i, res in enumerate(resolutions):
+        if i > 0:
+            # Sorted finer buckets → contiguous runs per coarser bucket
+            coarse = keys // res * res
+            starts = np.flatnonzero(np.r_[True, coarse[1:] != coarse[:-1]])
+            keys, counts = coarse[starts], np.add.reduceat(counts, starts, axis=0)
+
+        level = {"t": keys.tolist()}
+        for j, name in enumerate(types):
+            level[name] = counts[:, j].tolist()
+        rollups["levels"][str(res)] = level
+
+    return rollups
+
+
+def layout_path_graph(n_users, n_exits, user_idx, exit_idx, weights):
+    """
+    O(E) radial layout: exits spread on the unit circle (heaviest first),
+    each user at the weighted barycentre of the exits it reached, pulled
+    in to USER_RADIUS and jittered deterministically so users sharing the
+    same exits stay apart. Returns (user_xy, exit_xy) arrays.
+    """
+    exit_weight = np.bincount(exit_idx, weights, minlength=n_exits)
+    rank = np.empty(n_exits, dtype=np.int64)
+    rank[np.argsort(-exit_weight, kind="stable")] = np.arange(n_exits)
+    angle = 2 * np.pi * rank / max(n_exits, 1)
+    exit_xy = np.column_stack([np.cos(angle), np.sin(angle)])
+
+    user_weight = np.bincount(user_idx, weights, minlength=n_users)
+    user_xy = np.column_stack([
+        np.bincount(user_idx, weights * exit_xy[exit_idx, 0], minlength=n_users),
+        np.bincount(user_idx, weights * exit_xy[exit_idx, 1], minlength=n_users),
+    ]) / user_weight[:, None] * USER_RADIUS
+    user_xy += np.random.default_rng(0).normal(0, USER_JITTER, size=user_xy.shape)
+
+    return user_xy, exit_xy
+
+
+def build_path_graph(correlated, suspects=()):
+    """
+    Collapses correlated paths into one weighted edge per (user, exit) pair
+    and lays the graph out once, so the dashboard only has to draw it.
+    """
+    edges = Counter()
+    for pkt in correlated:
+        src = pkt.get("src_ip")
+        exit_node = pkt.get("exit_node") or pkt.get("dst_ip")
+        # Ensure we have both ends of the connection
+        if src and exit_node:
+            edges[(src, exit_node)] += 1
+
+    if not edges:
+        return {"nodes": [], "edges": []}
+
+    users = sorted({u for u, _ in edges})
+    exits = sorted({e for _, e in edges})
+    user_ids = {ip: i for i, ip in enumerate(users)}
+    exit_ids = {ip: i for i, ip in enumerate(exits)}
+
+    user_idx = np.array([user_ids[u] for u, _ in edges], dtype=np.int64)
+    exit_idx = np.array([exit_ids[e] for _, e in edges], dtype=np.int64)
+    weights = np.array(list(edges.values()), dtype=np.float64)
+    user_xy, exit_xy = layout_path_graph(len(users), len(exits), user_idx, exit_idx, weights)
+
+    user_paths = np.bincount(user_idx, weights, minlength=len(users))
+    exit_paths = np.bincount(exit_idx, weights, minlength=len(exits))
+    scores = {s["user_ip"]: s["final_score"] for s in suspects}
+
+    nodes = [
+        {
+            "id": ip, "kind": "user", "paths": int(user_paths[i]),
+            "score": scores.get(ip, 0),
+            "x": round(float(user_xy[i, 0]), 4), "y": round(float(user_xy[i, 1]), 4)
+        }
+        for i, ip in enumerate(users)
+    ] + [
+        {
+            "id": ip, "kind": "exit", "paths": int(exit_paths[i]), "score": 0,
+            "x": round(float(exit_xy[i, 0]), 4), "y": round(float(exit_xy[i, 1]), 4)
+        }
+        for i, ip in enumerate(exits)
+    ]
+
+    return {
+        "nodes": nodes,
+        "edges": [
+            {"source": u, "target": e, "weight": w}
+            for (u, e), w in edges.items()
+        ]
+    }
 
-    correlated = load_json(CORRELATED_FILE)
-    timeline = load_json(TIMELINE_FILE)
-    entry_nodes = load_json(ENTRY_FILE)
-    guard_nodes = load_json(GUARD_FILE)
-    suspects = load_json(SUSPECTS_FILE)
+
+def assemble_visual_data(correlated, timeline, entry_nodes, guard_nodes, suspects):
+    """
+    Shapes the pipeline results into the dashboard's visual_data document.
+    """
 
     # -----------------------------------------
-    # Tor path visualization
+    # Tor path visualization (weighted, pre-laid-out graph)
     # -----------------------------------------
-    tor_paths = []
-    for pkt in correlated:
-        tor_paths.append({
-            "src_ip": pkt.get("src_ip"),
-            "exit_node": pkt.get("exit_node") or pkt.get("dst_ip"),
-            "time": pkt.get("readable_time")
-        })
+    path_graph = build_path_graph(correlated, suspects)
 
     # -----------------------------------------
     # Entry confidence grouping
@@ -83,20 +216,38 @@ def build_visual_data():
         "highest_score": suspect_ranking[0] if suspect_ranking else {}
     }
 
-    visual_data = {
+    return {
         "summary": summary,
-        "tor_paths": tor_paths,
-        "timeline": timeline,
+        "path_graph": path_graph,
+        "timeline_rollups": build_timeline_rollups(timeline),
         "entry_confidence": entry_confidence,
         "guard_confidence": guard_confidence,
         "suspect_ranking": suspect_ranking
     }
 
+
+def save_visual_data(visual_data):
     with open(OUTPUT_FILE, "w") as f:
         json.dump(visual_data, f, indent=4)
 
     print(f"[✓] Visualization JSON saved → {OUTPUT_FILE}")
 
 
+@profiled("build_visual_data")
+def build_visual_data():
+    print("[+] Creating visualization JSON...")
+
+    paths = load_json(CORRELATED_FILE)
+    visual_data = assemble_visual_data(
+        paths,
+        load_json(TIMELINE_FILE),
+        load_json(ENTRY_FILE),
+        load_json(GUARD_FILE),
+        load_json(SUSPECTS_FILE)
+    )
+    count(records_in=len(paths or []), records_out=len(visual_data["path_graph"]["edges"]))
+    save_visual_data(visual_data)
+
+
 if __name__ == "__main__":
     build_visual_data()
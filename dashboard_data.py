@@ -0,0 +1,288 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+Data layer for the Streamlit dashboard.
+
+Streamlit re-runs the whole script on every click, so result files are
+parsed once and kept in a process-wide LRU cache keyed on path plus the
+file's mtime and size. A rewritten file is picked up on the next rerun;
+an unchanged one is never re-read. Entries are evicted least recently
+used first once the cache grows past its memory limit.
+"""
+
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import pandas as pd
+
+# Results paths and ranking helpers live with the pipeline code
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from paths import RESULTS_DIR
+from ranking import get_page, score_key
+
+# Memory budget for parsed results, overridable for big cases
+CACHE_LIMIT_MB = int(os.environ.get("SHADOWFP_CACHE_MB", "512"))
+
+# Most bars the timeline page draws at once
+MAX_TIMELINE_BUCKETS = 1500
+
+# Suspect ranking table rows per page
+SUSPECT_PAGE_ROWS = 100
+SUSPECT_COLUMNS = ["user_ip", "final_score", "temporal_score", "entry_score", "guard_score"]
+
+# Path graph level of detail
+GRAPH_TOP_USERS = 50            # users shown by default, best suspects first
+MAX_GRAPH_EDGES = 5000          # heaviest edges kept beyond this
+GRAPH_LABEL_LIMIT = 60          # node labels only drawn below this many nodes
+
+
+# --------------------------------------------------
+# SIZE ESTIMATES
+# --------------------------------------------------
+def estimate_size(value):
+    """
+    Rough in-memory size of a loaded dataset in bytes. DataFrames report
+    their own; JSON trees are walked (strings, numbers, containers).
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+
+    total, stack, seen = 0, [value], set()
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+    return total
+
+
+# --------------------------------------------------
+# CACHE
+# --------------------------------------------------
+class DataCache:
+    """
+    Thread-safe LRU cache of parsed files (Streamlit serves sessions from
+    threads). get() returns None for a missing file.
+    """
+
+    def __init__(self, limit_mb=CACHE_LIMIT_MB):
+        self.limit = limit_mb * 1024 * 1024
+        self.entries = OrderedDict()      # (path, view) → (stamp, value, size)
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    def get(self, path, loader, view="raw"):
+        """
+        `loader(path)` builds the value; `view` names what it builds, so a
+        file can be cached both raw and as a derived DataFrame.
+        """
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+        stamp = (info.st_mtime_ns, info.st_size)
+        key = (os.path.abspath(path), view)
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            value = loader(path)
+            size = estimate_size(value)
+
+            if entry is not None:
+                self.total -= entry[2]
+            self.entries[key] = (stamp, value, size)
+            self.entries.move_to_end(key)
+            self.total += size
+            self._evict(keep=key)
+            return value
+
+    def _evict(self, keep):
+        # The entry just loaded always stays, even if it alone is over budget
+        while self.total > self.limit and len(self.entries) > 1:
+            key = next(iter(self.entries))
+            if key == keep:
+                self.entries.move_to_end(key)
+                continue
+            _, _, size = self.entries.pop(key)
+            self.total -= size
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "size_mb": round(self.total / (1024 * 1024), 1),
+                "limit_mb": round(self.limit / (1024 * 1024), 1),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# --------------------------------------------------
+# TIMELINE ZOOM
+# --------------------------------------------------
+def pick_resolution(resolutions, span_sec, max_buckets=MAX_TIMELINE_BUCKETS):
+    """Finest rollup level that draws at most `max_buckets` bars over the span."""
+    for res in sorted(resolutions):
+        if span_sec / res <= max_buckets:
+            return res
+    return max(resolutions)
+
+
+# --------------------------------------------------
+# PATH GRAPH LEVEL OF DETAIL
+# --------------------------------------------------
+def select_graph(nodes, edges, top_users=GRAPH_TOP_USERS, max_edges=MAX_GRAPH_EDGES):
+    """
+    Cuts the pre-laid-out path graph down to what is worth drawing: the
+    `top_users` best-scored users, their heaviest `max_edges` edges and the
+    exits those reach. Returns (nodes, edges, dropped edge count).
+    """
+    users = nodes[nodes["kind"] == "user"].sort_values(
+        ["score", "paths"], ascending=False, kind="stable"
+    )
+    shown_users = set(users["id"].head(top_users))
+
+    kept = edges[edges["source"].isin(shown_users)]
+    dropped = max(0, len(kept) - max_edges)
+    if dropped:
+        kept = kept.nlargest(max_edges, "weight")
+
+    shown = nodes[nodes["id"].isin(shown_users | set(kept["target"]))]
+    return shown, kept, dropped
+
+
+# --------------------------------------------------
+# LOADERS
+# --------------------------------------------------
+def read_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def read_frame(path):
+    return pd.DataFrame(read_json(path))
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class Datasets:
+    """
+    Named accessors over one DataCache. Pages call only the ones they
+    render, so opening the report page never parses visual_data.json.
+    """
+
+    def __init__(self, cache=None, results_dir=RESULTS_DIR):
+        self.cache = cache or DataCache()
+        self.results_dir = results_dir
+
+    def path(self, name):
+        return os.path.join(self.results_dir, name)
+
+    def report(self):
+        return self.cache.get(self.path("forensic_report.json"), read_json)
+
+    def visual(self):
+        return self.cache.get(self.path("visual_data.json"), read_json)
+
+    def graph_frames(self):
+        """(nodes, edges) DataFrames of the pre-laid-out path graph."""
+        def build(path):
+            graph = self.visual().get("path_graph") or {"nodes": [], "edges": []}
+            nodes = pd.DataFrame(graph["nodes"], columns=["id", "kind", "paths", "score", "x", "y"])
+            edges = pd.DataFrame(graph["edges"], columns=["source", "target", "weight"])
+            return nodes, edges
+
+        return self.cache.get(self.path("visual_data.json"), build, view="graph_frames")
+
+    def timeline_rollups(self):
+        visual = self.visual()
+        return visual.get("timeline_rollups") if visual else None
+
+    def rollup_frame(self, resolution):
+        """One level of the timeline pyramid, with a local-time `time` column."""
+        def build(path):
+            frame = pd.DataFrame(self.timeline_rollups()["levels"][str(resolution)])
+            local = datetime.now().astimezone().tzinfo
+            frame["time"] = (
+                pd.to_datetime(frame["t"], unit="s", utc=True)
+                .dt.tz_convert(local).dt.tz_localize(None)
+            )
+            return frame
+
+        return self.cache.get(
+            self.path("visual_data.json"), build, view=f"rollup_{resolution}"
+        )
+
+    def suspect_count(self):
+        report = self.report()
+        return len(report["suspect_ranking"]) if report else 0
+
+    def suspect_page(self, number, page_size=SUSPECT_PAGE_ROWS):
+        """
+        Page `number` (0-based) of the report's suspect ranking as a
+        DataFrame, best first. Only the rows up to that page are ranked
+        (ranking.iter_pages), however many suspects the report holds.
+        """
+        report = self.report()
+        rows = get_page(
+            report["suspect_ranking"] if report else [], number, page_size,
+            key=score_key("final_score")
+        )
+        return pd.DataFrame(rows, columns=SUSPECT_COLUMNS)
+
+    def entry_frame(self):
+        frame = self.cache.get(self.path("entry_nodes.json"), read_frame)
+        return frame if frame is not None else pd.DataFrame()
+
+    def guard_frame(self):
+        frame = self.cache.get(self.path("guard_nodes.json"), read_frame)
+        return frame if frame is not None else pd.DataFrame()
+
+    def metrics_frame(self):
+        """One row per profiled stage of metrics.json (see backend/profiling.py), slowest first."""
+        def build(path):
+            stages = read_json(path).get("stages", {})
+            frame = pd.DataFrame(
+                [dict(values, stage=name) for name, values in stages.items()],
+                columns=["stage", "status", "wall_seconds", "cpu_seconds", "records_in",
+                         "records_out", "peak_rss_bytes", "io_read_bytes", "io_write_bytes",
+                         "finished"]
+            )
+            numeric = frame.columns.drop(["stage", "status", "finished"])
+            # Counts a stage did not report are None; keep the columns numeric
+            frame[numeric] = frame[numeric].apply(pd.to_numeric)
+            frame["finished"] = pd.to_datetime(frame["finished"], unit="s")
+            return frame.sort_values("wall_seconds", ascending=False, ignore_index=True)
+
+        frame = self.cache.get(self.path("metrics.json"), build, view="metrics_frame")
+        return frame if frame is not None else pd.DataFrame()
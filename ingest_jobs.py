@@ -0,0 +1,244 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""
+Background job queue behind the dashboard's evidence upload.
+
+Each upload becomes a job directory laid out like the repo root
+(backend/data, backend/results). The capture is streamed into it, and
+backend/pipeline.py runs in its own process with --progress and its
+data, results and cache roots pointed into the job directory (see
+backend/paths.py), so the Streamlit script thread only ever reads small
+JSON status files.
+Up to MAX_RUNNING_JOBS pipelines run at once; the rest wait in order.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from paths import BACKEND_DIR, DATA_DIR, case_environment
+
+JOBS_DIR = os.path.join(BACKEND_DIR, "jobs")
+RELAY_CACHE_DIR = os.path.join(DATA_DIR, "relay_cache")
+
+PIPELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend", "pipeline.py")
+
+MAX_RUNNING_JOBS = int(os.environ.get("SHADOWFP_JOB_WORKERS", "2"))
+COPY_CHUNK = 8 * 1024 * 1024
+POLL_SEC = 1.0
+
+JOB_FILE = "job.json"
+PROGRESS_FILE = "progress.json"
+LOG_FILE = "pipeline.log"
+
+
+def _read_json(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+class JobQueue:
+    """
+    Submits, schedules and reports on pipeline jobs. A daemon thread
+    starts queued jobs as slots free up and reaps finished ones, so the
+    queue advances even when nobody is clicking in the dashboard.
+    """
+
+    def __init__(self, jobs_dir=JOBS_DIR, max_running=MAX_RUNNING_JOBS):
+        self.jobs_dir = os.path.abspath(jobs_dir)
+        self.max_running = max_running
+        self._procs = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    # ---------- paths ----------
+    def job_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def results_dir(self, job_id):
+        return case_environment(self.job_dir(job_id))["SHADOWFP_RESULTS_DIR"]
+
+    def _meta_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), JOB_FILE)
+
+    # ---------- submission ----------
+    def submit(self, fileobj, name):
+        """
+        Streams an uploaded file into a new job directory and queues it.
+        Returns the job id.
+        """
+        job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        job_dir = self.job_dir(job_id)
+        env = case_environment(job_dir)
+        os.makedirs(env["SHADOWFP_DATA_DIR"])
+        os.makedirs(env["SHADOWFP_RESULTS_DIR"])
+
+        ext = os.path.splitext(name)[1].lower() or ".pcap"
+        capture = os.path.join(job_dir, f"capture{ext}")
+        with open(f"{capture}.part", "wb") as out:
+            shutil.copyfileobj(fileobj, out, COPY_CHUNK)
+        os.replace(f"{capture}.part", capture)
+
+        # Relay snapshots are shared between jobs instead of re-fetched
+        shared = os.path.abspath(RELAY_CACHE_DIR)
+        os.makedirs(shared, exist_ok=True)
+        try:
+            os.symlink(shared, os.path.join(env["SHADOWFP_DATA_DIR"], "relay_cache"),
+                       target_is_directory=True)
+        except OSError:
+            pass
+
+        _write_json(self._meta_path(job_id), {
+            "id": job_id,
+            "name": name,
+            "capture": capture,
+            "size": os.path.getsize(capture),
+            "state": "queued",
+            "created": time.time()
+        })
+        self.dispatch()
+        return job_id
+
+    # ---------- scheduling ----------
+    def _start(self, meta):
+        job_dir = self.job_dir(meta["id"])
+        log = open(os.path.join(job_dir, LOG_FILE), "w")
+        proc = subprocess.Popen(
+            [sys.executable, PIPELINE, meta["capture"], "--progress",
+             os.path.join(job_dir, PROGRESS_FILE)],
+            env=case_environment(job_dir), stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+        log.close()
+        self._procs[meta["id"]] = proc
+        meta.update(state="running", pid=proc.pid, started=time.time())
+        _write_json(self._meta_path(meta["id"]), meta)
+
+    def _finish(self, meta, exit_code):
+        progress = _read_json(os.path.join(self.job_dir(meta["id"]), PROGRESS_FILE)) or {}
+        ok = exit_code in (0, None) and progress.get("state") == "done"
+        meta.update(state="done" if ok else "failed", finished=time.time())
+        if not ok:
+            meta["error"] = progress.get("error") or f"pipeline exited with code {exit_code}"
+        _write_json(self._meta_path(meta["id"]), meta)
+
+    def dispatch(self):
+        """Reaps finished jobs and starts queued ones while slots are free."""
+        with self._lock:
+            metas = self._load_all()
+            running = 0
+            for meta in metas:
+                if meta["state"] != "running":
+                    continue
+                proc = self._procs.get(meta["id"])
+                if proc is not None:
+                    code = proc.poll()
+                    if code is None:
+                        running += 1
+                        continue
+                    del self._procs[meta["id"]]
+                    self._finish(meta, code)
+                elif _pid_alive(meta.get("pid", -1)):
+                    # Started by an earlier dashboard process
+                    running += 1
+                else:
+                    self._finish(meta, None)
+
+            queued = sorted((m for m in metas if m["state"] == "queued"), key=lambda m: m["created"])
+            for meta in queued[:max(0, self.max_running - running)]:
+                self._start(meta)
+
+    def _loop(self):
+        while True:
+            time.sleep(POLL_SEC)
+            try:
+                self.dispatch()
+            except Exception as e:
+                print(f"[!] Job dispatcher error: {e}")
+
+    # ---------- reporting ----------
+    def _load_all(self):
+        metas = []
+        for job_id in os.listdir(self.jobs_dir):
+            meta = _read_json(self._meta_path(job_id))
+            if meta:
+                metas.append(meta)
+        return metas
+
+    def jobs(self):
+        """All jobs, newest first, each with its live progress attached."""
+        jobs = []
+        for meta in self._load_all():
+            meta["progress"] = _read_json(os.path.join(self.job_dir(meta["id"]), PROGRESS_FILE))
+            jobs.append(meta)
+        jobs.sort(key=lambda m: m["created"], reverse=True)
+        return jobs
+
+
+def describe_progress(job, now=None):
+    """
+    One-line status for a job: stages done, the stage in flight and its
+    throughput in packets per second. Returns (fraction done, text).
+    """
+    progress = job.get("progress") or {}
+    stages = progress.get("stages", {})
+    if job["state"] == "queued":
+        return 0.0, "queued"
+    if job["state"] == "failed":
+        return 1.0, f"failed: {job.get('error', 'unknown error')}"
+
+    total = progress.get("total_stages") or len(stages) or 1
+    done = [name for name, s in stages.items() if s["status"] in ("ran", "cached")]
+    packets = progress.get("packets")
+    if job["state"] == "done":
+        elapsed = job.get("finished", 0) - job.get("started", 0)
+        rate = f", {packets / elapsed:,.0f} pkt/s overall" if packets and elapsed > 0 else ""
+        return 1.0, f"done in {elapsed:.1f}s ({packets or 0:,} packets{rate})"
+
+    now = now or time.time()
+    text = f"{len(done)}/{total} stages"
+    for name, info in stages.items():
+        if info["status"] == "running":
+            elapsed = now - info.get("started", now)
+            text += f" · {name} {elapsed:.0f}s"
+            parsed = progress.get("parsed_packets", 0)
+            if name == "pcap_parser" and parsed and elapsed > 0:
+                text += f" · {parsed:,} packets, {parsed / elapsed:,.0f} pkt/s"
+            break
+
+    # Throughput of the last stage that actually ran
+    ran = [n for n in done if stages[n]["status"] == "ran" and stages[n].get("seconds")]
+    if packets and ran:
+        text += f" · {ran[-1]} {packets / stages[ran[-1]]['seconds']:,.0f} pkt/s"
+    return len(done) / total, text
@@ -7,14 +7,21 @@
 from fpdf import FPDF
 import os
 
+WATERMARK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend", "data", "img.jpeg")
+
 class ForensicPDF(FPDF):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Looked up once per document. fpdf2 stores the image a single time
+        # and every page header only places a reference to it.
+        self.watermark = WATERMARK if os.path.exists(WATERMARK) else None
+
     def header(self):
         # Professional Watermark Logic (8% Opacity)
-        logo_path = "backend/data/img.jpeg" 
-        if os.path.exists(logo_path):
+        if self.watermark:
             with self.local_context(fill_opacity=0.08):
                 # Centers the logo on A4
-                self.image(logo_path, x=35, y=60, w=140)
+                self.image(self.watermark, x=35, y=60, w=140)
         
         # Professional Header Bar (Dark Navy)
         self.set_fill_color(26, 26, 46) 
@@ -31,4 +38,4 @@ class ForensicPDF(FPDF):
         self.set_y(-15)
         self.set_font("Helvetica", "I", 8)
         self.set_text_color(128, 128, 128)
-        self.cell(0, 10, f"Page {self.page_no()} | Restricted - Law Enforcement Use Only", align="C")
\ No newline at end of file
+        self.cell(0, 10, f"Page {self.page_no()} | Restricted - Law Enforcement Use Only", align="C")
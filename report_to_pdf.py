@@ -3,9 +3,145 @@
 # PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
 # HACKATHON: TN Police Hackathon 2025
 # ==============================================================================
+import glob
+import hashlib
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
 from report_generator import ForensicPDF
 
-def convert_report_to_pdf(report_data):
+# Stage profiling lives with the pipeline code
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from onionoo_client import StreamingDocumentParser
+from paths import CACHE_DIR
+from profiling import count, stage_profile
+from ranking import iter_pages, score_key
+
+# Rendered PDFs, one per distinct report file content
+PDF_CACHE_DIR = os.path.join(CACHE_DIR, "pdf")
+MAX_CACHED_PDFS = 20
+
+# Bump when the layout changes so cached PDFs are rendered again
+RENDER_VERSION = 3
+
+# Suspect ranking appendix: (heading, column width in mm), 180mm in total
+APPENDIX_COLUMNS = [
+    ("Rank", 16),
+    ("Probable Origin IP", 64),
+    ("Final Score", 25),
+    ("Temporal", 25),
+    ("Entry", 25),
+    ("Guard", 25)
+]
+APPENDIX_ROW_HEIGHT = 6
+# Ranking rows taken from the pager at a time
+APPENDIX_PAGE_ROWS = 1000
+# Characters of forensic_report.json parsed per read
+REPORT_READ_CHARS = 1 << 16
+
+
+def _score(value):
+    return "-" if value is None else f"{value:.4f}"
+
+
+def add_suspect_appendix(pdf, pages):
+    """
+    Appends the full suspect ranking as a table that repeats its heading on
+    every page. `pages` yields the ranking as lists of rows, best first
+    (ranking.iter_pages), and is consumed one page at a time.
+
+    Only the rows are bounded this way: fpdf keeps every finished page's
+    content stream in memory until output(), and output() returns the
+    whole document as bytes, so the PDF itself is held in memory and
+    grows with the suspect count: about 40 rows per page, and some 55 MB
+    of page buffers for 100K suspects (2,600 pages).
+
+    Rows are placed with text() rather than cell(), and each page's column
+    rules are drawn once when the page is full, which keeps a 100K-suspect
+    appendix to a fraction of the cost of one bordered cell per value.
+    """
+    widths = [width for _, width in APPENDIX_COLUMNS]
+    left = pdf.l_margin
+    edges = [left]
+    for width in widths:
+        edges.append(edges[-1] + width)
+    row_h = APPENDIX_ROW_HEIGHT
+    baseline = row_h / 2 + 1          # vertically centres 8pt text in a row
+
+    def table_heading():
+        pdf.set_font("Helvetica", "B", 9)
+        pdf.set_fill_color(26, 26, 46)
+        pdf.set_text_color(255, 255, 255)
+        for title, width in APPENDIX_COLUMNS:
+            pdf.cell(width, row_h + 1, title, border=1, align="C", fill=True)
+        pdf.ln()
+        pdf.set_font("Helvetica", "", 8)
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_fill_color(240, 240, 240)
+        return pdf.get_y()
+
+    def text_width(value):
+        # Core-font metrics straight from the width table; get_string_width()
+        # runs the full text shaping path and dominated the appendix
+        return sum(char_widths.get(c, 556) for c in value) * pdf.font_size / 1000
+
+    def close_page(top):
+        bottom = pdf.get_y()
+        for x in edges:
+            pdf.line(x, top, x, bottom)
+        pdf.line(edges[0], bottom, edges[-1], bottom)
+
+    pdf.add_page()
+    pdf.set_fill_color(240, 240, 240)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 10, "  APPENDIX A - SUSPECT RANKING", ln=True, fill=True)
+    pdf.ln(3)
+    top = table_heading()
+    y = top
+    char_widths = pdf.current_font.cw
+
+    rows = (row for page in pages for row in page)
+    for rank, row in enumerate(rows, start=1):
+        if y + row_h > pdf.page_break_trigger:
+            pdf.set_y(y)
+            close_page(top)
+            pdf.add_page()
+            top = y = table_heading()
+
+        final = row.get("final_score")
+        values = (
+            str(rank),
+            str(row.get("user_ip")),
+            "-" if final is None else f"{final * 100:.2f}%",
+            _score(row.get("temporal_score")),
+            _score(row.get("entry_score")),
+            _score(row.get("guard_score"))
+        )
+        # Banded rows keep long tables readable
+        if rank % 2 == 0:
+            pdf.rect(left, y, edges[-1] - left, row_h, style="F")
+        for value, x, width in zip(values, edges, widths):
+            pdf.text(x + (width - text_width(value)) / 2, y + baseline, value)
+        y += row_h
+
+    pdf.set_y(y)
+    close_page(top)
+
+
+def convert_report_to_pdf(report_data, pages=None, ranked=None):
+    """
+    Renders a forensic report. The appendix rows come from `pages`
+    (ranking.iter_pages) with `ranked` rows in total when given, else
+    from the report's own suspect_ranking.
+    """
+    if pages is None:
+        ranking = report_data.get('suspect_ranking') or []
+        ranked = len(ranking)
+        pages = iter_pages(ranking, APPENDIX_PAGE_ROWS, key=score_key("final_score"))
+
     pdf = ForensicPDF()
     pdf.add_page()
     # Ensure margins are standard (10mm = 1cm)
@@ -58,14 +194,153 @@ def convert_report_to_pdf(report_data):
     pdf.set_font("Helvetica", "B", 11)
     pdf.cell(40, 10, "Confidence Score:", 0, 0)
     pdf.set_font("Helvetica", "", 11)
-    score = report_data['key_findings']['confidence_score']
+    score = report_data['key_findings']['confidence_score'] or 0
     if score < 1: score *= 100
     pdf.cell(0, 10, f"{round(score, 1)}%", ln=True)
+
+    pdf.set_font("Helvetica", "B", 11)
+    pdf.cell(40, 10, "Total Suspects:", 0, 0)
+    pdf.set_font("Helvetica", "", 11)
+    total = report_data['key_findings']['total_suspects']
+    note = "see Appendix A" if ranked >= total else f"top {ranked:,} in Appendix A"
+    pdf.cell(0, 10, f"{total:,} ({note})", ln=True)
     pdf.ln(10)
 
     add_section_title("LEGAL & ETHICAL NOTICE")
     pdf.set_font("Helvetica", "I", 9)
     pdf.set_text_color(100, 100, 100)
     pdf.multi_cell(0, 5, str(report_data['legal_notice']))
+    pdf.set_text_color(0, 0, 0)
+
+    add_suspect_appendix(pdf, pages)
+
+    count(records_in=ranked, records_out=pdf.page_no())
+    return pdf.output()
+
+
+# --------------------------------------------------
+# STREAMED REPORT READING
+# --------------------------------------------------
+def read_report_fields(report_path):
+    """(every report member but suspect_ranking, number of ranked suspects), without holding the ranking."""
+    ranked = 0
+
+    def tally(row):
+        nonlocal ranked
+        ranked += 1
+
+    parser = StreamingDocumentParser(lambda _, row: tally(row), stream=("suspect_ranking",))
+    with open(report_path, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(REPORT_READ_CHARS), ""):
+            parser.feed(block)
+    fields = parser.close()
+    return fields, ranked
+
+
+def iter_report_ranking(report_path):
+    """The report's suspect_ranking rows in file (rank) order, parsed one read at a time."""
+    rows = []
+    parser = StreamingDocumentParser(lambda _, row: rows.append(row), stream=("suspect_ranking",))
+    with open(report_path, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(REPORT_READ_CHARS), ""):
+            parser.feed(block)
+            yield from rows
+            rows.clear()
+    parser.close()
+    yield from rows
+
+
+# --------------------------------------------------
+# CACHE
+# --------------------------------------------------
+def report_digest(report_path):
+    """Content hash of a report file, salted with the layout version."""
+    h = hashlib.sha256(f"render-v{RENDER_VERSION}".encode())
+    with open(report_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cached_report_pdf(report_path, cache_dir=PDF_CACHE_DIR):
+    """
+    Returns the path of the PDF for a forensic_report.json, rendering it
+    only if no PDF for the same content exists yet.
+    """
+    out_path = os.path.join(cache_dir, f"{report_digest(report_path)}.pdf")
+    if os.path.exists(out_path):
+        return out_path
+
+    # Metrics go next to the report, i.e. to that case's results. The
+    # report is streamed twice (header fields, then the appendix rows) so
+    # its ranking is never held whole; it was written ranked.
+    with stage_profile("convert_report_to_pdf", os.path.dirname(report_path)):
+        fields, ranked = read_report_fields(report_path)
+        pages = iter_pages(iter_report_ranking(report_path), APPENDIX_PAGE_ROWS)
+        pdf_bytes = convert_report_to_pdf(fields, pages, ranked)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(pdf_bytes)
+    os.replace(tmp, out_path)
+
+    # Oldest renders go first
+    rendered = sorted(glob.glob(os.path.join(cache_dir, "*.pdf")), key=os.path.getmtime)
+    for old in rendered[:-MAX_CACHED_PDFS]:
+        os.remove(old)
+    return out_path
+
+
+# --------------------------------------------------
+# BACKGROUND RENDERING
+# --------------------------------------------------
+class PDFRenderer:
+    """
+    Renders report PDFs in a worker process so the dashboard never blocks
+    on fpdf. request() returns straight away with the render's state;
+    renders of the same content are shared and never queued twice.
+    """
+
+    def __init__(self, cache_dir=PDF_CACHE_DIR):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self._pool = None
+        self._pending = {}     # digest → Future
+        self._digests = {}     # report path → ((mtime_ns, size), digest)
+        self._lock = threading.Lock()
+
+    def _digest(self, report_path):
+        st = os.stat(report_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        known = self._digests.get(report_path)
+        if known is None or known[0] != stamp:
+            known = (stamp, report_digest(report_path))
+            self._digests[report_path] = known
+        return known[1]
+
+    def request(self, report_path):
+        """
+        Returns ("ready", pdf path), ("rendering", None) or
+        ("failed", error message), starting a render if none is running.
+        """
+        report_path = os.path.abspath(report_path)
+        with self._lock:
+            digest = self._digest(report_path)
+            out_path = os.path.join(self.cache_dir, f"{digest}.pdf")
+
+            future = self._pending.get(digest)
+            if future is not None and future.done():
+                error = future.exception()
+                if error is not None:
+                    # Kept, so a broken report is not re-rendered every rerun
+                    return "failed", str(error)
+                del self._pending[digest]
+                future = None
 
-    return pdf.output()
\ No newline at end of file
+            if future is None:
+                if os.path.exists(out_path):
+                    return "ready", out_path
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn"))
+                self._pending[digest] = self._pool.submit(cached_report_pdf, report_path, self.cache_dir)
+            return "rendering", None
@@ -6,10 +6,18 @@
 import streamlit as st
 import json
 import os
+from datetime import datetime, timedelta
 import pandas as pd
+import numpy as np
 import plotly.express as px
-import networkx as nx
-import matplotlib.pyplot as plt
+import plotly.graph_objects as go
+
+from dashboard_data import (
+    DataCache, Datasets, GRAPH_LABEL_LIMIT, GRAPH_TOP_USERS, RESULTS_DIR, SUSPECT_PAGE_ROWS,
+    pick_resolution, read_bytes, select_graph
+)
+from ingest_jobs import JobQueue, describe_progress
+from report_to_pdf import PDFRenderer
 
 # --------------------------------------------------
 # PAGE CONFIG
@@ -47,38 +55,44 @@ h1, h2, h3, h4 {
 """, unsafe_allow_html=True)
 
 
-RESULTS_DIR = "backend/results"
-VISUAL_FILE = os.path.join(RESULTS_DIR, "visual_data.json")
-REPORT_JSON = os.path.join(RESULTS_DIR, "forensic_report.json")
-REPORT_PDF = os.path.join(RESULTS_DIR, "forensic_report.pdf")
-ENTRY_FILE = os.path.join(RESULTS_DIR, "entry_nodes.json")
-GUARD_FILE = os.path.join(RESULTS_DIR, "guard_nodes.json")
-
 # --------------------------------------------------
-# LOADERS (UNCHANGED)
+# LOADERS (cached across reruns, see dashboard_data.py)
 # --------------------------------------------------
-def load_json(path, name):
+@st.cache_resource
+def get_data_cache():
+    return DataCache()
+
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+@st.cache_resource
+def get_pdf_renderer():
+    return PDFRenderer()
+
+jobs = get_job_queue()
+
+# Results of the main pipeline run, or of a finished upload job
+MAIN_CASE = "Main pipeline results"
+case = st.session_state.get("case", MAIN_CASE)
+case_dir = RESULTS_DIR if case == MAIN_CASE else jobs.results_dir(case)
+if not os.path.isdir(case_dir):
+    case, case_dir = MAIN_CASE, RESULTS_DIR
+
+data = Datasets(get_data_cache(), case_dir)
+
+def require(dataset, name):
     try:
-        if not os.path.exists(path):
-            st.error(f"{name} not found. Run backend pipeline first.")
-            st.stop()
-        with open(path, "r") as f:
-            return json.load(f)
+        value = dataset()
     except Exception as e:
         st.error(f"Error loading {name}: {e}")
         st.stop()
+    if value is None:
+        st.error(f"{name} not found. Run backend pipeline first.")
+        st.stop()
+    return value
 
-visual = load_json(VISUAL_FILE, "visual_data.json")
-report = load_json(REPORT_JSON, "forensic_report.json")
-
-def load_df(path):
-    if not os.path.exists(path):
-        return pd.DataFrame()
-    with open(path, "r") as f:
-        return pd.DataFrame(json.load(f))
-
-entry_df = load_df(ENTRY_FILE)
-guard_df = load_df(GUARD_FILE)
+report = require(data.report, "forensic_report.json")
 
 # --------------------------------------------------
 # SIDEBAR (NAVIGATION) (UNCHANGED)
@@ -93,7 +107,8 @@ menu = st.sidebar.radio(
         "🌐 Tor Path Visualization",
         "⏱ Timeline Analysis",
         "🚨 Entry & Guard Analysis",
-        "📄 Forensic Report"
+        "📄 Forensic Report",
+        "⚙ Pipeline Performance"
     ],
     format_func=lambda x: f"  {x.split(' ')[0]} {x.split(' ', 1)[1]}" 
 )
@@ -111,19 +126,29 @@ st.sidebar.markdown(
 with st.sidebar:
     st.divider()
     st.subheader("📂 Live Evidence Ingestion")
-    uploaded_file = st.file_uploader("Upload Network Trace (PCAP)", type=["pcap", "jpeg", "json"])
+    uploaded_file = st.file_uploader("Upload Network Trace (PCAP)", type=["pcap", "pcapng", "cap"])
     
-    if uploaded_file is not None:
-        with st.status("Analyzing Evidence...", expanded=True) as status:
-            st.write("Extracting packet metadata...")
-            # Simulate a 2-second delay for "processing"
-            import time
-            time.sleep(1) 
-            st.write("Cross-referencing Tor Relay metadata...")
-            time.sleep(1)
-            status.update(label="Evidence Ingested Successfully!", state="complete", expanded=False)
-        
+    if uploaded_file is not None and st.button("Queue for analysis", use_container_width=True):
+        # Written to disk and handed to a worker process; nothing runs here
+        jobs.submit(uploaded_file, uploaded_file.name)
         st.info(f"File '{uploaded_file.name}' is now queued for Fusion Engine analysis.")
+
+    job_list = jobs.jobs()
+    if job_list:
+        st.caption("Analysis jobs")
+        for job in job_list[:8]:
+            fraction, text = describe_progress(job)
+            st.progress(fraction, text=f"{job['name']} — {text}")
+        st.button("↻ Refresh job status", use_container_width=True)
+
+    finished = [j["id"] for j in job_list if j["state"] == "done"]
+    names = {j["id"]: j["name"] for j in job_list}
+    if st.session_state.get("case", MAIN_CASE) not in finished:
+        st.session_state["case"] = MAIN_CASE
+    st.selectbox(
+        "🗂 Case results", [MAIN_CASE] + finished, key="case",
+        format_func=lambda c: c if c == MAIN_CASE else f"{names[c]} ({c})"
+    )
 # --------------------------------------------------
 # HEADER AND TOP METRICS (FIXED SYNCHRONIZATION)
 # --------------------------------------------------
@@ -187,33 +212,61 @@ if menu == "📊 Dashboard":
 
 elif menu == "🌐 Tor Path Visualization":
     st.header("🌐 Tor Path Correlation Graph")
-    
-    G = nx.Graph()
-    for path in visual["tor_paths"]:
-        # Ensure we have both ends of the connection
-        if path.get("src_ip") and path.get("exit_node"):
-            G.add_edge(path["src_ip"], path["exit_node"])
+    require(data.visual, "visual_data.json")
+    nodes, edges = data.graph_frames()
 
-    if len(G.nodes) == 0:
+    if edges.empty:
         st.warning("No path data found. Re-run node_correlation.py.")
     else:
-        fig, ax = plt.subplots(figsize=(12, 8))
-        # Use a dark background for the plot to match the UI
-        fig.patch.set_facecolor('#1a1a2e') 
-        ax.set_facecolor('#1a1a2e')
+        n_users = int((nodes["kind"] == "user").sum())
+        top_users = n_users
+        if n_users > 1:
+            top_users = st.slider(
+                "Suspects shown (highest fusion score first)",
+                min_value=1, max_value=n_users, value=min(n_users, GRAPH_TOP_USERS)
+            )
+        shown, kept, dropped = select_graph(nodes, edges, top_users)
+
+        # Edges as one WebGL line trace, segments separated by gaps
+        # (an address can be both a user and an exit, so look them up apart)
+        user_pos = shown[shown["kind"] == "user"].set_index("id")[["x", "y"]]
+        exit_pos = shown[shown["kind"] == "exit"].set_index("id")[["x", "y"]]
+        src = user_pos.loc[kept["source"]].to_numpy()
+        dst = exit_pos.loc[kept["target"]].to_numpy()
+        gap = np.full((len(kept), 1), np.nan)
+        edge_x = np.hstack([src[:, :1], dst[:, :1], gap]).ravel()
+        edge_y = np.hstack([src[:, 1:], dst[:, 1:], gap]).ravel()
 
-        pos = nx.spring_layout(G, k=0.5, seed=42)
-        
         # Color the top suspect red, others cyan
         top_ip = report["key_findings"]["top_suspect"]
-        colors = ['#FF4B4B' if n == top_ip else '#00e5ff' for n in G.nodes()]
+        colors = np.where(shown["id"] == top_ip, "#FF4B4B", "#00e5ff")
+        sizes = np.clip(np.sqrt(shown["paths"]) * 4, 8, 40)
+        labelled = len(shown) <= GRAPH_LABEL_LIMIT
+
+        fig = go.Figure([
+            go.Scattergl(x=edge_x, y=edge_y, mode="lines",
+                         line=dict(color="#555", width=1), hoverinfo="skip"),
+            go.Scattergl(
+                x=shown["x"], y=shown["y"],
+                mode="markers+text" if labelled else "markers",
+                text=shown["id"], textposition="top center",
+                marker=dict(color=colors, size=sizes,
+                            symbol=np.where(shown["kind"] == "exit", "square", "circle")),
+                customdata=shown[["kind", "paths"]],
+                hovertemplate="%{text}<br>%{customdata[0]} · %{customdata[1]} paths<extra></extra>"
+            )
+        ])
+        fig.update_layout(
+            template="plotly_dark", showlegend=False, height=700,
+            paper_bgcolor="#1a1a2e", plot_bgcolor="#1a1a2e",
+            xaxis=dict(visible=False), yaxis=dict(visible=False, scaleanchor="x")
+        )
+        st.plotly_chart(fig, use_container_width=True)
 
-        nx.draw(G, pos, with_labels=True, node_color=colors,
-                edge_color="#555", node_size=2500, font_size=10, 
-                font_color="black", font_weight="bold", ax=ax)
-        
-        st.pyplot(fig)
-        st.caption("Red Node: Top Suspect | Blue Nodes: Other Suspects/Exit Nodes")
+        caption = f"{len(shown)} nodes · {len(kept)} weighted edges"
+        if dropped:
+            caption += f" ({dropped} lighter edges hidden)"
+        st.caption(caption + " | Red Node: Top Suspect | Circles: Suspects | Squares: Exit Nodes")
 
 
 # ==================================================
@@ -223,13 +276,28 @@ elif menu == "⏱ Timeline Analysis":
     st.header("⏱ Temporal Correlation Timeline")
     st.markdown("Chronological mapping of observed Clearnet (pre-Tor) activity versus Tor Exit activity, critical for **Node Correlation**.")
 
-    timeline_df = pd.DataFrame(visual["timeline"])
-    if timeline_df.empty:
-        st.warning("Timeline data unavailable.")
+    require(data.visual, "visual_data.json")
+    rollups = data.timeline_rollups()
+    if not rollups or not rollups["levels"]:
+        st.warning("Timeline data unavailable. Re-run visualize_data.py.")
     else:
-        timeline_df["Events"] = 1
-        
-        fig = px.line(timeline_df.groupby("time")["Events"].sum().reset_index(), 
+        # Zooming only switches between pre-aggregated levels
+        start = datetime.fromtimestamp(rollups["start"])
+        end = datetime.fromtimestamp(rollups["end"] + 1)
+        lo, hi = start, end
+        if end - start > timedelta(seconds=1):
+            lo, hi = st.slider(
+                "Visible range", min_value=start, max_value=end, value=(start, end),
+                step=timedelta(seconds=1), format="HH:mm:ss"
+            )
+
+        resolution = pick_resolution(rollups["resolutions"], (hi - lo).total_seconds())
+        frame = data.rollup_frame(resolution)
+        visible = frame[(frame["time"] >= lo) & (frame["time"] < hi)]
+        st.caption(f"{resolution}s buckets · {len(visible)} of {len(frame)} bars in view")
+
+        totals = visible.assign(Events=visible[rollups["types"]].sum(axis=1))
+        fig = px.line(totals, 
                       x='time', 
                       y='Events', 
                       title='Total Network Events Over Time',
@@ -237,7 +305,10 @@ elif menu == "⏱ Timeline Analysis":
         st.plotly_chart(fig, use_container_width=True)
         
         st.subheader("Activity Breakdown")
-        fig_breakdown = px.bar(timeline_df, x='time', y='Events', color='type', 
+        breakdown = visible.melt(
+            id_vars="time", value_vars=rollups["types"], var_name="type", value_name="Events"
+        )
+        fig_breakdown = px.bar(breakdown[breakdown["Events"] > 0], x='time', y='Events', color='type', 
                                title='Entry vs. Exit Activity Timeline',
                                color_discrete_map={'TOR Exit': '#FF4B4B', 'Clearnet Entry': '#00bcd4'})
         st.plotly_chart(fig_breakdown, use_container_width=True)
@@ -253,12 +324,13 @@ elif menu == "🚨 Entry & Guard Analysis":
     st.subheader("📍 Entry Node Likelihood")
     st.markdown("Score based on packet size and time consistency (automated behavior).")
 
+    entry_df = data.entry_frame()
     if entry_df.empty:
         st.warning("Entry node data not available.")
     else:
-        entry_df["entry_pct"] = (
+        entry_df = entry_df.assign(entry_pct=(
             entry_df["entry_score"] / entry_df["entry_score"].max()
-        ) * 100
+        ) * 100)
 
         fig_entry = px.bar(
             entry_df,
@@ -276,10 +348,11 @@ elif menu == "🚨 Entry & Guard Analysis":
     st.subheader("🛡 Guard Node Stability")
     st.markdown("Confidence based on the consistent reuse of specific exit nodes, indicating a stable entry circuit.")
 
+    guard_df = data.guard_frame()
     if guard_df.empty:
         st.info("Guard node reuse not strongly observed.")
     else:
-        guard_df["confidence_pct"] = guard_df["confidence"] * 100
+        guard_df = guard_df.assign(confidence_pct=guard_df["confidence"] * 100)
 
         fig_guard = px.bar(
             guard_df,
@@ -321,8 +394,13 @@ elif menu == "📄 Forensic Report":
     # 2. Suspect Ranking Table
     st.subheader("📋 Detailed Suspect Ranking")
     with st.expander("Show Ranking and Score Breakdown", expanded=True):
-        # Convert the ranking list from the report into a readable DataFrame
-        suspects_df = pd.DataFrame(report["suspect_ranking"])
+        # One page of the ranking at a time; see dashboard_data.suspect_page
+        n_pages = max(1, -(-data.suspect_count() // SUSPECT_PAGE_ROWS))
+        page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+        st.caption(f"Page {page} of {n_pages:,} ({SUSPECT_PAGE_ROWS} suspects per page)")
+        suspects_df = data.suspect_page(page - 1)
+        suspects_df.insert(0, 'Rank', range((page - 1) * SUSPECT_PAGE_ROWS + 1,
+                                            (page - 1) * SUSPECT_PAGE_ROWS + len(suspects_df) + 1))
         
         # Add a formatted percentage column for the UI table
         suspects_df['Final Score (%)'] = (suspects_df['final_score'] * 100).round(2)
@@ -330,14 +408,15 @@ elif menu == "📄 Forensic Report":
         # Display the specific forensic signals (Temporal, Entry, Guard)
         st.dataframe(
             suspects_df[[
-                'user_ip', 'Final Score (%)', 'temporal_score', 'entry_score', 'guard_score'
+                'Rank', 'user_ip', 'Final Score (%)', 'temporal_score', 'entry_score', 'guard_score'
             ]].rename(columns={
                 'user_ip': 'Probable Origin IP', 
                 'temporal_score': 'Temporal Score (0-1)', 
                 'entry_score': 'Entry Score (0-1)', 
                 'guard_score': 'Guard Score (0-1)'
             }),
-            use_container_width=True
+            use_container_width=True,
+            hide_index=True
         )
 
     # 3. Legal Notice
@@ -351,28 +430,91 @@ elif menu == "📄 Forensic Report":
     st.divider()
     st.subheader("⬇ Export Official Documentation")
     
-    try:
-        from report_to_pdf import convert_report_to_pdf
-        
-        # 1. Generate the PDF
-        raw_pdf_data = convert_report_to_pdf(report)
-        
-        # 2. FIX: Convert bytearray to standard bytes
-        # This solves the "Invalid binary data format" error
-        pdf_bytes = bytes(raw_pdf_data)
-        
+    # Rendered once per report content in a worker process, then served
+    # from backend/cache/pdf; see report_to_pdf.PDFRenderer
+    state, result = get_pdf_renderer().request(data.path("forensic_report.json"))
+
+    if state == "ready":
         st.download_button(
             label="Download Official Forensic Report (PDF)",
-            data=pdf_bytes, # Now receiving standard bytes
+            data=data.cache.get(result, read_bytes),
             file_name=f"Forensic_Report_{report['case_metadata']['case_id']}.pdf",
             mime="application/pdf",
             use_container_width=True
         )
         st.caption("Official document includes Tamil Nadu Police watermark and branding.")
-        
-    except Exception as e:
-        st.error(f"Error: {e}")
+    elif state == "rendering":
+        st.info(
+            f"Rendering the PDF in the background "
+            f"({len(report['suspect_ranking']):,} suspects in the appendix)."
+        )
+        st.button("🔄 Check again", key="pdf_refresh")
+    else:
+        st.error(f"Error: {result}")
         st.info("Ensure report_generator.py and report_to_pdf.py are in your folder.")
+
+# ==================================================
+# PAGE 6: PIPELINE PERFORMANCE
+# ==================================================
+elif menu == "⚙ Pipeline Performance":
+    st.header("⚙ Pipeline Performance")
+    st.markdown("Cost of each stage's last run for this case, as profiled into `metrics.json` (see backend/profiling.py).")
+
+    metrics_df = data.metrics_frame()
+    if metrics_df.empty:
+        st.warning("No stage metrics recorded yet. Run the backend pipeline first.")
+    else:
+        sla = st.number_input("Stage SLA (seconds)", min_value=0.0, value=60.0, step=5.0)
+        ran = metrics_df[metrics_df["status"] != "cached"]
+        over = ran[ran["wall_seconds"] > sla]
+
+        col_p1, col_p2, col_p3 = st.columns(3)
+        with col_p1:
+            st.metric("Slowest Stage", ran["stage"].iloc[0] if not ran.empty else "—")
+        with col_p2:
+            st.metric("Total Stage Time", f"{ran['wall_seconds'].sum():.2f}s")
+        with col_p3:
+            st.metric("Stages Over SLA", len(over))
+        if not over.empty:
+            st.error("Over SLA: " + ", ".join(f"{s} ({t:.2f}s)" for s, t in zip(over["stage"], over["wall_seconds"])))
+
+        times = ran.melt(id_vars="stage", value_vars=["wall_seconds", "cpu_seconds"],
+                         var_name="measure", value_name="Seconds")
+        fig_times = px.bar(times, x="Seconds", y="stage", color="measure", barmode="group",
+                           orientation="h", title="Wall vs. CPU Time per Stage", template="plotly_dark",
+                           color_discrete_map={"wall_seconds": "#00bcd4", "cpu_seconds": "#FF4B4B"})
+        fig_times.add_vline(x=sla, line_dash="dash", line_color="#FFD700")
+        st.plotly_chart(fig_times, use_container_width=True)
+
+        st.subheader("📋 Stage Metrics")
+        mb = 1024 * 1024
+        table = metrics_df.assign(
+            records_per_sec=(metrics_df["records_in"] / metrics_df["wall_seconds"]).round(1),
+            peak_rss_mb=(metrics_df["peak_rss_bytes"] / mb).round(1),
+            read_mb=(metrics_df["io_read_bytes"] / mb).round(2),
+            write_mb=(metrics_df["io_write_bytes"] / mb).round(2)
+        )
+        st.dataframe(
+            table[[
+                "stage", "status", "wall_seconds", "cpu_seconds", "records_in", "records_out",
+                "records_per_sec", "peak_rss_mb", "read_mb", "write_mb", "finished"
+            ]].rename(columns={
+                "stage": "Stage", "status": "Status", "wall_seconds": "Wall (s)",
+                "cpu_seconds": "CPU (s)", "records_in": "Records In", "records_out": "Records Out",
+                "records_per_sec": "Records/s", "peak_rss_mb": "Peak RSS (MB)",
+                "read_mb": "Read (MB)", "write_mb": "Written (MB)", "finished": "Finished (UTC)"
+            }),
+            use_container_width=True
+        )
+
+        prom_path = data.path("metrics.prom")
+        if os.path.exists(prom_path):
+            st.download_button(
+                label="Download Prometheus Metrics",
+                data=data.cache.get(prom_path, read_bytes),
+                file_name="shadowfp_metrics.prom",
+                mime="text/plain"
+            )
 # --------------------------------------------------
 # FOOTER
 # --------------------------------------------------
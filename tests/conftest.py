@@ -0,0 +1,17 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+import os
+import sys
+import tempfile
+
+# Backend modules import each other as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# Modules read their roots when imported: keep test runs out of backend/
+_ROOT = tempfile.mkdtemp(prefix="shadowfp-tests-")
+for _name in ("DATA", "RESULTS", "CACHE"):
+    os.environ[f"SHADOWFP_{_name}_DIR"] = os.path.join(_ROOT, _name.lower())
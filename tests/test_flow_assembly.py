@@ -0,0 +1,142 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""assemble_flows() against a packet-by-packet flow tracker."""
+
+import random
+
+import pytest
+
+from flow_assembly import assemble_flows
+from packet_store import PacketStore, write_store
+
+CLIENTS = ["10.0.0.1", "10.0.0.2", "10.0.0.3", "2001:db8::c1"]
+SERVERS = ["93.184.216.34", "185.220.101.1", "2001:db8::80"]
+JA3 = ["771,4865-4866,0-23", "771,49195-49199,0-11", None, None]
+RESOLUTION = 1_000_000
+
+
+def _packets(n, seed):
+    """
+    Packet tuples on a millisecond grid in capture order that is not time
+    order, with quiet gaps so flows hit both timeouts.
+    """
+    rng = random.Random(seed)
+    packets = []
+    for _ in range(n):
+        client = (rng.choice(CLIENTS), rng.choice([40000, 40001]))
+        server = (rng.choice(SERVERS), rng.choice([443, 80]))
+        src, dst = (client, server) if rng.random() < 0.6 else (server, client)
+        ts = rng.choice([rng.randrange(0, 8000), rng.randrange(12000, 30000)]) / 1000
+        packets.append((
+            ts, src[0], dst[0], rng.randrange(60, 1500), rng.choice([64, 128]), 0,
+            rng.choice(JA3), rng.choice([6, 6, 17]), src[1], dst[1]
+        ))
+    return packets
+
+
+# --------------------------------------------------
+# BASELINE (one packet at a time, time order)
+# --------------------------------------------------
+def scan_flows(packets, idle_timeout, active_timeout, max_bursts, bin_sec, max_bins):
+    ticks = [round(p[0] * RESOLUTION) for p in packets]
+    idle, active = idle_timeout * RESOLUTION, active_timeout * RESOLUTION
+    bin_ticks = round(bin_sec * RESOLUTION)
+
+    flows, open_flows = [], {}
+    for i in sorted(range(len(packets)), key=lambda i: (ticks[i], i)):
+        ts, src, dst, length, ttl, _, ja3, proto, sport, dport = packets[i]
+        t = ticks[i]
+        key = (proto, *sorted([(src, sport), (dst, dport)]))
+        flow = open_flows.get(key)
+        if flow is None or t - flow["last"] > idle or t - flow["start"] > active:
+            flow = open_flows[key] = {
+                "start": t, "last": t, "first": i, "initiator": (src, sport), "src_ip": src,
+                "dst_ip": dst, "src_port": sport, "dst_port": dport, "ttl": ttl, "ja3": None,
+                "packets": 0, "bytes": 0, "out_packets": 0, "out_bytes": 0,
+                "bursts": [], "series": {},
+            }
+            flows.append(flow)
+        outbound = (src, sport) == flow["initiator"]
+        flow["last"] = t
+        flow["packets"] += 1
+        flow["bytes"] += length
+        flow["out_packets"] += outbound
+        flow["out_bytes"] += length if outbound else 0
+        if flow["ja3"] is None:
+            flow["ja3"] = ja3
+        signed = length if outbound else -length
+        if flow["bursts"] and (flow["bursts"][-1] > 0) == outbound:
+            flow["bursts"][-1] += signed
+        else:
+            flow["bursts"].append(signed)
+        b = (t - flow["start"]) // bin_ticks
+        if b < max_bins:
+            flow["series"][b] = flow["series"].get(b, 0) + length
+
+    flows.sort(key=lambda f: (f["start"], f["first"]))
+    for flow in flows:
+        flow["bursts"] = flow["bursts"][:max_bursts]
+        series = [0] * (max(flow["series"]) + 1)
+        for b, size in flow["series"].items():
+            series[b] = size
+        flow["series"] = series
+    return flows
+
+
+def _rows(table):
+    rows = []
+    for i in range(len(table)):
+        rows.append({
+            "start": int(table["timestamp"][i]), "last": int(table["end"][i]),
+            "src_ip": table.ip_to_str("src_ip", table["src_ip"][i]),
+            "dst_ip": table.ip_to_str("dst_ip", table["dst_ip"][i]),
+            "src_port": int(table["src_port"][i]), "dst_port": int(table["dst_port"][i]),
+            "ttl": int(table["ttl"][i]), "ja3": table.ja3_table[table["ja3"][i]],
+            **{name: int(table[name][i]) for name in ("packets", "bytes", "out_packets", "out_bytes")},
+            "bursts": table.bursts(i), "series": table.series(i).tolist(),
+        })
+    return rows
+
+
+def _expected(packets, *args):
+    keep = ("start", "last", "src_ip", "dst_ip", "src_port", "dst_port", "ttl", "ja3",
+            "packets", "bytes", "out_packets", "out_bytes", "bursts", "series")
+    return [{name: flow[name] for name in keep} for flow in scan_flows(packets, *args)]
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("idle_timeout, active_timeout", [(2.0, 5.0), (0.5, 120.0), (15.0, 1.0)])
+def test_flows_equal_packet_scan(tmp_path, seed, idle_timeout, active_timeout):
+    packets = _packets(1500, seed)
+    write_store(packets, str(tmp_path), RESOLUTION)
+    flows = assemble_flows(
+        PacketStore(str(tmp_path)), idle_timeout, active_timeout,
+        max_bursts=4, series_bin_sec=0.05, max_series_bins=40
+    )
+    assert _rows(flows) == _expected(packets, idle_timeout, active_timeout, 4, 0.05, 40)
+
+
+def test_timeouts_split_one_conversation(tmp_path):
+    conversation = [
+        # ts, from client?, bytes
+        (0.0, True, 100), (0.5, False, 200), (0.6, False, 300), (1.0, True, 50),
+        (4.0, True, 60),                     # idle gap > 2 s: new flow
+        (4.1, False, 70), (7.5, True, 80),   # active timeout (3 s) cuts before 7.5
+    ]
+    client, server = ("10.0.0.1", 40000), ("93.184.216.34", 443)
+    packets = [
+        (ts, *((client[0], server[0]) if out else (server[0], client[0])), size, 64, 0, None, 6,
+         *((client[1], server[1]) if out else (server[1], client[1])))
+        for ts, out, size in conversation
+    ]
+    write_store(packets, str(tmp_path), RESOLUTION)
+    flows = assemble_flows(PacketStore(str(tmp_path)), idle_timeout=2.0, active_timeout=3.0)
+
+    assert [flows.bursts(i) for i in range(len(flows))] == [[100, -500, 50], [60, -70], [80]]
+    assert flows["packets"].tolist() == [4, 2, 1]
+    assert flows["out_bytes"].tolist() == [150, 60, 80]
+    assert flows.durations().tolist() == [1.0, 0.1, 0.0]
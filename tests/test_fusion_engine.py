@@ -0,0 +1,117 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""IncrementalFusion against a from-scratch score_suspects()."""
+
+import random
+
+import pytest
+
+from fusion_engine import IncrementalFusion, MaxTracker, RankedScores, score_suspects
+from ip_index import IPInterner
+
+USERS = [f"10.0.0.{i}" for i in range(1, 40)]
+
+
+def _signals(seed):
+    rng = random.Random(seed)
+    correlated = [
+        {"src_ip": rng.choice(USERS), "timestamp": 1_700_000_000 + rng.randrange(3600),
+         "temporal_match_score": rng.choice([0.0, 0.25, rng.random()])}
+        for _ in range(400)
+    ]
+    entry_nodes = [
+        {"user_ip": user, "entry_score": rng.choice([0.0, rng.random() * 3])}
+        for user in rng.sample(USERS, 25)
+    ]
+    guard_nodes = [
+        {"user_ip": user, "confidence": rng.random()}
+        for user in rng.sample(USERS, 15)
+    ]
+    return correlated, entry_nodes, guard_nodes
+
+
+def _feed(correlated, entry_nodes, guard_nodes, seed):
+    """Replays the signals in a shuffled order, reading the ranking as it goes."""
+    rng = random.Random(seed)
+    fusion = IncrementalFusion(IPInterner())
+    intern = fusion.interner.intern
+    events = (
+        [("path", p) for p in correlated]
+        + [("entry", e) for e in entry_nodes]
+        + [("guard", g) for g in guard_nodes]
+    )
+    rng.shuffle(events)
+    for i, (kind, event) in enumerate(events):
+        if kind == "path":
+            user = intern(event["src_ip"])
+            fusion.add("temporal", user, event["temporal_match_score"])
+            fusion.see(user, event["timestamp"])
+        elif kind == "entry":
+            fusion.set("entry", intern(event["user_ip"]), event["entry_score"])
+        else:
+            user = intern(event["user_ip"])
+            # A maximum that later goes down again
+            fusion.set("guard", user, 10.0)
+            fusion.top(3)
+            fusion.set("guard", user, event["confidence"])
+        if i % 7 == 0:
+            fusion.top(5)
+    return fusion
+
+
+def _by_user(rows):
+    return {row["user_ip"]: row for row in rows}
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_incremental_equals_score_suspects(seed):
+    signals = _signals(seed)
+    expected = score_suspects(*signals)
+    fusion = _feed(*signals, seed)
+
+    got = fusion.suspects()
+    assert _by_user(got) == _by_user(expected)
+    assert [r["final_score"] for r in got] == [r["final_score"] for r in expected]
+    assert [r["final_score"] for r in fusion.top(10)] == [r["final_score"] for r in expected[:10]]
+
+
+def test_removed_signal_falls_back_to_missing_score():
+    correlated, entry_nodes, guard_nodes = _signals(0)
+    fusion = _feed(correlated, entry_nodes, guard_nodes, 0)
+    gone = guard_nodes[0]["user_ip"]
+    fusion.set("guard", fusion.interner.intern(gone), None)
+
+    expected = score_suspects(correlated, entry_nodes, guard_nodes[1:])
+    assert _by_user(fusion.suspects()) == _by_user(expected)
+
+
+def test_max_tracker_follows_updates_and_removals():
+    rng = random.Random(1)
+    tracker, values = MaxTracker(), {}
+    for _ in range(2000):
+        key = rng.randrange(50)
+        if rng.random() < 0.3:
+            tracker.discard(key)
+            values.pop(key, None)
+        else:
+            values[key] = rng.random()
+            tracker.set(key, values[key])
+        assert tracker.max(None) == (max(values.values()) if values else None)
+
+
+def test_ranked_scores_order_is_a_stable_sort():
+    rng = random.Random(2)
+    ranking, scores, first_seen = RankedScores(), {}, []
+    for _ in range(1000):
+        key = rng.randrange(60)
+        if key not in first_seen:
+            first_seen.append(key)
+        scores[key] = rng.choice([0.5, 0.75, rng.random()])
+        ranking.update(key, scores[key])
+    expected = sorted(scores, key=lambda k: (-scores[k], first_seen.index(k)))
+    assert ranking.ordered() == expected
+    assert ranking.top(15) == expected[:15]
@@ -0,0 +1,61 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""Live scoring against the batch stages run on packets."""
+
+import os
+
+import pytest
+
+import benchmark
+import entry_identification
+import fusion_engine
+import guard_predictor
+import node_correlation
+import pcap_parser
+from ip_index import ExitIndex, GuardTable
+from live_capture import LiveScorer
+from packet_store import STORE_DIR, open_store
+
+
+def _relays(guard_exits):
+    """Benchmark relays; with `guard_exits`, every third exit is a guard on its exit address."""
+    relays = benchmark.benchmark_relays(0)
+    if guard_exits:
+        for i, relay in enumerate(relays):
+            if relay["exit_addresses"] and i % 3 == 0:
+                relay["or_addresses"] = [relay["exit_addresses"][0] + ":443"]
+                relay["flags"] = sorted((set(relay["flags"]) | {"Guard", "Running"}) - {"Exit"})
+    return relays
+
+
+@pytest.mark.parametrize("guard_exits", [True, False])
+def test_live_snapshot_equals_batch_on_packets(tmp_path, guard_exits):
+    relays = _relays(guard_exits)
+    capture = benchmark.generate_workload(os.path.join(tmp_path, "w.pcap"), 8000, seed=0, relays=relays)
+    pcap_parser.parse_capture(capture)
+    store = open_store(STORE_DIR)
+    table = GuardTable.from_relays(relays)
+
+    paths, _ = node_correlation.correlate_data(
+        store, relays, window_sec=5, exit_index=ExitIndex.from_relays(relays)
+    )
+    entries = entry_identification.score_entry_nodes(paths)
+    guards = guard_predictor.score_guard_nodes(paths, entries, 5, store, table)
+    suspects = fusion_engine.score_suspects(paths, entries, guards)
+
+    scorer = LiveScorer(guard_table=table)
+    correlator = node_correlation.StreamCorrelator(ExitIndex.from_relays(relays), 5)
+    for packet in pcap_parser.iter_packets(capture):
+        path = correlator.feed(packet)
+        scorer.add_packet(packet)
+        if path is not None:
+            scorer.add_path(path)
+
+    assert paths and scorer.paths == len(paths)
+    # Guard ORPort connections are only seen when some exit is also a guard
+    assert all(("guard_fingerprint" in g) == guard_exits for g in guards)
+    assert scorer.snapshot() == (entries, guards, suspects)
@@ -0,0 +1,198 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""Temporal join against the original full-scan correlation."""
+
+import random
+
+import numpy as np
+import pytest
+
+import node_correlation
+from ip_index import ExitIndex
+from node_correlation import (
+    batch_temporal_match, build_temporal_index, correlate_batch, correlate_packets,
+    exit_fingerprint_mask, find_temporal_match, match_kernel, sharded_temporal_match,
+    store_fingerprints
+)
+from packet_store import PacketStore, write_store
+
+EXITS = ["185.220.101.1", "185.220.101.2", "2001:db8::e1"]
+CLEARNET = ["93.184.216.34", "151.101.1.69", "2001:db8::80"]
+CLIENTS = [f"10.0.0.{i}" for i in range(1, 13)] + ["2001:db8::c1"]
+JA3 = ["771,4865-4866,0-23", "771,49195-49199,0-11", "769,47-53,0", None]
+
+
+def _packets(n, seed, span_sec=60.0):
+    """Random packet dicts on a millisecond grid, so timestamps repeat."""
+    rng = random.Random(seed)
+    packets = []
+    for _ in range(n):
+        ts = rng.randrange(int(span_sec * 1000)) / 1000
+        packets.append({
+            "timestamp": ts,
+            "readable_time": f"t{int(ts)}",
+            "src_ip": rng.choice(CLIENTS),
+            "dst_ip": rng.choice(EXITS + CLEARNET * 2),
+            "length": rng.randrange(60, 1500),
+            "ttl": rng.choice([64, 128]),
+            "ja3": rng.choice(JA3),
+        })
+    return packets
+
+
+# --------------------------------------------------
+# BASELINE (the original O(N²) scan)
+# --------------------------------------------------
+def _scan_match(pcap_data, current_exit_pkt, window_sec=5):
+    exit_time = current_exit_pkt["timestamp"]
+    search_start = exit_time - window_sec
+    best_match = {"matched_src_ip": None, "temporal_match_score": 0.0, "match_found": False}
+    for pkt in pcap_data:
+        if pkt["timestamp"] >= search_start and pkt["timestamp"] < exit_time:
+            if pkt.get("ja3") == current_exit_pkt["ja3"] and pkt.get("ttl") == current_exit_pkt.get("ttl"):
+                temporal_score = 1.0 - ((exit_time - pkt["timestamp"]) / window_sec)
+                if temporal_score > best_match["temporal_match_score"]:
+                    best_match["matched_src_ip"] = pkt["src_ip"]
+                    best_match["temporal_match_score"] = temporal_score
+                    best_match["match_found"] = True
+    return best_match
+
+
+def scan_correlate(pcap_raw, exit_ips, window_sec=5):
+    correlated_paths, timeline = [], []
+    for pkt in pcap_raw:
+        dst_ip = pkt["dst_ip"]
+        if dst_ip in exit_ips:
+            match = _scan_match(pcap_raw, pkt, window_sec)
+            if match["match_found"]:
+                correlated_paths.append({
+                    "src_ip": match["matched_src_ip"],
+                    "exit_node": dst_ip,
+                    "timestamp": pkt["timestamp"],
+                    "readable_time": pkt["readable_time"],
+                    "packet_size": pkt["length"],
+                    "temporal_match_score": match["temporal_match_score"]
+                })
+            timeline.append({"timestamp": pkt["timestamp"], "time": pkt["readable_time"],
+                             "type": "TOR Exit", "ip": dst_ip})
+        else:
+            timeline.append({"timestamp": pkt["timestamp"], "time": pkt["readable_time"],
+                             "type": "Clearnet Entry", "ip": pkt["src_ip"]})
+    return correlated_paths, sorted(timeline, key=lambda x: x["timestamp"])
+
+
+def _exit_index():
+    return ExitIndex.from_relays([{"exit_addresses": EXITS}])
+
+
+def _store(tmp_path, packets):
+    write_store(
+        ((p["timestamp"], p["src_ip"], p["dst_ip"], p["length"], p["ttl"], 0, p["ja3"]) for p in packets),
+        str(tmp_path)
+    )
+    return PacketStore(str(tmp_path))
+
+
+# --------------------------------------------------
+# INDEXED JOIN
+# --------------------------------------------------
+@pytest.mark.parametrize("seed", range(5))
+def test_indexed_match_equals_scan(seed):
+    packets = _packets(1500, seed)
+    index = build_temporal_index(packets)
+    for pkt in packets:
+        for window_sec in (0.5, 5):
+            assert find_temporal_match(index, pkt, window_sec) == _scan_match(packets, pkt, window_sec)
+
+
+def test_tie_goes_to_first_packet_in_capture_order():
+    hello = {"ja3": JA3[0], "ttl": 64, "readable_time": "t", "length": 100, "dst_ip": CLEARNET[0]}
+    packets = [
+        dict(hello, timestamp=3.0, src_ip="10.0.0.1"),
+        dict(hello, timestamp=4.0, src_ip="10.0.0.2"),
+        dict(hello, timestamp=4.0, src_ip="10.0.0.3"),
+        dict(hello, timestamp=5.0, src_ip="10.0.0.4", dst_ip=EXITS[0]),
+    ]
+    for order in (packets, packets[::-1]):
+        match = find_temporal_match(build_temporal_index(order), packets[-1])
+        assert match == _scan_match(order, packets[-1])
+
+
+def test_window_edges():
+    hello = {"ja3": JA3[0], "ttl": 64, "src_ip": "10.0.0.1"}
+    exit_pkt = dict(hello, timestamp=10.0)
+    for ts in (4.999, 5.0, 9.999, 10.0, 10.001):
+        packets = [dict(hello, timestamp=ts)]
+        assert find_temporal_match(build_temporal_index(packets), exit_pkt) == _scan_match(packets, exit_pkt)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_correlate_packets_equals_scan(seed):
+    packets = _packets(2000, seed)
+    assert correlate_packets(packets, _exit_index()) == scan_correlate(packets, set(EXITS))
+
+
+# --------------------------------------------------
+# VECTORIZED AND SHARDED JOIN
+# --------------------------------------------------
+@pytest.mark.parametrize("time_ordered", [True, False])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_correlate_batch_equals_scan(tmp_path, time_ordered, workers):
+    packets = _packets(3000, seed=workers)
+    if time_ordered:
+        packets.sort(key=lambda p: p["timestamp"])
+    store = _store(tmp_path, packets)
+    records = list(store.iter_records())
+    assert correlate_batch(store, _exit_index(), workers=workers) == scan_correlate(records, set(EXITS))
+
+
+@pytest.mark.parametrize("workers", [2, 3, 7])
+def test_sharded_match_equals_single_process(tmp_path, workers):
+    store = _store(tmp_path, sorted(_packets(3000, seed=7), key=lambda p: p["timestamp"]))
+    exit_mask = _exit_index().contains_column(store["dst_ip"])
+    single = batch_temporal_match(store, exit_mask.nonzero()[0])
+    sharded = sharded_temporal_match(store, exit_mask, workers=workers)
+    for expected, got in zip(single, sharded):
+        assert got.tolist() == expected.tolist()
+
+
+# --------------------------------------------------
+# EXIT FINGERPRINT PREFILTER
+# --------------------------------------------------
+@pytest.mark.parametrize("table_limit", [node_correlation.MAX_FINGERPRINT_TABLE, 16])
+def test_exit_fingerprint_mask_equals_set_lookup(monkeypatch, table_limit):
+    monkeypatch.setattr(node_correlation, "MAX_FINGERPRINT_TABLE", table_limit)
+    rng = np.random.default_rng(0)
+    fingerprint = rng.integers(0, 5000, size=3000) << 8 | rng.choice([64, 128], size=3000)
+    exit_pos = rng.choice(len(fingerprint), size=40, replace=False)
+
+    exit_set = set(fingerprint[exit_pos].tolist())
+    expected = [fp in exit_set for fp in fingerprint.tolist()]
+    assert exit_fingerprint_mask(fingerprint, exit_pos).tolist() == expected
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_prefilter_leaves_matches_unchanged(tmp_path, monkeypatch, seed):
+    packets = _packets(3000, seed)
+    # Fingerprints no exit carries, which the prefilter drops
+    for pkt in packets[::3]:
+        if pkt["dst_ip"] not in EXITS:
+            pkt["ja3"] = f"clearnet-only-{seed}"
+    store = _store(tmp_path, packets)
+    ticks = np.asarray(store["timestamp"], dtype=np.int64)
+    fingerprint = store_fingerprints(store)
+    exit_pos = np.flatnonzero(_exit_index().contains_column(store["dst_ip"]))
+    assert not exit_fingerprint_mask(fingerprint, exit_pos).all()
+
+    filtered = match_kernel(ticks, fingerprint, exit_pos, 5, store.resolution)
+    monkeypatch.setattr(
+        node_correlation, "exit_fingerprint_mask", lambda fp, pos: np.ones(len(fp), dtype=bool)
+    )
+    unfiltered = match_kernel(ticks, fingerprint, exit_pos, 5, store.resolution)
+    for expected, got in zip(unfiltered, filtered):
+        assert got.tolist() == expected.tolist()
+    assert len(filtered[0]) > 0
@@ -0,0 +1,134 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""Streaming Onionoo client against the local OnionooStub."""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from onionoo_client import ConnectionPool, StreamingDocumentParser, fetch_document, fetch_documents
+from onionoo_stub import OnionooStub, make_documents
+
+PUBLISHED = datetime(2026, 10, 17, 10, 0, 0, tzinfo=timezone.utc)
+
+DOCUMENT = (
+    '{"relays_published": "2026-10-17 10:00:00", '
+    '"relays": [{"fingerprint": "A", "bandwidth": 123456}, 7890123, {"flags": ["Guard"]}], '
+    '"count": 4567}'
+)
+
+
+def _parse(chunks):
+    elements = []
+    parser = StreamingDocumentParser(lambda name, element: elements.append(element))
+    for chunk in chunks:
+        parser.feed(chunk)
+    return elements, parser.close()
+
+
+def _documents():
+    return make_documents(20, seed=1, published=PUBLISHED)
+
+
+def _fetch(stub, name, **kwargs):
+    async def run():
+        relays = []
+        pool = ConnectionPool(stub.url, 1)
+        try:
+            result = await fetch_document(pool, name, relays.append, **kwargs)
+        finally:
+            await pool.close()
+        return result, relays
+    return asyncio.run(run())
+
+
+# --------------------------------------------------
+# PARSER
+# --------------------------------------------------
+def test_parse_split_at_every_boundary():
+    expected = json.loads(DOCUMENT)
+    for cut in range(len(DOCUMENT) + 1):
+        elements, fields = _parse([DOCUMENT[:cut], DOCUMENT[cut:]])
+        assert elements == expected["relays"], cut
+        assert fields == {"relays_published": expected["relays_published"], "count": 4567}, cut
+
+
+def test_parse_number_cut_at_chunk_boundary():
+    for number in ("123456", "7890123", "4567"):
+        cut = DOCUMENT.index(number) + 3
+        elements, fields = _parse([DOCUMENT[:cut], DOCUMENT[cut:]])
+        assert elements[0]["bandwidth"] == 123456
+        assert elements[1] == 7890123
+        assert fields["count"] == 4567
+
+
+def test_parse_one_character_chunks():
+    elements, fields = _parse(DOCUMENT)
+    assert elements == json.loads(DOCUMENT)["relays"]
+    assert fields["count"] == 4567
+
+
+@pytest.mark.parametrize("cut", [-1, -10, DOCUMENT.index("7890123") + 3, 1])
+def test_truncated_document_raises(cut):
+    with pytest.raises(ValueError):
+        _parse([DOCUMENT[:cut]])
+
+
+# --------------------------------------------------
+# HTTP
+# --------------------------------------------------
+@pytest.mark.parametrize("gzip_bodies", [True, False])
+def test_fetch_gzip_and_identity_bodies(gzip_bodies):
+    documents = _documents()
+    with OnionooStub(documents, gzip_bodies=gzip_bodies) as stub:
+        result, relays = _fetch(stub, "details", params={"type": "relay"})
+    assert relays == documents["details"]["relays"]
+    assert result["fields"]["relays_published"] == documents["details"]["relays_published"]
+    assert result["last_modified"] == format_datetime(PUBLISHED, usegmt=True)
+
+
+def test_connection_reused_across_documents():
+    documents = _documents()
+
+    async def run(stub):
+        counts = {}
+        pool = ConnectionPool(stub.url, 1)
+        try:
+            for name in ("details", "bandwidth", "uptime"):
+                counts[name] = []
+                await fetch_document(pool, name, counts[name].append)
+        finally:
+            await pool.close()
+        return pool, counts
+
+    with OnionooStub(documents) as stub:
+        pool, counts = asyncio.run(run(stub))
+    assert stub.requests == [("details", 200), ("bandwidth", 200), ("uptime", 200)]
+    assert pool.reused == 2
+    assert all(len(relays) == 20 for relays in counts.values())
+
+
+def test_not_modified():
+    with OnionooStub(_documents()) as stub:
+        result, relays = _fetch(stub, "details", if_modified_since=format_datetime(PUBLISHED, usegmt=True))
+    assert result is None
+    assert relays == []
+    assert stub.requests == [("details", 304)]
+
+
+def test_conditional_request_only_for_named_documents():
+    handlers = {name: (lambda relay: None) for name in ("details", "bandwidth", "uptime")}
+    with OnionooStub(_documents()) as stub:
+        results = asyncio.run(fetch_documents(
+            stub.url, handlers, if_modified_since={"details": format_datetime(PUBLISHED, usegmt=True)}
+        ))
+    assert results["details"] is None
+    assert isinstance(results["bandwidth"], dict) and isinstance(results["uptime"], dict)
+    assert sorted(stub.requests) == [("bandwidth", 200), ("details", 304), ("uptime", 200)]
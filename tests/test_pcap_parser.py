@@ -0,0 +1,107 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""Chunked fingerprint decoding against the frame-by-frame reader."""
+
+import random
+import socket
+import struct
+
+import pytest
+
+from benchmark import _client_hello
+from packet_store import PacketStore, StoreWriter
+from pcap_parser import decode_capture, iter_packets
+
+CLIENTS = [f"10.0.0.{i}" for i in range(1, 7)]
+SERVERS = ["93.184.216.34", "185.220.101.1"]
+
+
+def _server_hello(cipher, extensions):
+    exts = b"".join(struct.pack("!HH", e, 0) for e in extensions)
+    body = (
+        struct.pack("!H", 0x0303) + bytes(32) + b"\x00" + struct.pack("!HB", cipher, 0)
+        + struct.pack("!H", len(exts)) + exts
+    )
+    handshake = b"\x02" + len(body).to_bytes(3, "big") + body
+    return b"\x16\x03\x03" + struct.pack("!H", len(handshake)) + handshake
+
+
+def _frame(src, dst, sport, dport, payload, proto=6, ttl=64):
+    if proto == 6:
+        l4 = struct.pack("!HHIIBBHHH", sport, dport, 0, 0, 5 << 4, 0x18, 65535, 0, 0)
+    else:
+        l4 = struct.pack("!HHHH", sport, dport, 8 + len(payload), 0)
+    ip = struct.pack(
+        "!BBHHHBBH4s4s", 0x45, 0, 20 + len(l4) + len(payload), 0, 0, ttl, proto, 0,
+        socket.inet_aton(src), socket.inet_aton(dst)
+    )
+    return b"\x00" * 12 + b"\x08\x00" + ip + l4 + payload
+
+
+def _capture(path, seed, n_sessions=60):
+    """
+    Interleaved sessions: TLS ones (ClientHello, data, ServerHello, data
+    both ways), plain TCP and UDP, with packets of a session before its
+    hellos.
+    """
+    rng = random.Random(seed)
+    events = []
+    for s in range(n_sessions):
+        client, server = rng.choice(CLIENTS), rng.choice(SERVERS)
+        sport, dport = 40000 + s, rng.choice([443, 80])
+        t = rng.uniform(0, 30)
+        kind = rng.choice(["tls", "tls", "tcp", "udp"])
+        out = (client, server, sport, dport)
+        back = (server, client, dport, sport)
+
+        packets = [(out, b"")]                                  # handshake, no payload
+        if kind == "tls":
+            packets += [
+                (out, _client_hello(rng.randrange(16))),
+                (back, bytes(rng.randrange(1, 200))),           # before the ServerHello
+                (back, _server_hello(rng.choice([0x1301, 0xC02F]), rng.sample([43, 51, 0, 16], 2))),
+            ]
+        packets += [(rng.choice([out, back]), bytes(rng.randrange(1, 300))) for _ in range(rng.randrange(1, 6))]
+        proto = 17 if kind == "udp" else 6
+        for i, (ends, payload) in enumerate(packets):
+            events.append((t + i * 0.01, _frame(*ends, payload, proto=proto)))
+
+    events.sort(key=lambda e: e[0])
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for ts, frame in events:
+            sec, usec = int(ts), round((ts - int(ts)) * 1e6)
+            if usec == 1_000_000:
+                sec, usec = sec + 1, 0
+            f.write(struct.pack("<IIII", sec, usec, len(frame), len(frame)) + frame)
+    return path
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_chunked_fingerprints_equal_frame_reader(tmp_path, seed):
+    capture = _capture(str(tmp_path / "c.pcap"), seed)
+    expected = list(iter_packets(capture))
+    assert any(p[10] for p in expected) and any(p[11] for p in expected)
+
+    with StoreWriter(str(tmp_path / "store")) as writer:
+        decode_capture(capture, writer)
+    store = PacketStore(str(tmp_path / "store"))
+    tables = store.fingerprint_tables
+
+    got = [
+        (r["src_ip"], r["dst_ip"], r["ja3"], r["ja3s"], r["ja4"], proto, sport, dport)
+        for r, proto, sport, dport in zip(
+            store.iter_records(), store["proto"].tolist(), store["src_port"].tolist(),
+            store["dst_port"].tolist()
+        )
+    ]
+    assert got == [(p[1], p[2], p[6], p[10], p[11], p[7], p[8], p[9]) for p in expected]
+
+    # Per-case code tables: code 0 is "none", the rest in order of first use
+    for i, name in ((6, "ja3"), (10, "ja3s"), (11, "ja4")):
+        seen = list(dict.fromkeys(p[i] for p in expected if p[i] is not None))
+        assert tables[name] == [None] + seen
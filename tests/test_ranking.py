@@ -0,0 +1,69 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""Heap-based top-K and pager against a stable descending sort."""
+
+import random
+
+import pytest
+
+from ranking import get_page, iter_pages, iter_ranked, score_key, select_top
+
+KEY = score_key("score")
+
+
+def _rows(n, seed=0):
+    rng = random.Random(seed)
+    # Few distinct scores, so ties and their input order matter
+    return [{"score": rng.choice([0.1, 0.5, 0.5, 0.9]), "id": i} for i in range(n)]
+
+
+def _sorted(rows):
+    return sorted(rows, key=KEY, reverse=True)
+
+
+@pytest.mark.parametrize("k", [1, 7, 100, 1000, 5000])
+def test_select_top_matches_sort(k):
+    rows = _rows(1000)
+    assert select_top(rows, k, KEY) == _sorted(rows)[:k]
+
+
+def test_select_top_without_k_ranks_everything():
+    rows = _rows(200)
+    assert select_top(rows, None, KEY) == _sorted(rows)
+    assert select_top(rows, 0, KEY) == []
+
+
+def test_iter_ranked_matches_sort():
+    rows = _rows(500)
+    assert list(iter_ranked(rows, KEY)) == _sorted(rows)
+
+
+@pytest.mark.parametrize("page_size", [1, 33, 500, 501])
+def test_pages_concatenate_to_ranking(page_size):
+    rows = _rows(500)
+    pages = list(iter_pages(rows, page_size, KEY))
+    assert all(len(page) == page_size for page in pages[:-1])
+    assert [row for page in pages for row in page] == _sorted(rows)
+
+
+def test_presorted_rows_are_paged_lazily():
+    taken = []
+
+    def ranked():
+        for row in _sorted(_rows(100)):
+            taken.append(row)
+            yield row
+
+    assert get_page(ranked(), 1, 10) == _sorted(_rows(100))[10:20]
+    assert len(taken) <= 21
+
+
+def test_get_page_past_the_end_and_bad_size():
+    assert get_page(_rows(10), 3, 5, KEY) == []
+    assert list(iter_pages([], 5, KEY)) == []
+    with pytest.raises(ValueError):
+        next(iter_pages(_rows(10), 0, KEY))
@@ -0,0 +1,106 @@
+# ==============================================================================
+# PROPERTY OF CYBER CRIME WING - TAMIL NADU POLICE
+# PROJECT: SHADOWFINGERPRINT (Tor Origin Identification System)
+# HACKATHON: TN Police Hackathon 2025
+# ==============================================================================
+
+"""FFT pair scoring against a direct lag-by-lag cross-correlation."""
+
+import random
+
+import numpy as np
+import pytest
+
+import shape_correlation
+from flow_assembly import assemble_flows
+from ip_index import ExitIndex
+from packet_store import PacketStore, write_store
+from shape_correlation import candidate_pairs, correlate_shapes, score_pairs, series_stats
+
+EXITS = ["185.220.101.1", "185.220.101.2"]
+CLEARNET = ["93.184.216.34", "151.101.1.69"]
+CLIENTS = [f"10.0.0.{i}" for i in range(1, 9)]
+BIN_SEC = 0.05
+MAX_LAG_SEC = 2.0
+
+
+def _flows(tmp_path, packets, bin_sec=BIN_SEC):
+    write_store(packets, str(tmp_path))
+    return assemble_flows(PacketStore(str(tmp_path)), idle_timeout=3.0, series_bin_sec=bin_sec)
+
+
+def _packets(n, seed):
+    rng = random.Random(seed)
+    packets = []
+    for _ in range(n):
+        ts = rng.randrange(20000) / 1000
+        packets.append((
+            ts, rng.choice(CLIENTS), rng.choice(EXITS + CLEARNET), rng.randrange(60, 1500), 64, 0,
+            None, 6, rng.choice([40000, 40001, 40002]), 443
+        ))
+    return packets
+
+
+# --------------------------------------------------
+# BASELINE (one lag at a time)
+# --------------------------------------------------
+def _centered(flows, i):
+    series = flows.series(i).astype(np.float64)
+    return series - series.mean()
+
+
+def direct_scores(flows, e, x, max_lag_sec):
+    """Normalized correlation of entry flow e and exit flow x at every lag in bins."""
+    entry, exit_ = _centered(flows, e), _centered(flows, x)
+    start = flows["timestamp"]
+    offset = round((int(start[x]) - int(start[e])) / (flows.series_bin_sec * flows.resolution))
+    denom = np.linalg.norm(entry) * np.linalg.norm(exit_)
+    scores = {}
+    for lag in range(int(max_lag_sec / flows.series_bin_sec) + 1):
+        # Entry bin i lines up with exit bin i + lag - offset
+        d = lag - offset
+        if not -len(entry) < d < len(exit_):
+            continue
+        lo, hi = max(0, -d), min(len(entry), len(exit_) - d)
+        total = float(entry[lo:hi] @ exit_[lo + d:hi + d])
+        scores[lag] = min(max(total / denom if denom > 0 else total, 0.0), 1.0)
+    return scores
+
+
+@pytest.mark.parametrize("pair_batch", [shape_correlation.PAIR_BATCH, 7])
+@pytest.mark.parametrize("seed", range(3))
+def test_score_pairs_equals_direct_correlation(tmp_path, monkeypatch, seed, pair_batch):
+    monkeypatch.setattr(shape_correlation, "PAIR_BATCH", pair_batch)
+    flows = _flows(tmp_path, _packets(2500, seed))
+    exit_mask = ExitIndex.from_relays([{"exit_addresses": EXITS}]).contains_column(flows["dst_ip"])
+    usable = series_stats(flows)[1] > 0
+    entry_idx, exit_idx = candidate_pairs(flows, exit_mask, usable, MAX_LAG_SEC, 8)
+    assert len(entry_idx) > 50
+
+    scores, lags = score_pairs(flows, entry_idx, exit_idx, MAX_LAG_SEC)
+    for e, x, score, lag in zip(entry_idx.tolist(), exit_idx.tolist(), scores.tolist(), lags.tolist()):
+        direct = direct_scores(flows, e, x, MAX_LAG_SEC)
+        peak = max(direct.values(), default=0.0)
+        assert score == pytest.approx(peak, abs=1e-9)
+        if direct:
+            # Ties may resolve to any lag holding the peak
+            assert direct[round(lag / BIN_SEC)] == pytest.approx(peak, abs=1e-9)
+
+
+def test_delayed_and_scaled_shape_scores_one(tmp_path):
+    rng = random.Random(5)
+    shape = [(rng.randrange(300) / 100, rng.randrange(100, 1400, 2)) for _ in range(40)]
+    delay = 1.3
+    packets = [(t, CLIENTS[0], CLEARNET[0], size, 64, 0, None, 6, 40000, 443) for t, size in shape]
+    # Same shape leaving the exit `delay` later, with every packet half the size
+    packets += [(t + delay, "10.9.9.9", EXITS[0], size // 2, 64, 0, None, 6, 50000, 443)
+                for t, size in shape]
+    packets += [(t + 0.4, CLIENTS[1], CLEARNET[1], rng.randrange(100, 1400), 64, 0, None, 6, 40001, 443)
+                for t, _ in shape]
+    flows = _flows(tmp_path, packets, bin_sec=0.01)
+
+    matches = correlate_shapes(flows, [{"exit_addresses": EXITS}], max_lag_sec=5.0, min_score=0.0)
+    assert len(matches) == 1
+    assert matches[0]["src_ip"] == CLIENTS[0]
+    assert matches[0]["shape_score"] == pytest.approx(1.0, abs=1e-3)
+    assert matches[0]["lag_sec"] == pytest.approx(delay)